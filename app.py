@@ -1,14 +1,14 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
-from flasgger import Swagger
-from flask import Flask, g, \
+from flask import Flask, Response, g, \
     jsonify, make_response, redirect, render_template, render_template_string, \
-    request, safe_join, send_file, send_from_directory, session, url_for
+    request, safe_join, send_file, send_from_directory, session, stream_with_context, url_for
 from flask_caching import Cache
 from flask_cors import CORS
 from http import HTTPStatus
 from pathlib import Path
+from werkzeug.middleware.proxy_fix import ProxyFix
 from richcontext import server as rc_server
 import argparse
 import codecs
@@ -19,9 +19,11 @@ import diskcache as dc
 import hashlib
 import json
 import jwt
+import math
 import os
 import string
 import sys
+import threading
 import traceback
 import tempfile
 import time
@@ -37,25 +39,95 @@ class RCServerApp (Flask):
     DEFAULT_PORT = 5000		# CLI arg - port used for dev/test
     DEFAULT_SCHEME = "https"	# CLI arg - HTTP scheme for OpenAPI
     DEFAULT_TOKEN = None	# CLI arg - input TSV file for web tokens
+    DEFAULT_WARM = 0		# CLI arg - datasets to pre-render reranked links
+    DEFAULT_RADIUS = 2
 
-    PATH_DC_CACHE = "/tmp/richcontext"	# TODO: move to flask.cfg
+    RERANK_CACHE_SIZE = 4096
+    RERANK_EXPIRE = 86400	# seconds, for reranked links in the disk cache
 
+    MAX_SEEDS = 16
 
-    def __init__ (self, name, no_load=False):
+    HOOD_CACHE_SIZE = 64	# recent neighborhoods, for paging through results
+    PAGE_LIMIT = 50
+    MAX_PAGE_LIMIT = 500
+    FRONTIER_EXPIRE = 3600	# seconds, for the BFS state of queries to expand
+
+    SLOW_QUERY_COST = 2000	# nodes, above which queries need the slow lane
+    MAX_QUERY_COST = 20000	# nodes, above which slow queries get downgraded
+
+    # the estimated costs have about 13% standard error, so compare
+    # them padded by two standard errors: a query gets treated as up to
+    # 26% larger than estimated, which covers about 95% of them
+    COST_HEADROOM = 1.0 + 2.0 * rc_server.RCNeighborhoodSizes.STD_ERROR
+    SLOW_LANE_SIZE = 2		# concurrent slow queries, across the workers
+    RETRY_AFTER = 30		# seconds, for rejected queries
+
+    RELATED_CACHE_SIZE = 1024
+    RELATED_K = 10
+    RELATED_EPSILON = 1e-5
+
+    PATH_K = 3
+    MAX_PATH_LENGTH = 10
+
+    FACET_K = 10	# top facets of each kind to count
+
+    DEFAULT_EXPORT = None	# CLI arg - export the KG as `parquet` or `arrow`
+    DEFAULT_BATCH = None	# CLI arg - input TSV file of batch queries
+    DEFAULT_BATCH_OUT = "batch.ndjson"	# CLI arg - NDJSON or Parquet output
+    DEFAULT_WORKERS = 0		# CLI arg - batch processes, 0 for one per CPU
+
+    PATH_DC_CACHE = "/tmp/richcontext"	# unless set in flask.cfg
+    PATH_EXPORT = "export"	# exported tables, served by the API
+
+
+    def __init__ (self, name):
         """
-        initialize the web app
+        initialize the web app, without loading the network: the
+        command line options which don't need it start right away, see
+        `load_network()` and `setup_serve()`
         """
         super(RCServerApp, self).__init__(name, static_folder="static", template_folder="templates")
-        self.config.from_pyfile("flask.cfg")
-
-        self.disk_cache = dc.Cache(self.PATH_DC_CACHE)
+        self.config.from_pyfile(os.environ.get("FLASK_CONFIG", "flask.cfg"))
+
+        self.disk_cache = dc.Cache(self.config.get("PATH_DC_CACHE", self.PATH_DC_CACHE))
+        self.rerank_cache = rc_server.RCLRUCache(maxsize=self.RERANK_CACHE_SIZE)
+        self.related_cache = rc_server.RCLRUCache(maxsize=self.RELATED_CACHE_SIZE)
+        self.hood_cache = rc_server.RCLRUCache(maxsize=self.HOOD_CACHE_SIZE)
+        self.flight = rc_server.RCSingleFlight(self.disk_cache)
+        self.slow_lane = rc_server.RCSharedSemaphore(self.disk_cache, "slow-lane", self.SLOW_LANE_SIZE)
+        self.admission = { "fast": 0, "slow": 0, "downgraded": 0, "rejected": 0 }
+        self.admission_lock = threading.Lock()
+        self.scheduler = rc_server.RCScheduler(self.worker_policies(), max_active=self.worker_share(self.MAX_ACTIVE), max_wait=self.MAX_QUEUE_WAIT)
+        self.rate_limiter = rc_server.RCRateLimiter(self.disk_cache)
+        self.rate_buckets = rc_server.RCLRUCache(maxsize=self.RATE_BUCKETS)
         self.corpus_path = Path(self.DEFAULT_CORPUS)
 
         self.net = rc_server.RCNetwork()
-        self.net.setup_render(self.template_folder)
+        self.net_lock = threading.Lock()
+        self.net_loaded = False
+
 
-        if not no_load:
-            self.links = self.net.deserialize()
+    def load_network (self):
+        """
+        load the pre-computed network, at most once
+        """
+        with self.net_lock:
+            if not self.net_loaded:
+                self.net.setup_render(self.template_folder)
+                self.net.deserialize()
+                self.net_loaded = True
+
+
+    def setup_serve (self):
+        """
+        get ready to serve the web app and API: load the network, and
+        register the OpenAPI docs, whose dependencies are slow to
+        import, see `API_TEMPLATE`
+        """
+        from flasgger import Swagger
+
+        self.load_network()
+        self.swagger = Swagger(self, template=API_TEMPLATE)
 
 
     ######################################################################
@@ -80,6 +152,16 @@ class RCServerApp (Flask):
 
 
     def build_links (self):
+        """
+        switch to the pre-compute build of the network, which imports
+        the heavy analytics dependencies, then load the corpus and
+        render the links for each entity
+        """
+        from richcontext.server.precompute import RCNetworkBuilder
+
+        self.net = RCNetworkBuilder()
+        self.net.setup_render(self.template_folder)
+
         elapsed_time = self.net.load_network(self.corpus_path)
         print("{:.2f} ms corpus parse time".format(elapsed_time))
 
@@ -93,6 +175,158 @@ class RCServerApp (Flask):
         return links
 
 
+    def get_reranked_links (self, node_id, anchor, radius):
+        """
+        render HTML for the links of an author, reranked by distance
+        to the `anchor` node of the last query; results get cached
+        in-process, then in the disk cache shared across workers, both
+        keyed by the build of the network
+        """
+        key = (self.net.build_id, node_id, anchor, radius)
+        html = self.rerank_cache.get(key)
+
+        if html is None:
+            disk_key = "rerank-{}-{}-{}-{}".format(self.net.build_id, node_id, anchor, radius)
+            html = self.disk_cache.get(disk_key)
+
+            if html is None:
+                html = self.flight.do(disk_key, lambda: self.render_reranked_links(node_id, anchor, radius, disk_key))
+
+            if html:
+                self.rerank_cache.put(key, html)
+
+        return html
+
+
+    def render_reranked_links (self, node_id, anchor, radius, disk_key):
+        """
+        render the reranked links for an author, then store them in
+        the disk cache
+        """
+        a = self.net.store.get_entity(node_id)
+        html = self.net.render_auth(a, rerank=anchor, radius=radius)
+
+        if html:
+            self.disk_cache.set(disk_key, html, expire=self.RERANK_EXPIRE)
+
+        return html
+
+
+    def warm_reranked_links (self, num_anchors, radius=DEFAULT_RADIUS):
+        """
+        pre-render the reranked author links for queries on the
+        highest ranked datasets
+        """
+        t0 = time.time()
+        datasets = self.net.store.ids_of_kind("data").tolist()
+        datasets = [ d_id for d_id in datasets if d_id in self.net.scale ]
+        datasets.sort(key=lambda d_id: self.net.scale[d_id][1], reverse=True)
+        count = 0
+
+        for d_id in datasets[:num_anchors]:
+            for node_id in self.net.anchor_paths(str(d_id), radius):
+                if self.net.store.kind_of(node_id) == "auth":
+                    self.get_reranked_links(node_id, str(d_id), radius)
+                    count += 1
+
+        t1 = time.time()
+        print("{:.2f} ms to pre-render {} reranked links".format((t1 - t0) * 1000.0, count))
+
+
+    ######################################################################
+    ## offline batch queries
+
+    def run_batch (self, batch_path, out_path, workers=DEFAULT_WORKERS):
+        """
+        run a file of batch queries offline, sharing the network
+        across a pool of processes; returns a throughput report
+        """
+        runner = rc_server.RCBatchRunner(self.net, self.parse_radius, self.DEFAULT_RADIUS)
+        return runner.run(batch_path, out_path, workers=workers)
+
+
+    ######################################################################
+    ## faceted filtering of publications
+
+    def run_facet_query (self, args):
+        """
+        filter the publications by facets, given as entity UUIDs in the
+        `all`, `any`, and `not` parameters
+        """
+        t0 = time.time()
+
+        try:
+            offset = max(int(args.get("offset", 0)), 0)
+            limit = int(args.get("limit", self.PAGE_LIMIT))
+            limit = min(max(limit, 1), self.MAX_PAGE_LIMIT)
+        except ValueError:
+            response = "expected integers for the offset and limit"
+            status = HTTPStatus.BAD_REQUEST.value
+            return response, status
+
+        try:
+            response = self.net.facet_query(
+                args.getlist("all"),
+                args.getlist("any"),
+                args.getlist("not"),
+                offset=offset,
+                limit=limit,
+                k=self.FACET_K
+                )
+        except ValueError as e:
+            response = str(e)
+            status = HTTPStatus.BAD_REQUEST.value
+            return response, status
+
+        response["time"] = "{:.2f}".format((time.time() - t0) * 1000.0)
+        status = HTTPStatus.OK.value
+
+        return response, status
+
+
+    ######################################################################
+    ## columnar export of the KG
+
+    def export_tables (self, fmt):
+        """
+        export the KG tables as Parquet or Arrow IPC files, to serve
+        through the API
+        """
+        t0 = time.time()
+        exporter = rc_server.RCExporter(self.net)
+        manifest = exporter.export(self.PATH_EXPORT, fmt=fmt)
+
+        t1 = time.time()
+        print("{:.2f} ms to export {} tables".format((t1 - t0) * 1000.0, len(manifest["tables"])))
+
+        return manifest
+
+
+    def send_export (self, table, fmt):
+        """
+        send an exported table, as long as it matches the build of
+        the network being served
+        """
+        exporter = rc_server.RCExporter
+        manifest = exporter.read_manifest(self.PATH_EXPORT)
+
+        if table not in exporter.TABLES or fmt not in exporter.FORMATS:
+            response = "unknown table or format; expected one of {} as {}".format(exporter.TABLES, list(exporter.FORMATS))
+            status = HTTPStatus.BAD_REQUEST.value
+            return response, status
+
+        if not manifest or manifest["build"] != self.net.build_id or fmt not in manifest["tables"].get(table, {}):
+            response = f"the {table} table has not been exported as {fmt} for this build"
+            status = HTTPStatus.NOT_FOUND.value
+            return response, status
+
+        path = exporter.table_path(self.PATH_EXPORT, table, fmt)
+        mimetype = exporter.FORMATS[fmt][1]
+
+        response = send_file(path.resolve(), mimetype=mimetype, as_attachment=True, conditional=True)
+        return response, response.status_code
+
+
     ######################################################################
     ## manage web tokens, scoped roles, and identifying HITL feedback
 
@@ -100,6 +334,26 @@ class RCServerApp (Flask):
     SCOPE_CI = "ci"
     SCOPE_EXPERT = "expert"
     SCOPE_OPS = "ops"
+    SCOPE_PUBLIC = "public"	# requests without a web token
+
+    # scheduling and rate limits for API requests, by role: a lower
+    # priority goes first, `limit` is the number of concurrent
+    # requests across all of the workers, then `rate` and `burst` size
+    # the token buckets for each user; anonymous users get keyed by
+    # their address, so the public burst allows for a few users behind
+    # one proxy, while the public rate keeps any one address from
+    # crowding out the roles which have web tokens
+    ROLE_POLICIES = {
+        SCOPE_AGENCY: { "priority": 0, "limit": 12, "rate": 20.0, "burst": 40 },
+        SCOPE_EXPERT: { "priority": 1, "limit": 8, "rate": 10.0, "burst": 20 },
+        SCOPE_OPS: { "priority": 1, "limit": 4, "rate": 10.0, "burst": 20 },
+        SCOPE_PUBLIC: { "priority": 2, "limit": 8, "rate": 5.0, "burst": 20 },
+        SCOPE_CI: { "priority": 3, "limit": 4, "rate": 2.0, "burst": 10 }
+        }
+
+    MAX_ACTIVE = 16		# concurrent API requests, across the workers
+    MAX_QUEUE_WAIT = 10.0	# seconds
+    RATE_BUCKETS = 4096		# users tracked for the per-worker rate limits
 
     SCOPE_TEMPLATE = {
         "id": "email@agency.gov",
@@ -214,12 +468,126 @@ class RCServerApp (Flask):
         return response, status
 
 
-    def get_entity_links (self, index):
+    @classmethod
+    def worker_share (cls, limit):
+        """
+        this worker's share of a concurrency limit across all of the
+        worker processes, which `WEB_CONCURRENCY` counts; the settings
+        in `gunicorn.conf.py` set it to the number of workers which
+        gunicorn actually runs, even if `--workers` differs; the split
+        is static, so a busy worker can't borrow the idle slots of the
+        others
+        """
+        workers = max(int(os.environ.get("WEB_CONCURRENCY", "1")), 1)
+        return max(math.ceil(limit / workers), 1)
+
+
+    def worker_policies (self):
+        """
+        the role policies, with this worker's share of each limit
+        """
+        return {
+            role: dict(policy, limit=self.worker_share(policy["limit"]))
+            for role, policy in self.ROLE_POLICIES.items()
+            }
+
+
+    def request_role (self):
+        """
+        the role which gives the highest priority among those in the
+        web token for this session
+        """
+        roles = [ r for r in session.get("roles", []) if r in self.ROLE_POLICIES ]
+
+        if not roles:
+            return self.SCOPE_PUBLIC
+
+        return min(roles, key=lambda r: self.ROLE_POLICIES[r]["priority"])
+
+
+    def take_token (self, key, policy, shared):
+        """
+        take one token from the user's bucket: the expensive requests
+        share their buckets across the workers through the disk cache,
+        which costs a write transaction, while the others keep theirs
+        in this worker
+        """
+        if shared:
+            return self.rate_limiter.take(key, policy["rate"], policy["burst"])
+
+        bucket = self.rate_buckets.get(key)
+
+        if bucket is None:
+            bucket = rc_server.RCTokenBucket(policy["rate"], policy["burst"])
+            self.rate_buckets.put(key, bucket)
+
+        return bucket.take()
+
+
+    def schedule_request (self, shared=False):
+        """
+        apply the rate limit for the user, then wait for a slot to
+        serve the request, in order of priority by role; returns
+        `None` once the request gets a slot, otherwise an error
+        response
+        """
+        role = self.request_role()
+        policy = self.ROLE_POLICIES[role]
+
+        # anonymous clients get keyed by their address, as forwarded by
+        # the proxy, since this runs before their session has a UUID
+        if role == self.SCOPE_PUBLIC:
+            key = "{}-{}".format(role, request.remote_addr)
+        else:
+            key = "{}-{}".format(role, session.get("uuid", request.remote_addr))
+
+        retry = self.take_token(key, policy, shared)
+
+        if retry > 0.0:
+            self.scheduler.rate_limited(role)
+            response = "rate limit exceeded for the '{}' role".format(role)
+            status = HTTPStatus.TOO_MANY_REQUESTS.value
+            return response, status, { "Retry-After": str(math.ceil(retry)) }
+
+        if not self.scheduler.acquire(role):
+            response = "the server is busy; try again later"
+            status = HTTPStatus.SERVICE_UNAVAILABLE.value
+            return response, status, { "Retry-After": str(self.RETRY_AFTER) }
+
+        g.sched_role = role
+        return None
+
+
+    def send_payload (self, section, node_id, request):
+        """
+        send a pre-computed JSON payload, already compressed with the
+        best encoding that the client accepts; payloads only change
+        with each pre-compute, so clients can revalidate them by ETag;
+        returns `None` if there is no payload for `node_id`
+        """
+        encoding = request.accept_encodings.best_match(self.net.PAYLOAD_ENCODINGS)
+        data = self.net.get_payload(section, node_id, encoding)
+
+        if data is None:
+            return None
+
+        response = make_response(data)
+        response.content_type = "application/json"
+        response.vary.add("Accept-Encoding")
+
+        if encoding:
+            response.content_encoding = encoding
+
+        response.set_etag("{}-{}-{}-{}".format(self.net.build_id, section, node_id, encoding or "identity"))
+        return response.make_conditional(request)
+
+
+    def get_entity_links (self, index, request):
         """
         render HTML for the link viewer for the entity referenced by
         `index`
         """
-        html = None
+        response = jsonify(None)
         status = HTTPStatus.BAD_REQUEST.value
 
         try:
@@ -230,16 +598,160 @@ class RCServerApp (Flask):
         if id >= 0 and id < len(self.net.id_list):
             uuid = self.net.id_list[id]
 
-            if uuid in self.net.auth:
-                html = self.net.render_auth(self.net.auth[uuid], rerank=session["last_node"])
+            if uuid in self.net.auth and session.get("last_node"):
+                radius = session.get("last_radius", self.DEFAULT_RADIUS)
+                html = self.get_reranked_links(id, session["last_node"], radius)
 
-            elif uuid in self.links:
-                html = self.links[uuid]
+                if html:
+                    response = jsonify(html)
+                    status = HTTPStatus.OK.value
 
-            if html:
+            else:
+                payload = self.send_payload("links", id, request)
+
+                if payload:
+                    response = payload
+                    status = payload.status_code
+
+        return response, status
+
+
+    def get_related (self, uuid, request):
+        """
+        rank the entities related to the entity referenced by `uuid`,
+        with the `k` and `epsilon` parameters from the HTTP request
+        """
+        response = None
+        status = HTTPStatus.BAD_REQUEST.value
+
+        try:
+            k = int(request.args.get("k", self.RELATED_K))
+            k = max(k, 1)
+            k = min(k, 100)
+        except:
+            k = self.RELATED_K
+
+        try:
+            epsilon = float(request.args.get("epsilon", self.RELATED_EPSILON))
+            epsilon = max(epsilon, 1e-7)
+            epsilon = min(epsilon, 1e-2)
+        except:
+            epsilon = self.RELATED_EPSILON
+
+        node_id = self.net.store.find_id(uuid)
+
+        if node_id is not None and node_id in self.net.graph:
+            key = (node_id, k, epsilon)
+            response = self.related_cache.get(key)
+
+            if response is None:
+                response = self.net.related_entities(node_id, k=k, epsilon=epsilon)
+                self.related_cache.put(key, response)
+
+            status = HTTPStatus.OK.value
+
+        return response, status
+
+
+    def get_similar (self, uuid, request):
+        """
+        find the entities most similar to the entity referenced by
+        `uuid`, with the `kind` and `k` parameters from the HTTP request
+        """
+        response = None
+        status = HTTPStatus.BAD_REQUEST.value
+
+        try:
+            k = int(request.args.get("k", self.RELATED_K))
+            k = max(k, 1)
+            k = min(k, 100)
+        except:
+            k = self.RELATED_K
+
+        node_id = self.net.store.find_id(uuid)
+
+        if node_id is not None and node_id in self.net.graph:
+            kind = request.args.get("kind", self.net.store.kind_of(node_id))
+
+            if kind in self.net.store.KIND_NAMES:
+                response = self.net.similar_entities(node_id, kind, k=k)
                 status = HTTPStatus.OK.value
 
-        return html, status
+        return response, status
+
+
+    def get_paths (self, uuid_a, uuid_b, request):
+        """
+        find the shortest paths between the entities referenced by
+        `uuid_a` and `uuid_b`, with the `k` parameter from the HTTP
+        request
+        """
+        response = None
+        status = HTTPStatus.BAD_REQUEST.value
+
+        try:
+            k = int(request.args.get("k", self.PATH_K))
+            k = max(k, 1)
+            k = min(k, 10)
+        except:
+            k = self.PATH_K
+
+        node_a = self.net.store.find_id(uuid_a)
+        node_b = self.net.store.find_id(uuid_b)
+
+        if node_a is not None and node_b is not None and node_a in self.net.graph and node_b in self.net.graph:
+            response = self.net.explain_paths(node_a, node_b, k=k, max_length=self.MAX_PATH_LENGTH)
+            status = HTTPStatus.OK.value
+
+        return response, status
+
+
+    def search_entities (self, request):
+        """
+        full-text search, with the `q`, `kind`, and `k` parameters from
+        the HTTP request
+        """
+        response = None
+        status = HTTPStatus.BAD_REQUEST.value
+
+        try:
+            k = int(request.args.get("k", self.RELATED_K))
+            k = max(k, 1)
+            k = min(k, 100)
+        except:
+            k = self.RELATED_K
+
+        query = request.args.get("q", "").strip()
+        kind = request.args.get("kind")
+
+        if query and (kind is None or kind in self.net.store.KIND_NAMES):
+            response = self.net.search_entities(query, k=k, kind=kind)
+            status = HTTPStatus.OK.value
+
+        return response, status
+
+
+    def get_cousage (self, uuid, request):
+        """
+        list the datasets most often cited together with the dataset
+        referenced by `uuid`, with the `k` parameter from the HTTP
+        request; returns 404 for UUIDs which aren't datasets
+        """
+        try:
+            k = int(request.args.get("k", self.RELATED_K))
+            k = max(k, 1)
+            k = min(k, 100)
+        except:
+            k = self.RELATED_K
+
+        if uuid in self.net.data:
+            response = self.net.get_cousage(self.net.store.find_id(uuid), k=k)
+            status = HTTPStatus.OK.value
+        else:
+            response = "no such dataset: {}".format(uuid)
+            status = HTTPStatus.NOT_FOUND.value
+
+        return response, status
 
 
     def extract_query_home (self, request):
@@ -267,39 +779,512 @@ class RCServerApp (Flask):
         return query
 
 
-    def run_entity_query (self, radius, entity):
+    @classmethod
+    def parse_radius (cls, radius):
         """
-        run a neighborhood query for the given entity and radius
+        validate the radius for a neighborhood query
         """
-        t0 = time.time()
-        entity = entity.strip()
-
         try:
             radius_val = int(radius)
             radius_val = max(radius_val, 1)
             radius_val = min(radius_val, 10)
         except:
-            radius_val = 2
+            radius_val = cls.DEFAULT_RADIUS
+
+        return radius_val
+
+
+    def query_keys (self, prefix, entities, radius_val):
+        """
+        construct the cache token for the diagram of a neighborhood
+        query, and the key for coalescing identical queries
+        """
+        cache_token = self.get_hash(entities + [ str(radius_val) ], prefix="hood-")
+        flight_key = "{}-{}-{}".format(prefix, self.net.build_id, cache_token)
+
+        return cache_token, flight_key
+
+
+    def admit_query (self, prefix, entities, radius_val):
+        """
+        cost-based admission control for a neighborhood query, using
+        the estimated neighborhood sizes: cheap queries run right away;
+        expensive ones take a slot in the slow lane, or else get
+        downgraded to a smaller radius; queries get rejected when the
+        slow lane is full and even a radius of 1 is too expensive;
+        joining an identical query already in flight costs nothing
+
+        returns the radius to use, or `None` if rejected, plus the
+        lease on the slow lane to release afterwards, if any
+        """
+        cost = self.net.query_cost(entities, radius_val)
+        lane = None
+        outcome = "fast"
+
+        if cost is not None and cost * self.COST_HEADROOM > self.SLOW_QUERY_COST:
+            cache_token, flight_key = self.query_keys(prefix, entities, radius_val)
+
+            if not (self.flight.in_flight(flight_key) or self.flight.in_flight("subgraph-" + flight_key)):
+                lane = self.slow_lane.acquire()
+
+                if lane:
+                    limit = self.MAX_QUERY_COST
+                    outcome = "slow"
+                else:
+                    limit = self.SLOW_QUERY_COST
+
+                requested = radius_val
+
+                while radius_val > 1 and self.net.query_cost(entities, radius_val) * self.COST_HEADROOM > limit:
+                    radius_val -= 1
+
+                if radius_val < requested:
+                    outcome = "downgraded"
+
+                if not lane and self.net.query_cost(entities, radius_val) * self.COST_HEADROOM > limit:
+                    radius_val = None
+                    outcome = "rejected"
+
+        with self.admission_lock:
+            self.admission[outcome] += 1
+
+        return radius_val, lane
+
+
+    def reject_query (self):
+        response = "too many expensive queries are running; try again later, or with a smaller radius"
+        status = HTTPStatus.SERVICE_UNAVAILABLE.value
+
+        return response, status
+
+
+    def parse_page (self, args):
+        """
+        validate the paging parameters of a neighborhood query;
+        returns `(kind, limit, cursor)`, or `None` for the whole
+        neighborhood; raises `ValueError` for a bad kind or cursor
+        """
+        kind = args.get("kind")
+
+        if kind is None:
+            return None
+        elif kind not in rc_server.RCNeighbors.KINDS:
+            raise ValueError(f"unknown kind of entity: {kind}")
+
+        try:
+            limit = int(args.get("limit", self.PAGE_LIMIT))
+            limit = max(limit, 1)
+            limit = min(limit, self.MAX_PAGE_LIMIT)
+        except:
+            limit = self.PAGE_LIMIT
+
+        cursor = args.get("cursor")
 
-        cache_token = self.get_hash([ entity, str(radius_val) ], prefix="hood-")
+        if cursor:
+            rc_server.RCNeighbors.decode_cursor(cursor)
+
+        return kind, limit, cursor
+
+
+    def query_subgraph (self, prefix, entities, radius_val, flight_key):
+        """
+        BFS for the subgraph of a neighborhood query; returns an empty
+        neighborhood to fill, the subgraph and hop distances, the node
+        ID of the (first) seed, and for a multi-seed query the nearest
+        seed of each node; identical concurrent queries share one BFS,
+        whether or not they get streamed
+        """
+        def compute ():
+            if prefix == "multi":
+                subgraph, paths, anchors, seeds, seed_dist = self.net.get_multi_subgraph(entities, radius_val)
+                node_id = next(iter([ str(self.net.store.find_id(uuid)) for uuid, title in seeds if uuid ]), str(None))
+            else:
+                subgraph, paths, node_id = self.net.get_subgraph(entities[0], radius_val)
+                anchors = seeds = seed_dist = None
+
+            return subgraph, paths, node_id, anchors, seeds, seed_dist
+
+        subgraph, paths, node_id, anchors, seeds, seed_dist = self.flight.do("subgraph-" + flight_key, compute)
+
+        hood = rc_server.RCNeighbors()
+        hood.seeds = seeds
+        hood.seed_dist = seed_dist
+
+        return hood, subgraph, paths, node_id, anchors
+
+
+    def run_query (self, prefix, entities, radius, encoding=rc_server.RCNeighbors.MIME_JSON, page=None):
+        """
+        run a neighborhood query for the given seed entities and
+        radius; `page` selects one page of the results for a kind of
+        entity, as returned by `parse_page()`; recent neighborhoods stay
+        cached so that paging through them doesn't need another BFS
+        """
+        t0 = time.time()
+        radius_val = self.parse_radius(radius)
+        cache_token, flight_key = self.query_keys(prefix, entities, radius_val)
+        cached = self.cached_hood(flight_key, cache_token)
+        lane = None
+
+        if cached is None:
+            radius_val, lane = self.admit_query(prefix, entities, radius_val)
+
+            if radius_val is None:
+                return self.reject_query()
+
+            cache_token, flight_key = self.query_keys(prefix, entities, radius_val)
+            cached = self.cached_hood(flight_key, cache_token)
+
+        if cached is not None:
+            if lane:
+                lane.release()
+
+            hood, node_id = cached
+
+        elif encoding == rc_server.RCNeighbors.MIME_NDJSON and not page:
+            # the stream releases the slow lane once it's sent
+            return self.stream_query(t0, prefix, entities, radius_val, cache_token, flight_key, lane)
+
+        else:
+            def compute ():
+                hood, subgraph, paths, node_id, anchors = self.query_subgraph(prefix, entities, radius_val, flight_key)
+
+                (hood, diagram), html = self.write_html(
+                    lambda html_path: self.net.extract_neighborhood(radius_val, subgraph, paths, node_id, html_path, anchors=anchors, hood=hood)
+                    )
+
+                self.disk_cache[cache_token] = html
+                self.save_frontier(prefix, entities, radius_val, cache_token, node_id, paths, hood, diagram)
+
+                return hood, node_id
+
+            # identical concurrent queries share one computation
+            try:
+                hood, node_id = self.flight.do(flight_key, compute)
+            finally:
+                if lane:
+                    lane.release()
+
+            self.hood_cache.put(flight_key, (hood, node_id))
+
+        session["last_node"] = node_id
+        session["last_radius"] = radius_val
+
+        if page:
+            response = hood.page(t0, cache_token, *page)
+        elif encoding == rc_server.RCNeighbors.MIME_NDJSON:
+            response = self.stream_records(t0, radius_val, cache_token, hood, hood.records(radius_val))
+        else:
+            response = hood.serialize(t0, cache_token, encoding=encoding)
+
+        status = HTTPStatus.OK.value
+
+        return response, status
+
+
+    def write_html (self, write):
+        """
+        call `write()` with the path of a temporary file for it to
+        write a network diagram; returns what it returns, plus the
+        HTML which it wrote, then removes the file
+        """
         handle, html_path = tempfile.mkstemp(suffix=".html", prefix="rc_hood", dir="/tmp")
+        os.close(handle)
+
+        try:
+            result = write(html_path)
+
+            with open(html_path, "r") as f:
+                html = f.read()
+        finally:
+            os.remove(html_path)
+
+        return result, html
+
+
+    def cached_hood (self, flight_key, cache_token):
+        """
+        a recently computed neighborhood, as long as its diagram is
+        still in the disk cache
+        """
+        cached = self.hood_cache.get(flight_key)
+
+        if cached is not None and cache_token in self.disk_cache:
+            return cached
+
+        return None
+
+
+    def stream_query (self, t0, prefix, entities, radius_val, cache_token, flight_key, lane):
+        """
+        compute a neighborhood while streaming it, one hop at a time,
+        so that clients can render the nearest entities before the
+        farther hops get ranked; concurrent streams of the same query
+        share its BFS; the diagram gets written, and the neighborhood
+        cached, once the last hop has been sent
+        """
+        try:
+            hood, subgraph, paths, node_id, anchors = self.query_subgraph(prefix, entities, radius_val, flight_key)
+        except:
+            if lane:
+                lane.release()
+            raise
 
-        subgraph, paths, node_id = self.net.get_subgraph(entity, radius_val)
-        hood = self.net.extract_neighborhood(radius_val, subgraph, paths, node_id, html_path)
         session["last_node"] = node_id
+        session["last_radius"] = radius_val
+
+        def entries ():
+            nodes = []
 
-        with open(html_path, "r") as f:
-            html = f.read()
+            for hop, kind, row, node in self.net.stream_neighborhood(radius_val, subgraph, paths, node_id, anchors=anchors):
+                getattr(hood, kind).append(row)
+                nodes.append((self.net.HOOD_KINDS.index(kind), node))
+                yield hop, kind, hood.row_record(row)
+
+            nodes = [ node for order, node in sorted(nodes, key=lambda x: (x[0], x[1][0])) ]
+            diagram, html = self.write_html(lambda html_path: self.net.write_diagram(nodes, subgraph, html_path))
             self.disk_cache[cache_token] = html
-    
-        os.remove(html_path)
 
-        response = hood.serialize(t0, cache_token)
+            self.hood_cache.put(flight_key, (hood, node_id))
+            self.save_frontier(prefix, entities, radius_val, cache_token, node_id, paths, hood, diagram)
+
+        response = self.stream_records(t0, radius_val, cache_token, hood, entries())
+
+        if lane:
+            response.call_on_close(lane.release)
+
+        return response, HTTPStatus.OK.value
+
+
+    def stream_records (self, t0, radius_val, cache_token, hood, entries):
+        """
+        NDJSON response for a neighborhood: a header record with the
+        radius (and seeds), one record per entity, then a trailer with
+        the cache token for the diagram
+        """
+        def generate ():
+            head = { "radius": radius_val }
+
+            if hood.seeds is not None:
+                head["seeds"] = hood.seeds
+
+            yield json.dumps(head, ensure_ascii=False) + "\n"
+            count = 0
+
+            for hop, kind, record in entries:
+                record["hop"] = hop
+                record["kind"] = kind
+                count += 1
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+
+            tail = {
+                "count": count,
+                "toke": cache_token,
+                "time": "{:.2f}".format((time.time() - t0) * 1000.0)
+                }
+
+            yield json.dumps(tail, ensure_ascii=False) + "\n"
+
+        response = Response(stream_with_context(generate()), mimetype=rc_server.RCNeighbors.MIME_NDJSON)
+
+        # otherwise nginx buffers the records until the response ends
+        response.headers["X-Accel-Buffering"] = "no"
+
+        return response
+
+
+    def save_frontier (self, prefix, entities, radius_val, cache_token, node_id, paths, hood, diagram):
+        """
+        keep the BFS state of a query in the disk cache, along with
+        the nodes drawn in its diagram and their positions, so that the
+        query can be expanded to a larger radius later; the state is
+        kept as arrays sorted by node ID, which `merge_frontier()`
+        extends for each expansion without sorting them again
+        """
+        import numpy as np
+
+        nodes = np.array(sorted(paths), dtype=np.int64)
+        diagram = sorted(diagram)
+        xy = np.array([ node[5:] for node in diagram ], dtype=np.float64).reshape(len(diagram), 2)
+
+        state = {
+            "build": self.net.build_id,
+            "prefix": prefix,
+            "entities": entities,
+            "radius": radius_val,
+            "node_id": node_id,
+            "seeds": hood.seeds,
+            "nodes": nodes,
+            "dist": np.array([ paths[i] for i in nodes.tolist() ], dtype=np.int8),
+            "seed_dist": None,
+            "drawn": np.array([ node[0] for node in diagram ], dtype=np.int64),
+            "xy": xy,
+            "center": xy.mean(axis=0) if len(xy) > 0 else np.zeros(2)
+            }
+
+        # for a multi-seed query, the distance from each seed
+        if hood.seeds is not None:
+            state["seed_dist"] = np.array([ hood.seed_dist[i] for i in nodes.tolist() ], dtype=np.int8).reshape(len(nodes), len(hood.seeds))
+
+        self.disk_cache.set("frontier-" + cache_token, state, expire=self.FRONTIER_EXPIRE)
+
+
+    def merge_frontier (self, state, radius_val, added, updated, placed):
+        """
+        the BFS state of an expanded query: the nodes `added`, plus
+        those multi-seed distances `updated`, and the diagram nodes
+        `placed`, get inserted into the sorted arrays of the `state` in
+        one pass each
+        """
+        import numpy as np
+
+        state = dict(state, radius=radius_val)
+
+        new_ids = np.array(sorted(added), dtype=np.int64)
+        pos = np.searchsorted(state["nodes"], new_ids)
+
+        if state["seed_dist"] is not None:
+            seed_dist = state["seed_dist"].copy()
+            ids = np.array(sorted(updated), dtype=np.int64)
+            upd_pos, found = self.net.graph.find_sorted(state["nodes"], ids)
+            seed_dist[upd_pos[found]] = [ updated[i] for i in ids[found].tolist() ]
+
+            rows = np.array([ updated[i] for i in new_ids.tolist() ], dtype=np.int8).reshape(len(new_ids), seed_dist.shape[1])
+            state["seed_dist"] = np.insert(seed_dist, pos, rows, axis=0)
+
+        state["nodes"] = np.insert(state["nodes"], pos, new_ids)
+        state["dist"] = np.insert(state["dist"], pos, [ added[i] for i in new_ids.tolist() ])
+
+        if placed:
+            drawn_ids = np.array(sorted(placed), dtype=np.int64)
+            xy = np.array([ placed[i] for i in drawn_ids.tolist() ], dtype=np.float64)
+
+            count = len(state["drawn"])
+            state["center"] = (state["center"] * count + xy.sum(axis=0)) / (count + len(xy))
+
+            pos = np.searchsorted(state["drawn"], drawn_ids)
+            state["drawn"] = np.insert(state["drawn"], pos, drawn_ids)
+            state["xy"] = np.insert(state["xy"], pos, xy, axis=0)
+
+        return state
+
+
+    def expand_query (self, cache_token, radius):
+        """
+        expand a previous neighborhood query, referenced by its cache
+        token, out to a larger radius: the BFS continues from where the
+        query left off, from each seed of a multi-seed query, and only
+        the entities, diagram nodes, and edges which get added are
+        ranked and returned, so that a viewer can merge them into what
+        it already shows; the diagram itself doesn't get rendered again
+
+        the radius must be larger than before, otherwise it's a bad
+        request; if admission control would downgrade the radius to
+        no larger than before, the expansion gets rejected instead
+        """
+        t0 = time.time()
+        state = self.disk_cache.get("frontier-" + cache_token)
+
+        if state is None or state["build"] != self.net.build_id:
+            response = "unknown or expired query token; run the query again"
+            status = HTTPStatus.NOT_FOUND.value
+            return response, status
+
+        prefix = state["prefix"]
+        entities = state["entities"]
+        node_id = state["node_id"]
+        radius_val = self.parse_radius(radius)
+
+        if radius_val <= state["radius"]:
+            response = "expected a radius larger than {}".format(state["radius"])
+            status = HTTPStatus.BAD_REQUEST.value
+            return response, status
+
+        radius_val, lane = self.admit_query(prefix, entities, radius_val)
+
+        if radius_val is not None and radius_val <= state["radius"]:
+            # downgraded to nothing new
+            if lane:
+                lane.release()
+
+            radius_val = None
+
+        if radius_val is None:
+            return self.reject_query()
+
+        hood = rc_server.RCNeighbors()
+        hood.seeds = state["seeds"]
+        nodes = state["nodes"]
+
+        try:
+            if hood.seeds is not None:
+                added, anchors, updated = self.net.extend_multi_subgraph(hood.seeds, nodes, state["seed_dist"], state["radius"], radius_val)
+                hood.seed_dist = updated
+            else:
+                frontier = nodes[state["dist"] == state["radius"]]
+                added = self.net.graph.extend_bfs(nodes, frontier, state["radius"], depth_limit=radius_val)
+                anchors = None
+                updated = {}
+
+            entries, edges, placed = self.net.expand_neighborhood(added, nodes, node_id, radius_val, state["drawn"], state["xy"], state["center"], anchors=anchors)
+        finally:
+            if lane:
+                lane.release()
+
+        expand_token, flight_key = self.query_keys(prefix, entities, radius_val)
+        self.disk_cache.set("frontier-" + expand_token, self.merge_frontier(state, radius_val, added, updated, placed), expire=self.FRONTIER_EXPIRE)
+
+        session["last_node"] = node_id
+        session["last_radius"] = radius_val
+
+        for kind, row, node in entries:
+            getattr(hood, kind).append(row)
+
+        view = { kind: hood.sorted_rows(kind) for kind in hood.KINDS }
+
+        # seed distances for the added entities, plus any entities
+        # which another seed now reaches
+        if hood.seeds is not None:
+            view["seeds"] = hood.seeds
+            view["dist"] = { i: hood.seed_dist[i] for i in sorted(updated) }
+            view["shared"] = sorted([ i for i in updated if hood.is_shared(i) ])
+
+        view["radius"] = radius_val
+        view["from"] = state["radius"]
+        view["nodes"] = [ list(node) + placed[node[0]] for kind, row, node in entries ]
+        view["edges"] = [ [ u, v ] for u, v, weight in edges ]
+        view["toke"] = expand_token
+        view["time"] = "{:.2f}".format((time.time() - t0) * 1000.0)
+
+        response = json.dumps(view, indent=4, sort_keys=True, ensure_ascii=False)
         status = HTTPStatus.OK.value
 
         return response, status
 
 
+    def run_entity_query (self, radius, entity, encoding=rc_server.RCNeighbors.MIME_JSON, page=None):
+        """
+        run a neighborhood query for the given entity and radius
+        """
+        return self.run_query("query", [ entity.strip() ], radius, encoding=encoding, page=page)
+
+
+    def run_multi_query (self, radius, entities, encoding=rc_server.RCNeighbors.MIME_JSON, page=None):
+        """
+        run one neighborhood query for the union of several seed
+        entities within the given radius, annotated with the distance
+        from each seed
+        """
+        entities = [ e.strip() for e in entities if e.strip() ]
+
+        if len(entities) < 1 or len(entities) > self.MAX_SEEDS:
+            response = f"expected between 1 and {self.MAX_SEEDS} entities"
+            status = HTTPStatus.BAD_REQUEST.value
+            return response, status
+
+        return self.run_query("multi", entities, radius, encoding=encoding, page=page)
+
+
     def fetch_graph (self, cache_token):
         """
         fetch the HTML to render the graph diagram referenced by the
@@ -317,6 +1302,8 @@ class RCServerApp (Flask):
 
 
 APP = RCServerApp(__name__)
+# trust the client address which the nginx proxy forwards
+APP.wsgi_app = ProxyFix(APP.wsgi_app, x_for=1, x_proto=1)
 CACHE = Cache(APP, config={"CACHE_TYPE": "simple"})
 CORS(APP)
 
@@ -331,11 +1318,39 @@ def update_session ():
     if not "uuid" in session:
         session["uuid"] = uuid.uuid4().hex
 
-    try:
-        session["counter"] += 1
-    except KeyError:
-        session["counter"] = 1
-        session.permanent = True
+    try:
+        session["counter"] += 1
+    except KeyError:
+        session["counter"] = 1
+        session.permanent = True
+
+
+######################################################################
+## request scheduling
+
+# the pre-computed payloads cost less to serve than to schedule
+UNSCHEDULED_ROUTES = set([
+    "api_metrics", "conf_post_web_token",
+    "api_lookup_entity", "api_entity_links", "api_entity_phrases"
+    ])
+
+# the rate limits which hold across all of the workers
+SHARED_LIMIT_ROUTES = set([
+    "api_entity_query", "api_multi_query", "api_expand_query", "api_export_table"
+    ])
+
+@APP.before_request
+def schedule_api_request ():
+    if request.path.startswith("/api/") and request.endpoint not in UNSCHEDULED_ROUTES:
+        return APP.schedule_request(shared=(request.endpoint in SHARED_LIMIT_ROUTES))
+
+
+@APP.teardown_request
+def release_api_request (exc):
+    role = g.pop("sched_role", None)
+
+    if role:
+        APP.scheduler.release(role)
 
 
 @APP.route("/dump/session/")
@@ -455,12 +1470,23 @@ API_TEMPLATE = {
     }
 
 
-SWAGGER = Swagger(APP, template=API_TEMPLATE)
-
 
 ######################################################################
 ## API routes
 
+def query_headers (status):
+    """
+    report the radius used for a neighborhood query, which admission
+    control may have downgraded, or when to retry a rejected query
+    """
+    if status == HTTPStatus.OK.value:
+        return { "X-RC-Radius": str(session.get("last_radius", APP.DEFAULT_RADIUS)) }
+    elif status == HTTPStatus.SERVICE_UNAVAILABLE.value:
+        return { "Retry-After": str(APP.RETRY_AFTER) }
+    else:
+        return {}
+
+
 @CACHE.cached(timeout=3000)
 @APP.route("/api/v1/lookup/<entity>", methods=["GET"])
 def api_lookup_entity (entity):
@@ -485,6 +1511,11 @@ def api_lookup_entity (entity):
         description: bad request; is the entity UUID correct?
     """
     update_session()
+    payload = APP.send_payload("lookup", APP.net.store.find_id(entity), request)
+
+    if payload:
+        return payload, payload.status_code
+
     response = APP.net.lookup_entity(entity)
 
     if not response:
@@ -535,15 +1566,163 @@ def api_entity_query (radius, entity):
         required: true
         type: string
         description: entity name to search
+      - name: kind
+        in: query
+        required: false
+        type: string
+        enum: [prov, data, publ, jour, auth, topi]
+        description: get one page of the results, for this kind of entity
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        description: rows per page, up to 500 (default 50)
+      - name: cursor
+        in: query
+        required: false
+        type: string
+        description: the `next` cursor from the previous page
     produces:
       - application/json
+      - application/vnd.richcontext.columnar+json
+      - application/msgpack
+      - application/x-ndjson
     responses:
       '200':
-        description: neighborhood search within the knowledge graph
+        description: neighborhood search within the knowledge graph, or one page of it with a cursor for the next page; as NDJSON, the entities stream one hop at a time, nearest first; the X-RC-Radius header gives the radius used, which may be smaller for expensive queries
+      '400':
+        description: bad request; is the kind or cursor correct?
+      '503':
+        description: too many expensive queries are running
     """
     update_session()
-    response, status = APP.run_entity_query(radius, entity)
-    return response, status
+    encodings = rc_server.RCNeighbors.ENCODINGS
+    encoding = request.accept_mimetypes.best_match(encodings, default=encodings[0])
+
+    try:
+        page = APP.parse_page(request.args)
+    except ValueError as e:
+        return str(e), HTTPStatus.BAD_REQUEST.value
+
+    if page:
+        encoding = rc_server.RCNeighbors.MIME_JSON
+
+    response, status = APP.run_entity_query(radius, entity, encoding=encoding, page=page)
+
+    if status == HTTPStatus.OK.value and encoding != rc_server.RCNeighbors.MIME_JSON:
+        response = make_response(response)
+        response.content_type = encoding
+
+    return response, status, query_headers(status)
+
+
+@APP.route("/api/v1/query/<radius>", methods=["GET"])
+def api_multi_query (radius):
+    """
+    query the union of the subgraphs for several entities
+    ---
+    tags:
+      - web_app
+    description: 'query with a radius near several entities at once, using one multi-source BFS'
+    parameters:
+      - name: radius
+        in: path
+        required: true
+        type: integer
+        description: radius for BFS neighborhood
+      - name: entity
+        in: query
+        required: true
+        type: array
+        items:
+          type: string
+        collectionFormat: multi
+        description: entity names to search, up to 16
+      - name: kind
+        in: query
+        required: false
+        type: string
+        enum: [prov, data, publ, jour, auth, topi]
+        description: get one page of the results, for this kind of entity
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        description: rows per page, up to 500 (default 50)
+      - name: cursor
+        in: query
+        required: false
+        type: string
+        description: the `next` cursor from the previous page
+    produces:
+      - application/json
+      - application/vnd.richcontext.columnar+json
+      - application/msgpack
+      - application/x-ndjson
+    responses:
+      '200':
+        description: union of the neighborhoods, with the distance from each seed entity and the nodes they share, or one page of it; as NDJSON, the entities stream one hop at a time; the X-RC-Radius header gives the radius used
+      '400':
+        description: bad request; are there too many entities, or is the kind or cursor wrong?
+      '503':
+        description: too many expensive queries are running
+    """
+    update_session()
+    encodings = rc_server.RCNeighbors.ENCODINGS
+    encoding = request.accept_mimetypes.best_match(encodings, default=encodings[0])
+
+    try:
+        page = APP.parse_page(request.args)
+    except ValueError as e:
+        return str(e), HTTPStatus.BAD_REQUEST.value
+
+    if page:
+        encoding = rc_server.RCNeighbors.MIME_JSON
+
+    response, status = APP.run_multi_query(radius, request.args.getlist("entity"), encoding=encoding, page=page)
+
+    if status == HTTPStatus.OK.value and encoding != rc_server.RCNeighbors.MIME_JSON:
+        response = make_response(response)
+        response.content_type = encoding
+
+    return response, status, query_headers(status)
+
+
+@APP.route("/api/v1/expand/<token>/<radius>", methods=["GET"])
+def api_expand_query (token, radius):
+    """
+    expand a previous query to a larger radius
+    ---
+    tags:
+      - web_app
+    description: 'continue the BFS of a previous entity or multi-seed query out to a larger radius, returning only what gets added, for a viewer to merge into the diagram it shows, with the nodes already drawn left in place; the new `toke` can be expanded again, but has no diagram of its own for `/graph`'
+    parameters:
+      - name: token
+        in: path
+        required: true
+        type: string
+        description: the `toke` returned by the previous query or expansion
+      - name: radius
+        in: path
+        required: true
+        type: integer
+        description: new radius for BFS neighborhood
+    produces:
+      - application/json
+    responses:
+      '200':
+        description: the entities added to the neighborhood, ranked at the new radius, plus their diagram nodes `[id, label, title, color, size, x, y]` and the edges which touch them; the proximity of the entities already shown increases by the difference in radius; for a multi-seed query, the distances from each seed to the entities added, or newly reached by another seed
+      '400':
+        description: bad request; is the radius larger than before?
+      '404':
+        description: the query token is unknown or has expired
+      '503':
+        description: too many expensive queries are running, including when the radius would get downgraded to no larger than before
+    """
+    update_session()
+    response, status = APP.expand_query(token, radius)
+
+    return response, status, query_headers(status)
 
 
 @CACHE.cached(timeout=3000)
@@ -570,8 +1749,190 @@ def api_entity_links (index):
         description: bad request; is the `index` parameter valid?
     """
     update_session()
-    html, status = APP.get_entity_links(index)
-    return jsonify(html), status
+    response, status = APP.get_entity_links(index, request)
+    return response, status
+
+
+@APP.route("/api/v1/related/<entity>", methods=["GET"])
+def api_related_entities (entity):
+    """
+    rank the entities related to a given entity
+    ---
+    tags:
+      - knowledge_graph
+    description: 'rank related entities by personalized PageRank, approximated with local push'
+    parameters:
+      - name: entity
+        in: path
+        required: true
+        type: string
+        description: entity UUID
+      - name: k
+        in: query
+        required: false
+        type: integer
+        description: number of related entities of each kind (default 10)
+      - name: epsilon
+        in: query
+        required: false
+        type: number
+        description: approximation tolerance; smaller values are more accurate but slower (default 1e-5)
+    produces:
+      - application/json
+    responses:
+      '200':
+        description: top related providers, datasets, publications, journals, authors, and topics, with scores
+      '400':
+        description: bad request; is the entity UUID correct?
+    """
+    update_session()
+    response, status = APP.get_related(entity, request)
+    return jsonify(response), status
+
+
+@APP.route("/api/v1/similar/<entity>", methods=["GET"])
+def api_similar_entities (entity):
+    """
+    find the entities most similar to a given entity
+    ---
+    tags:
+      - knowledge_graph
+    description: 'nearest neighbors of an entity by its graph embedding'
+    parameters:
+      - name: entity
+        in: path
+        required: true
+        type: string
+        description: entity UUID
+      - name: kind
+        in: query
+        required: false
+        type: string
+        enum: [ prov, data, publ, jour, auth, topi ]
+        description: kind of entities to return (default is the same kind as the given entity)
+      - name: k
+        in: query
+        required: false
+        type: integer
+        description: number of similar entities (default 10)
+    produces:
+      - application/json
+    responses:
+      '200':
+        description: most similar entities, with their cosine similarity
+      '400':
+        description: bad request; are the entity UUID and kind correct?
+    """
+    update_session()
+    response, status = APP.get_similar(entity, request)
+    return jsonify(response), status
+
+
+@APP.route("/api/v1/path/<entity_a>/<entity_b>", methods=["GET"])
+def api_entity_paths (entity_a, entity_b):
+    """
+    explain how two entities are connected
+    ---
+    tags:
+      - knowledge_graph
+    description: 'the shortest paths between two entities in the knowledge graph'
+    parameters:
+      - name: entity_a
+        in: path
+        required: true
+        type: string
+        description: UUID of the entity where the paths start
+      - name: entity_b
+        in: path
+        required: true
+        type: string
+        description: UUID of the entity where the paths end
+      - name: k
+        in: query
+        required: false
+        type: integer
+        description: number of paths (default 3)
+    produces:
+      - application/json
+    responses:
+      '200':
+        description: paths in order of length, each a list of entities as UUID, kind, and title; empty if the entities are not connected within 10 hops
+      '400':
+        description: bad request; are the entity UUIDs correct?
+    """
+    update_session()
+    response, status = APP.get_paths(entity_a, entity_b, request)
+    return jsonify(response), status
+
+
+@APP.route("/api/v1/cousage/<entity>", methods=["GET"])
+def api_dataset_cousage (entity):
+    """
+    list the datasets used together with a given dataset
+    ---
+    tags:
+      - knowledge_graph
+    description: 'datasets most often cited together with a dataset in the same publications'
+    parameters:
+      - name: entity
+        in: path
+        required: true
+        type: string
+        description: dataset UUID
+      - name: k
+        in: query
+        required: false
+        type: integer
+        description: number of datasets (default 10)
+    produces:
+      - application/json
+    responses:
+      '200':
+        description: co-used datasets, with the number of publications citing both and a point estimate of the conditional probability
+      '404':
+        description: no dataset has this UUID
+    """
+    update_session()
+    response, status = APP.get_cousage(entity, request)
+    return jsonify(response), status
+
+
+@APP.route("/api/v1/search", methods=["GET"])
+def api_search_entities ():
+    """
+    full-text search over entity titles and publication abstracts
+    ---
+    tags:
+      - knowledge_graph
+    description: 'full-text search ranked by BM25; matches every word, "quoted phrase", or prefix* in the query'
+    parameters:
+      - name: q
+        in: query
+        required: true
+        type: string
+        description: search query
+      - name: kind
+        in: query
+        required: false
+        type: string
+        enum: [ prov, data, publ, jour, auth, topi ]
+        description: kind of entities to return (default is all)
+      - name: k
+        in: query
+        required: false
+        type: integer
+        description: number of results (default 10)
+    produces:
+      - application/json
+    responses:
+      '200':
+        description: ranked hits, with the UUID, kind, title, and score of each entity
+      '400':
+        description: bad request; are the query and kind correct?
+    """
+    update_session()
+    response, status = APP.search_entities(request)
+    return jsonify(response), status
 
 
 @APP.route("/api/v1/conf_web_token/", methods=["POST"])
@@ -651,7 +2012,8 @@ def api_download_links (entity):
         status = HTTPStatus.BAD_REQUEST.value
 
     else:
-        data_rows, data_name = APP.net.download_links(entity)
+        flight_key = "download-{}-{}".format(APP.net.build_id, entity)
+        data_rows, data_name = APP.flight.do(flight_key, lambda: APP.net.download_links(entity))
         filename = "export-{}.csv".format(data_name)
 
         response = make_response(data_rows)
@@ -663,6 +2025,102 @@ def api_download_links (entity):
     return response, status
 
 
+@APP.route("/api/v1/facets", methods=["GET"])
+def api_facet_query ():
+    """
+    filter the publications by facets
+    ---
+    tags:
+      - knowledge_graph
+    description: 'filter the publications by the datasets, topics, journals, authors, and providers which they link to, with facet counts'
+    parameters:
+      - name: all
+        in: query
+        required: false
+        type: array
+        items:
+          type: string
+        collectionFormat: multi
+        description: entity UUIDs which the publications must all link to (AND)
+      - name: any
+        in: query
+        required: false
+        type: array
+        items:
+          type: string
+        collectionFormat: multi
+        description: entity UUIDs, at least one of which the publications must link to (OR)
+      - name: not
+        in: query
+        required: false
+        type: array
+        items:
+          type: string
+        collectionFormat: multi
+        description: entity UUIDs which the publications must not link to (NOT)
+      - name: offset
+        in: query
+        required: false
+        type: integer
+        description: skip this many publications (default 0)
+      - name: limit
+        in: query
+        required: false
+        type: integer
+        description: publications per page, up to 500 (default 50)
+    produces:
+      - application/json
+    responses:
+      '200':
+        description: the number of matching publications, a page of them in descending order of impact, and the top facets of each kind among them with their counts
+      '400':
+        description: bad request; is each UUID a dataset, topic, journal, author, or provider?
+    """
+    update_session()
+    response, status = APP.run_facet_query(request.args)
+
+    if status == HTTPStatus.OK.value:
+        response = jsonify(response)
+
+    return response, status
+
+
+@APP.route("/api/v1/export/<table>", methods=["GET"])
+def api_export_table (table):
+    """
+    download a table of the KG, in a columnar format
+    ---
+    tags:
+      - knowledge_graph
+    description: 'download a table of the KG as Parquet or Arrow IPC, for loading with vectorized readers'
+    parameters:
+      - name: table
+        in: path
+        required: true
+        type: string
+        enum: [prov, data, publ, jour, auth, topi, edges, scale, mle, cousage]
+        description: the entities of one kind, the weighted edges, the scale and impact of each entity, the MLE table, or dataset co-usage
+      - name: format
+        in: query
+        required: false
+        type: string
+        enum: [parquet, arrow]
+        description: file format (default parquet)
+    produces:
+      - application/vnd.apache.parquet
+      - application/vnd.apache.arrow.file
+    responses:
+      '200':
+        description: the exported table
+      '400':
+        description: bad request; is the table or format correct?
+      '404':
+        description: the table has not been exported for the current build
+    """
+    update_session()
+    return APP.send_export(table, request.args.get("format", "parquet"))
+
+
 @CACHE.cached(timeout=3000)
 @APP.route("/graph/<cache_token>", methods=["GET"])
 def fetch_graph_html (cache_token):
@@ -674,6 +2132,34 @@ def fetch_graph_html (cache_token):
     return response, status
 
 
+@APP.route("/api/v1/metrics", methods=["GET"])
+def api_metrics ():
+    """
+    report load metrics for this worker
+    ---
+    tags:
+      - web_app
+    description: 'counts of neighborhood queries by admission outcome, including those shed by downgrading or rejecting them, the slow queries running across the workers, and of coalesced requests; plus the queue depth, active requests, rate limiting, and wait times for API requests by role'
+    produces:
+      - application/json
+    responses:
+      '200':
+        description: load metrics
+    """
+    with APP.admission_lock:
+        admission = dict(APP.admission)
+
+    admission["slow_lane"] = APP.slow_lane.held()
+
+    response = {
+        "admission": admission,
+        "flight": { "leaders": APP.flight.leaders, "followers": APP.flight.followers },
+        "scheduler": APP.scheduler.metrics()
+        }
+
+    return jsonify(response), HTTPStatus.OK.value
+
+
 ######################################################################
 ## main
 
@@ -681,22 +2167,37 @@ def main (args):
     """
     dev/test entry point
     """
-    global APP
-
-    if args.token:
+    if args.export:
+        # export the KG tables, to serve through the API
+        APP.load_network()
+        manifest = APP.export_tables(args.export)
+        print(json.dumps(manifest, indent=4))
+
+    elif args.batch:
+        # run offline batch queries, then report the throughput
+        APP.load_network()
+        report = APP.run_batch(args.batch, args.out, workers=args.workers)
+        print(json.dumps(report, indent=4))
+
+    elif args.token:
         # generate a list of web tokens based on an input file
         APP.generate_tokens(args.token)
 
     elif args.pre:
         # pre-compute KG links as the `precomp.json` file
         print(f"pre-computing links with: {args.corpus}")
-        APP = RCServerApp(__name__, no_load=True)
         APP.corpus_path = Path(args.corpus)
         links = APP.build_links()
         APP.net.serialize(links)
 
+    elif args.warm > 0:
+        # pre-render reranked links into the shared disk cache
+        APP.load_network()
+        APP.warm_reranked_links(args.warm)
+
     else:
         # run the app in a test environment
+        APP.setup_serve()
         APP.run(host="0.0.0.0", port=args.port, debug=True)
 
 
@@ -734,4 +2235,40 @@ if __name__ == "__main__":
         help="input TSV file for generating web tokens"
         )
 
+    parser.add_argument(
+        "--warm",
+        type=int,
+        default=APP.DEFAULT_WARM,
+        help="pre-render reranked author links for the N highest ranked datasets"
+        )
+
+    parser.add_argument(
+        "--export",
+        type=str,
+        default=APP.DEFAULT_EXPORT,
+        choices=[ "parquet", "arrow" ],
+        help="export the KG tables as Parquet or Arrow IPC files"
+        )
+
+    parser.add_argument(
+        "--batch",
+        type=str,
+        default=APP.DEFAULT_BATCH,
+        help="input TSV file of batch queries to run offline"
+        )
+
+    parser.add_argument(
+        "--out",
+        type=str,
+        default=APP.DEFAULT_BATCH_OUT,
+        help="output file for batch results, as NDJSON or .parquet"
+        )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=APP.DEFAULT_WORKERS,
+        help="processes for batch queries, 0 for one per CPU"
+        )
+
     main(parser.parse_args())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+benchmark rendering the link fragments: the templates compiled during
+pre-compute, as the web app loads them, against the minify pass which
+used to run over each rendered fragment; also checks that both give
+the same HTML
+"""
+
+from jinja2 import Environment, FileSystemLoader
+from pathlib import Path
+from richcontext.server import RCNetwork
+from richcontext.server.precompute import RCNetworkBuilder
+from richcontext.server.render import RCMinifyLoader
+import argparse
+import sys
+import tempfile
+import timeit
+
+
+def minify_rendered (template, kwargs):
+    """
+    the minify pass which used to run over each rendered link fragment
+    """
+    return RCMinifyLoader.minify_html(template.render(kwargs))
+
+
+def capture_renders (builder):
+    """
+    the template name and values for each link fragment which
+    pre-compute renders
+    """
+    calls = []
+    render_template = builder.render_template
+
+    def capture (template, **kwargs):
+        calls.append(( template.name, kwargs ))
+        return render_template(template, **kwargs)
+
+    builder.render_template = capture
+
+    try:
+        builder.render_links()
+    finally:
+        del builder.render_template
+
+    return calls
+
+
+def main (args):
+    builder = RCNetworkBuilder()
+    builder.setup_render(args.templates)
+    builder.load_network(Path(args.corpus))
+    calls = capture_renders(builder)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        compiled_path = Path(tmp_dir) / "precomp.templates.zip"
+        builder.compile_templates(compiled_path)
+
+        net = RCNetwork()
+        net.setup_render(args.templates, compiled_path=compiled_path)
+        compiled = [ ( net.get_template(args.templates, name, compiled_path), kwargs ) for name, kwargs in calls ]
+
+    env = Environment(loader=FileSystemLoader(args.templates))
+    source = [ ( env.get_template(name), kwargs ) for name, kwargs in calls ]
+
+    same = all([
+        net.render_template(c, **kwargs) == minify_rendered(s, kwargs)
+        for (c, kwargs), (s, _) in zip(compiled, source)
+        ])
+
+    def time_renders (render, templates):
+        t = min(timeit.repeat(lambda: [ render(t, kwargs) for t, kwargs in templates ], number=args.number, repeat=3))
+        return t / args.number / len(templates) * 1000.0
+
+    old_ms = time_renders(minify_rendered, source)
+    new_ms = time_renders(lambda t, kwargs: net.render_template(t, **kwargs), compiled)
+
+    print("{} link fragments from {}".format(len(calls), args.corpus))
+    print("{:28} {:8.3f} ms".format("minify each render", old_ms))
+    print("{:28} {:8.3f} ms  ({:.1f}x)".format("compiled templates", new_ms, old_ms / new_ms))
+    print("{:28} {}".format("same HTML", "ok" if same else "FAIL"))
+
+    return 0 if same and new_ms < old_ms else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rich Context: link rendering benchmark"
+        )
+
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        default="min_kg.jsonld",
+        help="KG to render"
+        )
+
+    parser.add_argument(
+        "--templates",
+        type=str,
+        default="templates",
+        help="template folder"
+        )
+
+    parser.add_argument(
+        "--number",
+        type=int,
+        default=20,
+        help="renders of each fragment per timing"
+        )
+
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+benchmark the startup of the command line and the cold start of a web
+worker: each step runs in a fresh interpreter, with the median over
+several runs compared against its target; also checks that no heavy
+pre-compute dependencies get imported by the serve runtime, nor the
+serve-only dependencies by the command line
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+HEAVY_MODULES = [ "networkx", "pandas", "scipy.stats", "pyvis", "IPython", "css_html_js_minify" ]
+SERVE_MODULES = [ "flasgger", "msgpack" ]
+
+STEPS = [
+    # name, setup, code to time, target in ms, modules which mustn't load
+    ( "import richcontext.server", "", "import richcontext.server", 500.0, HEAVY_MODULES ),
+    ( "load link templates", "from richcontext.server import RCNetwork", "RCNetwork().setup_render('templates')", 50.0, HEAVY_MODULES ),
+    ( "CLI startup", "", "sys.argv = [ 'app.py' ]; import app", 400.0, HEAVY_MODULES + SERVE_MODULES ),
+    ( "worker cold start", "", "import wsgi", 1500.0, HEAVY_MODULES ),
+    ]
+
+PROBE = """
+import json, sys, time
+{}
+t0 = time.perf_counter()
+{}
+elapsed = (time.perf_counter() - t0) * 1000.0
+print(json.dumps([ elapsed, [ m for m in {} if m in sys.modules ] ]))
+"""
+
+
+def run_step (setup, code, modules, runs):
+    """
+    time `code` after `setup` in `runs` fresh interpreters, returning
+    the median in ms and which of the heavy `modules` got imported
+    """
+    times = []
+    heavy = set([])
+
+    for _ in range(runs):
+        probe = PROBE.format(setup, code, json.dumps(modules))
+        out = subprocess.run([ sys.executable, "-c", probe ], capture_output=True, text=True, check=True)
+        elapsed, loaded = json.loads(out.stdout.strip().split("\n")[-1])
+
+        times.append(elapsed)
+        heavy.update(loaded)
+
+    return statistics.median(times), sorted(heavy)
+
+
+def main (args):
+    passed = True
+
+    for name, setup, code, target, modules in STEPS:
+        elapsed, heavy = run_step(setup, code, modules, args.runs)
+        ok = elapsed <= target and not heavy
+        passed = passed and ok
+
+        print("{:28} {:8.1f} ms  (target {:6.0f} ms)  {}".format(name, elapsed, target, "ok" if ok else "FAIL"))
+
+        if heavy:
+            print("    heavy imports: {}".format(", ".join(heavy)))
+
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rich Context: startup benchmark"
+        )
+
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="fresh interpreters per step"
+        )
+
+    sys.exit(main(parser.parse_args()))
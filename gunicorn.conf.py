@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# gunicorn loads this from the working directory
+
+import os
+
+
+def on_starting (server):
+    # the web app splits its concurrency limits across the workers
+    # which `WEB_CONCURRENCY` counts, see `RCServerApp.worker_share()`,
+    # so pass on the number of workers that gunicorn runs, whether
+    # from `WEB_CONCURRENCY` or `--workers`; the workers load the app
+    # after this, unless launched with `--preload`
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
@@ -1,2 +1,8 @@
+from .anf import RCNeighborhoodSizes
+from .batch import RCBatchRunner
+from .cache import RCLRUCache
+from .export import RCExporter
+from .flight import RCSingleFlight, RCSharedSemaphore
+from .sched import RCRateLimiter, RCScheduler, RCTokenBucket
 from .server import RCNetwork, RCNeighbors
-
+from .store import RCEntityStore
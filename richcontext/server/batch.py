@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from http import HTTPStatus
+from pathlib import Path
+import codecs
+import csv
+import json
+import multiprocessing
+import numpy as np
+import os
+import time
+import traceback
+
+
+# the runner which the forked pool processes inherit; the pool always
+# forks, whatever the default start method, since spawned processes
+# would see `None` here and have to load the network again
+RUNNER = None
+
+
+def run_job (job):
+    """
+    run one batch query in a pool process
+    """
+    return RUNNER.run_job(job)
+
+
+class RCBatchRunner:
+    """
+    run neighborhood queries and lookups offline, across a pool of
+    processes which get forked after the network has been loaded, so
+    that they share its memory-mapped arrays
+    """
+    CHUNK = 16	# batch queries handed to a process at a time
+
+    def __init__ (self, net, parse_radius, default_radius):
+        self.net = net
+        self.parse_radius = parse_radius
+        self.default_radius = default_radius
+
+
+    def run_job (self, job):
+        """
+        run one batch query, given as `(line, kind, entity, radius)`:
+        either a neighborhood query for an entity title, without the
+        diagram, or a lookup for an entity UUID
+        """
+        line, kind, entity, radius = job
+        t0 = time.time()
+
+        record = {
+            "line": line,
+            "kind": kind,
+            "entity": entity,
+            "radius": None,
+            "status": HTTPStatus.OK.value,
+            "result": None
+            }
+
+        try:
+            if kind == "query":
+                radius_val = self.parse_radius(radius)
+                subgraph, paths, node_id = self.net.get_subgraph(entity, radius_val)
+                hood = self.net.rank_neighborhood(radius_val, subgraph, paths, node_id)
+
+                record["radius"] = radius_val
+                record["result"] = { k: [ hood.row_record(r) for r in hood.sorted_rows(k) ] for k in hood.KINDS }
+
+            elif kind == "lookup":
+                record["result"] = self.net.lookup_entity(entity)
+
+                if not record["result"]:
+                    record["status"] = HTTPStatus.BAD_REQUEST.value
+
+            else:
+                record["status"] = HTTPStatus.BAD_REQUEST.value
+                record["result"] = f"unknown kind of batch query: {kind}"
+
+        except Exception as e:
+            traceback.print_exc()
+            record["status"] = HTTPStatus.INTERNAL_SERVER_ERROR.value
+            record["result"] = str(e)
+
+        record["ms"] = round((time.time() - t0) * 1000.0, 2)
+        return record
+
+
+    def read_jobs (self, batch_path):
+        """
+        parse a TSV file of batch queries, with a header row then the
+        columns `kind`, `entity`, and an optional `radius`
+        """
+        jobs = []
+
+        with codecs.open(Path(batch_path), "r", encoding="utf8") as f:
+            reader = csv.reader(f, delimiter="\t")
+            next(reader) # skip headers
+
+            for line, row in enumerate(reader, start=2):
+                if len(row) < 2:
+                    print(f"bad format, line {line}: {row}")
+                    continue
+
+                radius = row[2] if len(row) > 2 else self.default_radius
+                jobs.append((line, row[0].strip().lower(), row[1].strip(), radius))
+
+        return jobs
+
+
+    def run (self, batch_path, out_path, workers=0):
+        """
+        run a file of batch queries across a pool of `workers`
+        processes, or one per CPU; results get written as NDJSON, or
+        as Parquet if `out_path` ends in `.parquet`; returns a
+        throughput report
+        """
+        global RUNNER
+
+        jobs = self.read_jobs(batch_path)
+        workers = workers or os.cpu_count()
+        out_path = Path(out_path)
+        records = []
+
+        if out_path.suffix == ".parquet":
+            # fail before running the queries, if Parquet isn't available
+            import pyarrow.parquet
+
+        RUNNER = self
+        t0 = time.time()
+
+        with multiprocessing.get_context("fork").Pool(processes=workers) as pool:
+            results = pool.imap(run_job, jobs, chunksize=self.CHUNK)
+
+            if out_path.suffix == ".parquet":
+                records = list(results)
+                self.write_parquet(records, out_path)
+            else:
+                with codecs.open(out_path, "w", encoding="utf8") as f:
+                    for record in results:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        records.append({ k: record[k] for k in [ "kind", "status", "ms" ] })
+
+        elapsed = time.time() - t0
+        return self.report(records, elapsed, workers)
+
+
+    def write_parquet (self, records, out_path):
+        """
+        write the batch results as a Parquet table, with each result
+        encoded as a JSON string; needs `pyarrow`
+        """
+        # only needed for batch output
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist([
+            dict(record, result=json.dumps(record["result"], ensure_ascii=False))
+            for record in records
+            ])
+
+        pq.write_table(table, out_path)
+
+
+    def report (self, records, elapsed, workers):
+        """
+        summarize the throughput and latency of a batch run
+        """
+        report = {
+            "queries": len(records),
+            "workers": workers,
+            "seconds": round(elapsed, 2),
+            "per_second": round(len(records) / elapsed, 1) if elapsed > 0.0 else None,
+            "kinds": {}
+            }
+
+        for kind in sorted(set([ r["kind"] for r in records ])):
+            ms = np.array([ r["ms"] for r in records if r["kind"] == kind ])
+            p50, p95 = np.percentile(ms, [ 50, 95 ]).tolist()
+
+            report["kinds"][kind] = {
+                "count": len(ms),
+                "errors": sum([ 1 for r in records if r["kind"] == kind and r["status"] != HTTPStatus.OK.value ]),
+                "p50_ms": round(p50, 2),
+                "p95_ms": round(p95, 2)
+                }
+
+        return report
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import mmap
+import numpy as np
+
+
+class RCBlobWriter:
+    """
+    write named sections of binary payloads into one file, each
+    section indexed by numeric ID through an array of offsets
+    """
+    MAGIC = b"RCBLOB01"
+
+    def __init__ (self):
+        self.sections = {}
+
+
+    def add_section (self, name, payloads):
+        """
+        add a list of payloads (bytes, or `None` if missing) indexed
+        by numeric ID
+        """
+        self.sections[name] = payloads
+
+
+    def write (self, path):
+        names = sorted(self.sections)
+        header = {}
+
+        # layout: magic, header length, JSON header, then for each
+        # section an int64 offset array followed by the payload data
+        header_len = 4096
+
+        while True:
+            pos = len(self.MAGIC) + 8 + header_len
+
+            for name in names:
+                payloads = self.sections[name]
+                header[name] = [ pos, len(payloads) ]
+                pos += 8 * (len(payloads) + 1)
+                pos += sum([ len(p) for p in payloads if p ])
+
+            encoded = json.dumps(header).encode("utf-8")
+
+            if len(encoded) <= header_len:
+                break
+
+            header_len = len(encoded) + 4096
+
+        with open(path, "wb") as f:
+            f.write(self.MAGIC)
+            f.write(np.array([ header_len ], dtype="<i8").tobytes())
+            f.write(encoded.ljust(header_len, b" "))
+
+            for name in names:
+                payloads = self.sections[name]
+                start = header[name][0] + 8 * (len(payloads) + 1)
+
+                offsets = np.zeros(len(payloads) + 1, dtype="<i8")
+                np.cumsum([ len(p) if p else 0 for p in payloads ], out=offsets[1:])
+                offsets += start
+
+                f.write(offsets.tobytes())
+
+                for p in payloads:
+                    if p:
+                        f.write(p)
+
+
+class RCBlobReader:
+    """
+    memory-mapped reader for a file written by `RCBlobWriter`;
+    payloads are returned as zero-copy `memoryview` slices
+    """
+    def __init__ (self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.buf = memoryview(self.mm)
+        magic_len = len(RCBlobWriter.MAGIC)
+
+        if bytes(self.buf[:magic_len]) != RCBlobWriter.MAGIC:
+            raise ValueError(f"not a blob file: {path}")
+
+        header_len = int(np.frombuffer(self.buf[magic_len:magic_len + 8], dtype="<i8")[0])
+        header = json.loads(bytes(self.buf[magic_len + 8:magic_len + 8 + header_len]))
+
+        self.offsets = {}
+
+        for name, (pos, count) in header.items():
+            self.offsets[name] = np.frombuffer(self.buf, dtype="<i8", count=count + 1, offset=pos)
+
+
+    def __contains__ (self, name):
+        return name in self.offsets
+
+
+    def count (self, name):
+        return len(self.offsets[name]) - 1
+
+
+    def get (self, name, i):
+        """
+        get the payload for ID `i` in section `name`, or `None` if
+        it's missing
+        """
+        offsets = self.offsets.get(name)
+
+        if offsets is None or i < 0 or i + 1 >= len(offsets):
+            return None
+
+        lo = offsets[i]
+        hi = offsets[i + 1]
+
+        if lo == hi:
+            return None
+
+        return self.buf[lo:hi]
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from collections import OrderedDict
+import threading
+
+
+class RCLRUCache:
+    """
+    bounded, thread-safe, in-process cache which evicts the least
+    recently used entries
+    """
+    def __init__ (self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def __len__ (self):
+        return len(self.entries)
+
+
+    def __contains__ (self, key):
+        return key in self.entries
+
+
+    def get (self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                return default
+
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+
+    def put (self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+    def clear (self):
+        with self.lock:
+            self.entries.clear()
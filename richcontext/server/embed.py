@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import numpy as np
+
+
+class RCEmbedding:
+    """
+    low-dimensional node embeddings for an `RCGraph`, derived from a
+    truncated SVD of its degree-normalized adjacency matrix; rows are
+    unit length, so cosine similarity is a dot product
+    """
+    DIM = 32
+
+    def __init__ (self, vectors):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+
+
+    @classmethod
+    def from_graph (cls, graph, dim=DIM):
+        """
+        embed the nodes of `graph`; nodes without edges get zero
+        vectors
+        """
+        # only needed during pre-compute
+        import scipy.sparse as sparse
+        import scipy.sparse.linalg as linalg
+
+        n = len(graph.nodes)
+        dim = min(dim, n - 3)
+
+        if dim < 1 or len(graph.weights) == 0:
+            return cls(np.zeros((n, max(dim, 0)), dtype=np.float32))
+
+        adj = sparse.csr_matrix((graph.weights.astype(np.float64), graph.indices, graph.indptr), shape=(n, n))
+
+        with np.errstate(divide="ignore"):
+            inv_sqrt = np.where(graph.strength > 0.0, 1.0 / np.sqrt(graph.strength), 0.0)
+
+        norm_adj = sparse.diags(inv_sqrt) @ adj @ sparse.diags(inv_sqrt)
+
+        # a fixed starting vector keeps the results reproducible
+        v0 = np.full(n, 1.0 / np.sqrt(n))
+        u, s, vt = linalg.svds(norm_adj, k=dim + 1, v0=v0)
+
+        # drop the top singular vector, which only reflects the degree
+        # of each node
+        order = np.argsort(-s)[1:]
+        vectors = u[:, order] * np.sqrt(s[order])
+        lengths = np.linalg.norm(vectors, axis=1)
+        vectors[lengths > 0.0] /= lengths[lengths > 0.0, None]
+
+        return cls(vectors)
+
+
+    def serialize (self):
+        """
+        return the embeddings as a dict of numpy arrays
+        """
+        return {
+            "vectors": self.vectors
+            }
+
+
+    @classmethod
+    def deserialize (cls, arrays):
+        return cls(arrays["vectors"])
+
+
+    def nearest (self, i, candidates, k=10):
+        """
+        find the `k` nodes in the `candidates` array of IDs that are
+        most similar to node `i`, excluding `i` itself; returns a list
+        of `(node, similarity)` in descending order of similarity
+        """
+        query = self.vectors[i]
+        candidates = candidates[candidates != i]
+
+        if len(candidates) == 0 or not query.any():
+            return []
+
+        sims = self.vectors[candidates] @ query
+
+        if k < len(sims):
+            top = np.argpartition(-sims, k)[:k]
+        else:
+            top = np.arange(len(sims))
+
+        top = top[np.lexsort((candidates[top], -sims[top]))]
+
+        return list(zip(candidates[top].tolist(), sims[top].tolist()))
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from pathlib import Path
+import json
+import numpy as np
+import os
+
+
+class RCExporter:
+    """
+    columnar export of the knowledge graph, as one Parquet or Arrow IPC
+    file per table: the entities of each kind, the weighted edges, the
+    scale and impact of each entity, plus the MLE and dataset co-usage
+    tables; each table gets built and written one row group at a time,
+    so the export never holds a whole table in memory
+    """
+    ROW_GROUP_SIZE = 65536
+
+    FORMATS = {
+        "parquet": ( ".parquet", "application/vnd.apache.parquet" ),
+        "arrow": ( ".arrow", "application/vnd.apache.arrow.file" )
+        }
+
+    KIND_TABLES = [ "prov", "data", "publ", "jour", "auth", "topi" ]
+    TABLES = KIND_TABLES + [ "edges", "scale", "mle", "cousage" ]
+
+    MANIFEST = "manifest.json"
+
+    def __init__ (self, net, row_group_size=ROW_GROUP_SIZE):
+        self.net = net
+        self.row_group_size = row_group_size
+
+
+    @classmethod
+    def table_path (cls, export_dir, table, fmt):
+        return Path(export_dir) / (table + cls.FORMATS[fmt][0])
+
+
+    def chunks (self, n):
+        """
+        slices which split `n` rows into row groups
+        """
+        for lo in range(0, n, self.row_group_size):
+            yield slice(lo, min(lo + self.row_group_size, n))
+
+
+    def kind_groups (self, kind):
+        """
+        row groups for the entities of one kind, with a column for each
+        of the metadata fields of that kind, and with linked entities
+        given by UUID
+        """
+        store = self.net.store
+        ids = store.ids_of_kind(kind)
+        fields = [ key for key in store.FIELDS[kind] if key != "id" ]
+
+        for chunk in self.chunks(len(ids)):
+            rows = ids[chunk].tolist()
+
+            group = {
+                "id": np.array(rows, dtype=np.int64),
+                "uuid": [ store.id_list[i] for i in rows ],
+                "used": store.used[rows]
+                }
+
+            for key in fields:
+                group[key] = [ store.get_field(i, key) for i in rows ]
+
+            yield group
+
+
+    def edge_groups (self):
+        """
+        row groups for the weighted edges, each listed once with
+        `source <= target`
+        """
+        graph = self.net.graph
+        n = len(graph.nodes)
+
+        for chunk in self.chunks(n):
+            nodes = np.arange(chunk.start, chunk.stop, dtype=np.int64)
+            offsets, counts = graph.edge_offsets(nodes)
+            sources = np.repeat(nodes, counts)
+            targets = graph.indices[offsets].astype(np.int64)
+            keep = sources <= targets
+
+            yield {
+                "source": sources[keep],
+                "target": targets[keep],
+                "weight": graph.weights[offsets][keep]
+                }
+
+
+    def scale_groups (self):
+        """
+        row groups for the scale and impact of each ranked entity
+        """
+        ids = sorted(self.net.scale)
+
+        for chunk in self.chunks(len(ids)):
+            rows = ids[chunk]
+            values = np.array([ self.net.scale[i] for i in rows ], dtype=np.float64).reshape(-1, 2)
+
+            yield {
+                "id": np.array(rows, dtype=np.int64),
+                "scale": values[:, 0],
+                "impact": values[:, 1]
+                }
+
+
+    def sparse_groups (self, table, row_name, col_name, trials_name, estimate=False):
+        """
+        row groups for the entries of an `RCSparseTable`, with the
+        point estimate of each count if `estimate` is set
+        """
+        rows = np.repeat(np.arange(len(table.indptr) - 1, dtype=np.int64), np.diff(table.indptr))
+
+        for chunk in self.chunks(len(table.indices)):
+            counts = table.counts[chunk]
+            trials = table.trials[rows[chunk]]
+
+            group = {
+                row_name: rows[chunk],
+                col_name: table.indices[chunk].astype(np.int64),
+                "count": counts,
+                trials_name: trials
+                }
+
+            if estimate:
+                z = self.net.Z_975
+                group["estimate"] = (counts + z) / (trials + 2.0 * z)
+
+            yield group
+
+
+    def row_groups (self, table):
+        """
+        row groups for one of the exported tables, as dicts of columns
+        """
+        if table in self.KIND_TABLES:
+            return self.kind_groups(table)
+        elif table == "edges":
+            return self.edge_groups()
+        elif table == "scale":
+            return self.scale_groups()
+        elif table == "mle":
+            return self.sparse_groups(self.net.mle, "entity", "dataset", "trials", estimate=True)
+        elif table == "cousage":
+            return self.sparse_groups(self.net.cousage, "dataset", "other", "publications")
+
+        raise ValueError(f"unknown table: {table}")
+
+
+    def write_table (self, table, path, fmt):
+        """
+        write one table, row group by row group; the file gets written
+        under a temporary name then renamed, so it can be replaced
+        while it's being served; returns the number of rows
+        """
+        # only needed for the export
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        writer = None
+        count = 0
+
+        try:
+            for group in self.row_groups(table):
+                batch = pa.Table.from_pydict(group)
+
+                if writer is None:
+                    if fmt == "parquet":
+                        writer = pq.ParquetWriter(tmp_path, batch.schema)
+                    else:
+                        writer = pa.ipc.new_file(tmp_path, batch.schema)
+
+                writer.write_table(batch)
+                count += batch.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            # no rows, so there's no schema to write
+            return 0
+
+        os.replace(tmp_path, path)
+        return count
+
+
+    def export (self, export_dir, fmt="parquet"):
+        """
+        export every table into `export_dir`, plus a manifest which
+        ties the files to the build of the network; returns the
+        manifest
+        """
+        if fmt not in self.FORMATS:
+            raise ValueError(f"unknown export format: {fmt}")
+
+        export_dir = Path(export_dir)
+        export_dir.mkdir(parents=True, exist_ok=True)
+
+        manifest_path = export_dir / self.MANIFEST
+        manifest = self.read_manifest(export_dir) or {}
+
+        if manifest.get("build") != self.net.build_id:
+            manifest = { "build": self.net.build_id, "tables": {} }
+
+        for table in self.TABLES:
+            path = self.table_path(export_dir, table, fmt)
+            rows = self.write_table(table, path, fmt)
+
+            if rows > 0:
+                manifest["tables"].setdefault(table, {})[fmt] = {
+                    "rows": rows,
+                    "bytes": path.stat().st_size
+                    }
+            else:
+                # don't leave the table from an earlier build behind
+                manifest["tables"].get(table, {}).pop(fmt, None)
+
+                if path.exists():
+                    path.unlink()
+
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=4, sort_keys=True)
+
+        return manifest
+
+
+    @classmethod
+    def read_manifest (cls, export_dir):
+        """
+        load the manifest of an export, if any
+        """
+        manifest_path = Path(export_dir) / cls.MANIFEST
+
+        if not manifest_path.exists():
+            return None
+
+        with open(manifest_path, "r") as f:
+            return json.load(f)
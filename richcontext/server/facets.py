@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import numpy as np
+
+
+class RCFacetIndex:
+    """
+    faceted filtering of the publications: for each kind of facet
+    (dataset, topic, journal, author, provider) the pairs which link a
+    publication to a facet entity, kept twice, sorted by entity as an
+    inverted index of publication positions and sorted by publication
+    for counting facets; queries combine boolean masks over the
+    publications, so AND/OR/NOT are vectorized set operations
+    """
+    FACETS = {
+        "data": "datasets",
+        "topi": "topics",
+        "jour": "journal",
+        "auth": "authors",
+        "prov": None	# through the datasets
+        }
+
+    def __init__ (self, publ, impact, pairs):
+        """
+        `publ` is the sorted array of publication node IDs, `impact`
+        their impact for ranking results, and `pairs` maps each facet
+        kind to `(pub, ent)` arrays of publication positions and facet
+        entity node IDs
+        """
+        self.publ = publ
+        self.impact = impact
+        self.forward = {}
+        self.inverted = {}
+
+        for kind, (pub, ent) in pairs.items():
+            order = np.lexsort((ent, pub))
+            self.forward[kind] = ( pub[order], ent[order] )
+
+            order = np.lexsort((pub, ent))
+            self.inverted[kind] = ( ent[order], pub[order] )
+
+
+    @classmethod
+    def from_store (cls, store, scale):
+        """
+        build the indexes from the links in the entity store, with
+        each publication linked to the providers of its datasets
+        """
+        publ = store.ids_of_kind("publ")
+        impact = np.array([ scale[i][1] if i in scale else 0.0 for i in publ.tolist() ], dtype=np.float64)
+        pairs = {}
+
+        for kind, field in cls.FACETS.items():
+            if field in store.ID_COLUMNS:
+                ent = getattr(store, field)[publ].astype(np.int64)
+                pub = np.arange(len(publ), dtype=np.int64)
+            elif field in store.LINK_FIELDS:
+                indptr, indices = store.links[field]
+                rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+                is_publ = store.kind[rows] == store.KIND_NAMES.index("publ")
+                ent = indices[is_publ].astype(np.int64)
+                pub = np.searchsorted(publ, rows[is_publ])
+            else:
+                continue
+
+            keep = ent >= 0
+            pairs[kind] = ( pub[keep], ent[keep] )
+
+        # publications reach providers through their datasets
+        pub, data = pairs["data"]
+        prov = store.provider[data].astype(np.int64)
+        keep = prov >= 0
+        linked = np.unique(np.stack([ pub[keep], prov[keep] ]), axis=1)
+        pairs["prov"] = ( linked[0], linked[1] )
+
+        return cls(publ, impact, pairs)
+
+
+    def __len__ (self):
+        return len(self.publ)
+
+
+    def mask (self, kind, ent):
+        """
+        boolean mask of the publications linked to facet entity `ent`
+        """
+        ents, pubs = self.inverted[kind]
+        lo, hi = np.searchsorted(ents, [ ent, ent + 1 ])
+
+        mask = np.zeros(len(self.publ), dtype=bool)
+        mask[pubs[lo:hi]] = True
+
+        return mask
+
+
+    def select (self, all_of=(), any_of=(), none_of=()):
+        """
+        mask of the publications linked to every facet in `all_of`,
+        at least one in `any_of` (if any), and none in `none_of`; each
+        facet is a `(kind, ent)` pair
+        """
+        selected = np.ones(len(self.publ), dtype=bool)
+
+        for kind, ent in all_of:
+            selected &= self.mask(kind, ent)
+
+        if any_of:
+            either = np.zeros(len(self.publ), dtype=bool)
+
+            for kind, ent in any_of:
+                either |= self.mask(kind, ent)
+
+            selected &= either
+
+        for kind, ent in none_of:
+            selected &= ~self.mask(kind, ent)
+
+        return selected
+
+
+    def counts (self, selected, k):
+        """
+        the `k` facet entities of each kind linked to the most selected
+        publications, as `(ent, count)` in descending order of count
+        """
+        view = {}
+
+        for kind, (pub, ent) in self.forward.items():
+            ents, counts = np.unique(ent[selected[pub]], return_counts=True)
+            order = np.lexsort((ents, -counts))[:k]
+            view[kind] = list(zip(ents[order].tolist(), counts[order].tolist()))
+
+        return view
+
+
+    def ranked (self, selected, offset, limit):
+        """
+        node IDs for a page of the selected publications, in descending
+        order of impact
+        """
+        pos = np.flatnonzero(selected)
+        order = np.lexsort((pos, -self.impact[pos]))
+
+        return self.publ[pos[order[offset:offset + limit]]].tolist()
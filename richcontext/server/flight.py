@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from concurrent.futures import Future
+import threading
+import time
+import uuid
+
+
+class RCSingleFlight:
+    """
+    coalesce identical concurrent computations: callers with the same
+    key wait on one computation and share its result; threads within
+    a worker wait on a future, while workers sharing a disk cache wait
+    on a lease there, then pick up the result which the worker holding
+    the lease left in the cache, only if any of them were waiting
+    """
+    LOCK_EXPIRE = 60	# seconds, in case a worker dies holding the lease
+    RESULT_EXPIRE = 10	# seconds, long enough for the waiting workers
+    POLL = 0.005	# seconds, between checks on the lease
+
+    MISSING = object()
+
+    def __init__ (self, disk_cache=None):
+        self.disk_cache = disk_cache
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+
+    def in_flight (self, key):
+        """
+        is there a computation for `key` running in this worker, or
+        in any worker sharing the disk cache?
+        """
+        if key in self.calls:
+            return True
+
+        return self.disk_cache is not None and ("flight-lock-" + key) in self.disk_cache
+
+
+    def do (self, key, fn):
+        """
+        return the result of `fn()`, running it only once across
+        concurrent calls with the same `key`; exceptions get raised in
+        every caller
+        """
+        with self.lock:
+            future = self.calls.get(key)
+
+            if future is None:
+                future = Future()
+                self.calls[key] = future
+                self.leaders += 1
+                leader = True
+            else:
+                self.followers += 1
+                leader = False
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(self.run_shared(key, fn))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+        return future.result()
+
+
+    def run_shared (self, key, fn):
+        """
+        run `fn()` at most once across the workers which share the
+        disk cache: the first worker takes a lease on `key` and runs
+        it, while the others count themselves as waiting then poll the
+        lease; the result gets stored in the cache only if a worker
+        was waiting, and a worker which finds no result, say since it
+        started waiting too late, runs `fn()` itself
+        """
+        if self.disk_cache is None:
+            return fn()
+
+        lock_key = "flight-lock-" + key
+        result_key = "flight-result-" + key
+        waiters_key = "flight-waiters-" + key
+
+        while True:
+            result = self.disk_cache.get(result_key, default=self.MISSING)
+
+            if result is not self.MISSING:
+                return result
+
+            if self.disk_cache.add(lock_key, uuid.uuid4().hex, expire=self.LOCK_EXPIRE):
+                try:
+                    result = fn()
+
+                    if self.disk_cache.pop(waiters_key, default=0) > 0:
+                        self.disk_cache.set(result_key, result, expire=self.RESULT_EXPIRE)
+                finally:
+                    self.disk_cache.delete(lock_key)
+
+                return result
+
+            with self.disk_cache.transact():
+                waiting = self.disk_cache.get(waiters_key, default=0)
+                self.disk_cache.set(waiters_key, waiting + 1, expire=self.LOCK_EXPIRE)
+
+            while lock_key in self.disk_cache:
+                time.sleep(self.POLL)
+
+
+class RCSharedSemaphore:
+    """
+    a semaphore shared by the workers which share a disk cache, with a
+    fixed number of slots; each slot is a key in the cache, taken by
+    an atomic `add()` and held as a lease which expires, in case a
+    worker dies holding it
+    """
+    LEASE_EXPIRE = 300	# seconds, longer than any query should run
+
+    def __init__ (self, disk_cache, name, size, expire=LEASE_EXPIRE):
+        self.disk_cache = disk_cache
+        self.slots = [ "{}-{}".format(name, i) for i in range(size) ]
+        self.expire = expire
+
+
+    def acquire (self):
+        """
+        take a free slot without blocking; returns the lease to
+        release afterwards, or `None` if every slot is taken
+        """
+        token = uuid.uuid4().hex
+
+        for slot in self.slots:
+            if self.disk_cache.add(slot, token, expire=self.expire):
+                return RCLease(self, slot, token)
+
+        return None
+
+
+    def release (self, slot, token):
+        """
+        free a slot, unless its lease expired and another caller has
+        taken it since
+        """
+        with self.disk_cache.transact():
+            if self.disk_cache.get(slot) == token:
+                self.disk_cache.delete(slot)
+
+
+    def held (self):
+        """
+        count the slots currently taken, across the workers
+        """
+        return sum([ slot in self.disk_cache for slot in self.slots ])
+
+
+class RCLease:
+    """
+    a slot held in an `RCSharedSemaphore`, released at most once
+    """
+
+    def __init__ (self, semaphore, slot, token):
+        self.semaphore = semaphore
+        self.slot = slot
+        self.token = token
+        self.released = False
+
+
+    def release (self):
+        if not self.released:
+            self.released = True
+            self.semaphore.release(self.slot, self.token)
@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import heapq
+import numpy as np
+
+
+class RCGraph:
+    """
+    read-only, undirected, weighted graph stored as CSR adjacency
+    arrays indexed by numeric node ID; this provides the operations
+    needed at serve time without having to load `networkx`
+    """
+    def __init__ (self, indptr, indices, weights, nodes):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.nodes = np.asarray(nodes, dtype=bool)
+
+        # weighted degree of each node
+        cum_weights = np.concatenate([ [ 0.0 ], np.cumsum(self.weights, dtype=np.float64) ])
+        self.strength = cum_weights[self.indptr[1:]] - cum_weights[self.indptr[:-1]]
+        self.mean_weight = float(self.weights.mean()) if len(self.weights) > 0 else 1.0
+
+
+    @classmethod
+    def from_networkx (cls, nxg, num_nodes):
+        """
+        build from a `networkx` graph whose nodes are numeric IDs in
+        the range `[0, num_nodes)`; the neighbors of each node are kept
+        in the order of the graph's edge list
+        """
+        adj = [ [] for _ in range(num_nodes) ]
+
+        for u, v, attr in nxg.edges(data=True):
+            w = attr.get("weight", 1.0)
+            adj[u].append((v, w))
+
+            if u != v:
+                adj[v].append((u, w))
+
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum([ len(a) for a in adj ], out=indptr[1:])
+
+        indices = [ v for a in adj for v, w in a ]
+        weights = [ w for a in adj for v, w in a ]
+
+        nodes = np.zeros(num_nodes, dtype=bool)
+        nodes[list(nxg.nodes())] = True
+
+        return cls(indptr, indices, weights, nodes)
+
+
+    def serialize (self):
+        """
+        return the graph as a dict of numpy arrays
+        """
+        return {
+            "indptr": self.indptr,
+            "indices": self.indices,
+            "weights": self.weights,
+            "nodes": self.nodes
+            }
+
+
+    @classmethod
+    def deserialize (cls, arrays):
+        return cls(arrays["indptr"], arrays["indices"], arrays["weights"], arrays["nodes"])
+
+
+    def __len__ (self):
+        return int(self.nodes.sum())
+
+
+    def __contains__ (self, node):
+        try:
+            return 0 <= node < len(self.nodes) and bool(self.nodes[node])
+        except TypeError:
+            return False
+
+
+    def degree (self, node):
+        return int(self.indptr[node + 1] - self.indptr[node])
+
+
+    def neighbors (self, node):
+        """
+        list the neighbors of a node
+        """
+        return self.indices[self.indptr[node]:self.indptr[node + 1]].tolist()
+
+
+    def neighbor_weights (self, node):
+        """
+        list the neighbors of a node, paired with their edge weights
+        """
+        lo = self.indptr[node]
+        hi = self.indptr[node + 1]
+
+        return list(zip(self.indices[lo:hi].tolist(), self.weights[lo:hi].tolist()))
+
+
+    def edge_offsets (self, nodes):
+        """
+        positions in the adjacency arrays of all the edges incident to
+        the nodes in the `nodes` array, plus the count per node
+        """
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+
+        return offsets + np.arange(len(offsets)), counts
+
+
+    def expand (self, frontier):
+        """
+        gather the neighbors of all the nodes in the `frontier` array,
+        with repeats
+        """
+        offsets, counts = self.edge_offsets(frontier)
+        return self.indices[offsets]
+
+
+    @classmethod
+    def find_sorted (cls, nodes, targets):
+        """
+        positions of the `targets` within the sorted `nodes` array,
+        plus a mask of which targets are found there
+        """
+        pos = np.searchsorted(nodes, targets)
+        found = pos < len(nodes)
+        found[found] = nodes[pos[found]] == targets[found]
+
+        return pos, found
+
+
+    def bfs (self, source, depth_limit=None):
+        """
+        level-synchronous BFS from `source`, returning a dict of the
+        hop distance to each node reached within `depth_limit`
+        """
+        if source not in self:
+            return {}
+
+        paths = { source: 0 }
+        paths.update(self.extend_bfs(paths, [ source ], 0, depth_limit=depth_limit))
+
+        return paths
+
+
+    def extend_bfs (self, visited, frontier, depth, depth_limit=None):
+        """
+        continue a BFS which has reached the `visited` nodes, with the
+        nodes in the `frontier` array at `depth` hops, out to
+        `depth_limit`; `visited` may be given as a sorted array, which
+        then gets searched in place, and the nodes newly reached get
+        kept apart from it, so the work depends on the size of the
+        frontiers rather than the size of the neighborhood or graph
+
+        returns a dict of the hop distance to only the nodes newly
+        reached
+        """
+        if not isinstance(visited, np.ndarray):
+            visited = np.sort(np.fromiter(visited, dtype=np.int64, count=len(visited)))
+
+        frontier = np.asarray(frontier, dtype=np.int64)
+        seen = np.zeros(0, dtype=np.int64)
+        reached = [ seen ]
+        levels = [ np.zeros(0, dtype=np.int64) ]
+        level = depth
+
+        while len(frontier) > 0 and (depth_limit is None or level < depth_limit):
+            level += 1
+            neighbors = np.unique(self.expand(frontier)).astype(np.int64)
+            pos, found = self.find_sorted(visited, neighbors)
+            pos, found_new = self.find_sorted(seen, neighbors)
+
+            frontier = neighbors[~(found | found_new)]
+            seen = np.union1d(seen, frontier)
+            reached.append(frontier)
+            levels.append(np.full(len(frontier), level, dtype=np.int64))
+
+        return dict(zip(np.concatenate(reached).tolist(), np.concatenate(levels).tolist()))
+
+
+    MAX_SOURCES = 64
+
+    def multi_bfs (self, sources, depth_limit=None):
+        """
+        one level-synchronous BFS from several `sources` at once, with a
+        bitmask per node of the sources that have reached it, so that
+        each node gets expanded at most once per level (Then et al.,
+        "The More the Merrier", 2014); the bitmasks get kept for only
+        the nodes reached, in sorted order
+
+        returns the array of nodes reached, plus a matrix of the hop
+        distance from each source to each of those nodes, or -1 if
+        unreached within `depth_limit`
+        """
+        if len(sources) > self.MAX_SOURCES:
+            raise ValueError(f"at most {self.MAX_SOURCES} sources")
+
+        start_bits = {}
+
+        for j, source in enumerate(sources):
+            if source in self:
+                start_bits[source] = start_bits.get(source, 0) | (1 << j)
+
+        seen = np.array(sorted(start_bits), dtype=np.int64)
+        seen_bits = np.array([ start_bits[i] for i in seen.tolist() ], dtype=np.uint64)
+
+        frontier = seen
+        frontier_bits = seen_bits
+        reached = [ (frontier, frontier_bits) ]
+        level = 0
+
+        while len(frontier) > 0 and (depth_limit is None or level < depth_limit):
+            level += 1
+            offsets, counts = self.edge_offsets(frontier)
+            targets = self.indices[offsets]
+            bits = np.repeat(frontier_bits, counts)
+
+            # combine the bits arriving at each target
+            order = np.argsort(targets, kind="stable")
+            targets = targets[order]
+            starts = np.flatnonzero(np.diff(np.concatenate([ [ -1 ], targets ])))
+            targets = targets[starts].astype(np.int64)
+            bits = np.bitwise_or.reduceat(bits[order], starts) if len(starts) > 0 else bits[:0]
+
+            pos, found = self.find_sorted(seen, targets)
+            old_bits = np.zeros(len(targets), dtype=np.uint64)
+            old_bits[found] = seen_bits[pos[found]]
+
+            new_bits = bits & ~old_bits
+            keep = new_bits != 0
+
+            frontier = targets[keep]
+            frontier_bits = new_bits[keep]
+            reached.append((frontier, frontier_bits))
+
+            # merge the new bits into the sorted bitmasks
+            update = keep & found
+            seen_bits = seen_bits.copy()
+            seen_bits[pos[update]] |= new_bits[update]
+
+            insert = keep & ~found
+            seen = np.concatenate([ seen, targets[insert] ])
+            seen_bits = np.concatenate([ seen_bits, new_bits[insert] ])
+            order = np.argsort(seen, kind="stable")
+            seen = seen[order]
+            seen_bits = seen_bits[order]
+
+        nodes = seen
+        dist = np.full((len(sources), len(nodes)), -1, dtype=np.int32)
+
+        for level, (level_nodes, level_bits) in enumerate(reached):
+            cols = np.searchsorted(nodes, level_nodes)
+
+            for j in range(len(sources)):
+                hit = ((level_bits >> np.uint64(j)) & np.uint64(1)) == 1
+                dist[j, cols[hit]] = level
+
+        return nodes, dist
+
+
+    def subgraph_edges (self, node_set):
+        """
+        list the edges `(u, v, weight)` with both endpoints in
+        `node_set`, each listed once with `u < v`
+        """
+        nodes = np.array(sorted(node_set), dtype=np.int64)
+
+        if len(nodes) == 0:
+            return []
+
+        offsets, counts = self.edge_offsets(nodes)
+        sources = np.repeat(nodes, counts)
+        targets = self.indices[offsets]
+
+        # look up the targets in the sorted nodes, rather than masking
+        # over the whole graph
+        pos, found = self.find_sorted(nodes, targets)
+        keep = found & (sources < targets)
+
+        return list(zip(sources[keep].tolist(), targets[keep].tolist(), self.weights[offsets][keep].tolist()))
+
+
+    def personalized_pagerank (self, source, alpha=0.15, epsilon=1e-5):
+        """
+        approximate the personalized PageRank vector for `source` over
+        the edge weights, using the local push algorithm (Andersen,
+        Chung, Lang 2006) with all of the nodes above the threshold
+        pushed together in each round; the work done depends on `1 /
+        (alpha * epsilon)` instead of the size of the graph
+
+        returns a dict of the score for each node reached
+        """
+        if source not in self:
+            return {}
+
+        if self.strength[source] <= 0.0:
+            return { source: 1.0 }
+
+        # keep the scores and residuals only for the nodes reached, so
+        # that each call costs in proportion to the nodes it touches
+        scores = {}
+        residual = { source: 1.0 }
+        active = [ source ]
+
+        while len(active) > 0:
+            r = np.array([ residual.pop(node) for node in active ], dtype=np.float64)
+
+            for node, score in zip(active, (alpha * r).tolist()):
+                scores[node] = scores.get(node, 0.0) + score
+
+            nodes = np.array(active, dtype=np.int64)
+            offsets, counts = self.edge_offsets(nodes)
+            share = np.repeat((1.0 - alpha) * r / self.strength[nodes], counts)
+
+            touched, inverse = np.unique(self.indices[offsets], return_inverse=True)
+            pushed = np.bincount(inverse, weights=share * self.weights[offsets])
+
+            # compare the residuals to the weighted degree in units of
+            # the mean edge weight, so that `epsilon` doesn't depend on
+            # how the weights are scaled
+            limit = epsilon * self.strength[touched] / self.mean_weight
+            active = []
+
+            for node, push, lim in zip(touched.tolist(), pushed.tolist(), limit.tolist()):
+                residual[node] = residual.get(node, 0.0) + push
+
+                if residual[node] >= lim:
+                    active.append(node)
+
+        return { node: score for node, score in sorted(scores.items()) if score != 0.0 }
+
+
+    def shortest_path (self, source, target, max_length=None, blocked=(), banned=()):
+        """
+        bidirectional BFS for a shortest path from `source` to `target`,
+        expanding the smaller frontier at each step, so the work
+        depends on the length of the path rather than on the size of
+        the neighborhoods; avoids the `blocked` nodes, plus the edges
+        between `source` and the `banned` nodes
+
+        returns the list of nodes on the path, or `None`
+        """
+        if source not in self or target not in self:
+            return None
+
+        if source == target:
+            return [ source ]
+
+        # hop distance and parent of each node reached from either
+        # side, kept in dicts so that each search only costs as much as
+        # the nodes it reaches -- Yen's algorithm runs one per spur node
+        parent = [ {}, {} ]
+        dist = [ { source: 0 }, { target: 0 } ]
+
+        # blocked nodes look visited to the expansions, yet never meet
+        for node in blocked:
+            if node != source and node != target:
+                dist[0][node] = -1
+                dist[1][node] = -1
+
+        banned = np.array(list(banned), dtype=np.int64)
+        frontier = [ np.array([ source ], dtype=np.int64), np.array([ target ], dtype=np.int64) ]
+        depth = [ 0, 0 ]
+
+        while len(frontier[0]) > 0 and len(frontier[1]) > 0:
+            if max_length is not None and depth[0] + depth[1] >= max_length:
+                break
+
+            side = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+            other = 1 - side
+
+            offsets, counts = self.edge_offsets(frontier[side])
+            sources = np.repeat(frontier[side], counts)
+            targets = self.indices[offsets].astype(np.int64)
+
+            if len(banned) > 0:
+                keep = ~((sources == source) & np.isin(targets, banned))
+                keep &= ~((targets == source) & np.isin(sources, banned))
+                sources = sources[keep]
+                targets = targets[keep]
+
+            # only look up each distinct target once in the visited map
+            targets, first = np.unique(targets, return_index=True)
+            keep = np.fromiter((node not in dist[side] for node in targets.tolist()), dtype=bool, count=len(targets))
+            targets = targets[keep]
+            depth[side] += 1
+            middle = None
+
+            for node, prev in zip(targets.tolist(), sources[first[keep]].tolist()):
+                parent[side][node] = prev
+                dist[side][node] = depth[side]
+
+                if dist[other].get(node, -1) >= 0:
+                    if middle is None or dist[other][node] < dist[other][middle]:
+                        middle = node
+
+            frontier[side] = targets
+
+            if middle is not None:
+                return self.trace_path(parent[0], middle)[::-1][:-1] + self.trace_path(parent[1], middle)
+
+        return None
+
+
+    @classmethod
+    def trace_path (cls, parent, node):
+        path = [ node ]
+
+        while node in parent:
+            node = parent[node]
+            path.append(node)
+
+        return path
+
+
+    def k_shortest_paths (self, source, target, k=3, max_length=None):
+        """
+        the `k` shortest loopless paths from `source` to `target`, in
+        order of length, using Yen's algorithm with bidirectional BFS
+        for the spur paths
+        """
+        path = self.shortest_path(source, target, max_length=max_length)
+
+        if path is None:
+            return []
+
+        found = [ path ]
+        candidates = []
+        seen = set([ tuple(path) ])
+
+        while len(found) < k:
+            prev = found[-1]
+
+            for i in range(len(prev) - 1):
+                spur = prev[i]
+                root = prev[:i + 1]
+                banned = set([ p[i + 1] for p in found if p[:i + 1] == root ])
+
+                spur_limit = max_length - i if max_length is not None else None
+                spur_path = self.shortest_path(spur, target, max_length=spur_limit, blocked=root[:-1], banned=banned)
+
+                if spur_path:
+                    path = root[:-1] + spur_path
+
+                    if tuple(path) not in seen:
+                        seen.add(tuple(path))
+                        heapq.heappush(candidates, (len(path), path))
+
+            if not candidates:
+                break
+
+            found.append(heapq.heappop(candidates)[1])
+
+        return found
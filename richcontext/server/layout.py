@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import numpy as np
+
+
+class RCLayout:
+    """
+    2D coordinates for drawing neighborhoods of an `RCGraph`: a global
+    spectral layout for the whole graph, computed once, which seeds a
+    force-directed layout for each neighborhood
+    """
+    BLOCK_SIZE = 512
+    PAIR_BUDGET = 2e7	# node pairs for repulsion, across all iterations
+    MAX_ITERATIONS = 50
+    MAX_FORCE_NODES = 2000	# above which the spectral layout gets used as is
+    SPACING = 60.0	# pixels between neighboring nodes
+
+    def __init__ (self, xy=None):
+        self.xy = np.asarray(xy, dtype=np.float32) if xy is not None else None
+
+
+    @classmethod
+    def from_graph (cls, graph):
+        """
+        spectral layout: the eigenvectors of the random walk on the
+        graph for the second and third largest eigenvalues
+        """
+        # only needed during pre-compute
+        import scipy.sparse as sparse
+        import scipy.sparse.linalg as linalg
+
+        n = len(graph.nodes)
+
+        if n < 4 or len(graph.weights) == 0:
+            return cls(np.zeros((n, 2), dtype=np.float32))
+
+        adj = sparse.csr_matrix((graph.weights.astype(np.float64), graph.indices, graph.indptr), shape=(n, n))
+
+        with np.errstate(divide="ignore"):
+            inv_sqrt = np.where(graph.strength > 0.0, 1.0 / np.sqrt(graph.strength), 0.0)
+
+        norm_adj = sparse.diags(inv_sqrt) @ adj @ sparse.diags(inv_sqrt)
+
+        # a fixed starting vector keeps the results reproducible
+        v0 = np.full(n, 1.0 / np.sqrt(n))
+        vals, vecs = linalg.eigsh(norm_adj, k=3, which="LA", v0=v0)
+
+        order = np.argsort(-vals)[1:]
+        xy = vecs[:, order] * inv_sqrt[:, None]
+
+        return cls(xy)
+
+
+    def serialize (self):
+        """
+        return the layout as a dict of numpy arrays
+        """
+        return {
+            "xy": self.xy
+            }
+
+
+    @classmethod
+    def deserialize (cls, arrays):
+        return cls(arrays.get("xy"))
+
+
+    def initial_positions (self, nodes):
+        """
+        starting positions for the `nodes` array, from the global layout
+        when available, with a small deterministic jitter to separate
+        nodes which coincide
+        """
+        rng = np.random.default_rng(len(nodes))
+        jitter = rng.uniform(-1.0, 1.0, size=(len(nodes), 2))
+
+        if self.xy is None:
+            return jitter
+
+        xy = self.xy[nodes].astype(np.float64)
+        span = np.ptp(xy, axis=0)
+        span[span == 0.0] = 1.0
+
+        return (xy - xy.mean(axis=0)) / span * 2.0 + jitter * 1e-3
+
+
+    def force_directed (self, nodes, edges):
+        """
+        Fruchterman-Reingold layout for the `nodes` array, where `edges`
+        lists `(u, v, weight)` among them, vectorized with the pairwise
+        repulsion computed in blocks to bound memory; the number of
+        iterations shrinks as the neighborhood grows, to keep within
+        `PAIR_BUDGET`, and neighborhoods larger than `MAX_FORCE_NODES`
+        keep their spectral positions
+
+        returns an array of the pixel coordinates for each node
+        """
+        n = len(nodes)
+
+        if n == 0:
+            return np.zeros((0, 2))
+
+        pos = self.initial_positions(nodes)
+
+        if n == 1:
+            return pos * 0.0
+
+        index = { node: i for i, node in enumerate(nodes.tolist()) }
+        u = np.array([ index[e[0]] for e in edges ], dtype=np.int64)
+        v = np.array([ index[e[1]] for e in edges ], dtype=np.int64)
+        w = np.array([ e[2] for e in edges ], dtype=np.float64)
+
+        if len(w) > 0:
+            w = w / w.mean()
+
+        # the area is 2x2, so this is the ideal distance between nodes
+        k = 2.0 / np.sqrt(n)
+        temp = 0.2
+
+        if n > self.MAX_FORCE_NODES:
+            iterations = 0
+        else:
+            iterations = int(min(self.PAIR_BUDGET / (n * n), self.MAX_ITERATIONS))
+
+        for it in range(iterations):
+            disp = np.zeros((n, 2))
+            x = pos[:, 0].astype(np.float32)
+            y = pos[:, 1].astype(np.float32)
+
+            for lo in range(0, n, self.BLOCK_SIZE):
+                hi = min(lo + self.BLOCK_SIZE, n)
+                dx = x[lo:hi, None] - x[None, :]
+                dy = y[lo:hi, None] - y[None, :]
+
+                scale = dx * dx
+                scale += dy * dy
+                np.maximum(scale, 1e-9, out=scale)
+                np.divide(k * k, scale, out=scale)
+
+                disp[lo:hi, 0] += np.einsum("ij,ij->i", dx, scale)
+                disp[lo:hi, 1] += np.einsum("ij,ij->i", dy, scale)
+
+            delta = pos[u] - pos[v]
+            dist = np.sqrt((delta ** 2).sum(axis=1))
+            force = delta * (dist * w / k)[:, None]
+
+            np.add.at(disp, u, -force)
+            np.add.at(disp, v, force)
+
+            length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 1e-9)
+            pos += disp * (np.minimum(length, temp) / length)[:, None]
+            temp *= 1.0 - 1.0 / iterations
+
+        pos -= pos.mean(axis=0)
+        return pos / k * self.SPACING
+
+
+    def place (self, positions, nodes, edges, center=None):
+        """
+        pixel coordinates for `nodes` added to a neighborhood which has
+        already been laid out, leaving the existing `positions` where
+        they are: in the order given, each new node goes next to the
+        centroid of its neighbors which have been placed, at a
+        deterministic angle, or else next to the `center` of the
+        diagram; `positions` need only cover the neighbors of `nodes`
+        if the `center` gets given
+
+        returns a dict of the coordinates for just the new nodes
+        """
+        adjacent = {}
+
+        for u, v, weight in edges:
+            adjacent.setdefault(u, []).append(v)
+            adjacent.setdefault(v, []).append(u)
+
+        placed = dict(positions)
+
+        if center is None:
+            center = np.mean(list(positions.values()), axis=0) if positions else np.zeros(2)
+
+        rng = np.random.default_rng(len(nodes))
+        angles = rng.uniform(0.0, 2.0 * np.pi, size=len(nodes))
+
+        for node, angle in zip(nodes, angles):
+            near = [ placed[j] for j in adjacent.get(node, []) if j in placed ]
+            x, y = np.mean(near, axis=0) if near else center
+
+            placed[node] = [
+                round(float(x + self.SPACING * np.cos(angle)), 1),
+                round(float(y + self.SPACING * np.sin(angle)), 1)
+                ]
+
+        return { node: placed[node] for node in nodes }
@@ -0,0 +1,633 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from operator import itemgetter
+from pathlib import Path
+from .anf import RCNeighborhoodSizes
+from .blob import RCBlobWriter
+from .embed import RCEmbedding
+from .graph import RCGraph
+from .layout import RCLayout
+from .render import RCMinifyLoader
+from .search import RCSearchIndex
+from .server import RCNetwork, RCSparseTable
+from .store import RCEntityStore
+import brotli
+import codecs
+import gzip
+import json
+import networkx as nx
+import numpy as np
+import os
+import pandas as pd
+import scipy.sparse as sparse
+import scipy.stats as stats
+import sys
+import time
+
+
+class RCNetworkBuilder (RCNetwork):
+    """
+    offline pre-compute for the knowledge graph: parse the corpus,
+    run the graph analytics, then serialize everything which the
+    serve runtime in `RCNetwork` loads; this module holds the heavy
+    dependencies, so that the web workers never import them
+    """
+    def __init__ (self):
+        super(RCNetworkBuilder, self).__init__()
+        self.nxg = None
+
+
+    def setup_render (self, template_folder, compiled_path=None):
+        # always render from the template sources, which get compiled
+        # again by `serialize()`
+        super(RCNetworkBuilder, self).setup_render(template_folder, compiled_path=None)
+
+
+    ######################################################################
+    ## parse the JSON-LD corpus
+
+    def parse_metadata (self, elem):
+        """
+        parse the required metadata items from one element in the graph
+        """
+        kind = elem["@type"]
+        title = elem["dct:title"]["@value"]
+        id = elem["@id"].split("#")[1]
+
+        self.id_list.append(id)
+
+        return id, kind, title, elem
+
+
+    def parse_corpus (self, path):
+        """
+        parse each of the entities within the KG
+        """
+        with codecs.open(path, "r", encoding="utf8") as f:
+            jld_corpus = json.load(f)
+            corpus = jld_corpus["@graph"]
+
+        entities = [ self.parse_metadata(e) for e in corpus ]
+        unknown_journal = None
+
+        prov = {}
+        data = {}
+        publ = {}
+        jour = {}
+        auth = {}
+        topi = {}
+
+        # providers
+        for id, kind, title, elem in entities:
+            if kind == "Provider":
+                if "dct:identifier" in elem:
+                    ror = elem["dct:identifier"]["@value"]
+                else:
+                    ror = ""
+
+                prov[id] = {
+                    "id": id,
+                    "title": title,
+                    "ror": ror
+                    }
+
+        # datasets
+        for id, kind, title, elem in entities:
+            if kind == "Dataset":
+                prov_id = elem["dct:publisher"]["@value"]
+
+                # url, if any
+                if "foaf:page" in elem:
+                    url = elem["foaf:page"]["@value"]
+                else:
+                    url = None
+
+                data[id] = {
+                    "id": id,
+                    "title": title,
+                    "provider": prov_id,
+                    "url": url
+                    }
+
+        # journals
+        for id, kind, title, elem in entities:
+            if kind == "Journal":
+                if title == "unknown":
+                    unknown_journal = id
+
+                else:
+                    if "dct:identifier" in elem:
+                        issn = elem["dct:identifier"]["@value"]
+                    else:
+                        issn = ""
+
+                    # url, if any
+                    if "foaf:page" in elem:
+                        url = elem["foaf:page"]["@value"]
+                    else:
+                        url = None
+
+                    jour[id] = {
+                        "id": id,
+                        "title": title,
+                        "issn": issn,
+                        "url": url
+                        }
+
+        # authors
+        for id, kind, title, elem in entities:
+            if kind == "Author":
+                if "dct:identifier" in elem:
+                    orcid = elem["dct:identifier"]["@value"]
+                else:
+                    orcid = ""
+
+                auth[id] = {
+                    "id": id,
+                    "title": title,
+                    "orcid": orcid
+                    }
+
+        # topics
+        for id, kind, title, elem in entities:
+            if kind == "Topic":
+                topi[id] = {
+                    "id": id,
+                    "title": title
+                    }
+
+        # publications
+        for id, kind, title, elem in entities:
+            if kind == "ResearchPublication":
+                # link the datasets
+                data_list = []
+                l = elem["cito:citesAsDataSource"]
+
+                # if there's only one element, JSON-LD will link
+                # directly rather than enclose within a list
+                if isinstance(l, dict):
+                    l = [l]
+            
+                for d in l:
+                    data_id = d["@id"].split("#")[1]
+                    data[data_id]["used"] = True
+                    data_list.append(data_id)
+
+                    prov_id = data[data_id]["provider"]
+                    prov[prov_id]["used"] = True
+
+                # link the authors
+                auth_list = []
+        
+                if "dct:creator" in elem:
+                    l = elem["dct:creator"]
+                else:
+                    l = []
+
+                # ibid.
+                if isinstance(l, dict):
+                    l = [l]
+
+                for a in l:
+                    auth_id = a["@id"].split("#")[1]
+                    auth[auth_id]["used"] = True
+                    auth_list.append(auth_id)
+
+                # link the topics
+                topi_list = []
+
+                if "dct:subject" in elem:
+                    l = elem["dct:subject"]
+                else:
+                    l = []
+
+                # ibid.
+                if isinstance(l, dict):
+                    l = [l]
+
+                for t in l:
+                    topi_id = t["@id"].split("#")[1]
+                    topi[topi_id]["used"] = True
+                    topi_list.append(topi_id)
+
+                # add DOI
+                if "dct:identifier" in elem:
+                    doi = elem["dct:identifier"]["@value"]
+                else:
+                    doi = ""
+
+                # add journal
+                jour_id = None
+
+                if "dct:publisher" in elem:
+                    jour_id = elem["dct:publisher"]["@id"].split("#")[1]
+
+                    if jour_id == unknown_journal:
+                        jour_id = None
+                    else:
+                        jour[jour_id]["used"] = True
+
+                # add abstract
+                if "cito:description" in elem:
+                    abstract = elem["cito:description"]["@value"]
+                else:
+                    abstract = ""
+
+                # open access PDF, if any
+                if "openAccess" in elem:
+                    pdf = elem["openAccess"]["@value"]
+                else:
+                    pdf = None
+
+                publ[id] = {
+                    "id": id,
+                    "title": title,
+                    "doi": doi,
+                    "pdf": pdf,
+                    "journal": jour_id,
+                    "abstract": abstract,
+                    "datasets": data_list,
+                    "authors": auth_list,
+                    "topics": topi_list
+                    }
+
+        # pack the entities into columnar storage
+        titles = [ title for id, kind, title, elem in entities ]
+
+        store = RCEntityStore.build(self.id_list, titles, [
+                ("prov", prov),
+                ("data", data),
+                ("publ", publ),
+                ("jour", jour),
+                ("auth", auth),
+                ("topi", topi)
+                ])
+
+        self.attach_store(store)
+
+
+    ######################################################################
+    ## graph analytics
+
+    def incidence_matrix (self, entity_kind):
+        """
+        build a sparse publication x entity incidence matrix, indexed
+        by the numeric IDs of both
+        """
+        n = len(self.store)
+
+        if entity_kind in self.store.ID_COLUMNS:
+            cols = getattr(self.store, entity_kind)
+            rows = np.flatnonzero(cols >= 0)
+            return sparse.csr_matrix((np.ones(len(rows)), (rows, cols[rows])), shape=(n, n))
+
+        indptr, indices = self.store.links[entity_kind]
+        return sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(n, n))
+
+
+    def propagate_pdf (self, entity_kinds):
+        """
+        propagate probability distribution functions across the graph,
+        for conditional probabilities related to datasets
+        """
+        data_inc = self.incidence_matrix("datasets")
+        n_data = np.asarray(data_inc.sum(axis=1)).ravel()
+
+        counts = sparse.csr_matrix(data_inc.shape)
+        trials = np.zeros(data_inc.shape[0])
+
+        # co-occurrence counts for each entity with each dataset,
+        # plus the number of trials (datasets cited) per entity
+        for entity_kind in entity_kinds:
+            entity_inc = self.incidence_matrix(entity_kind).T.tocsr()
+            counts = counts + entity_inc @ data_inc
+            trials = trials + entity_inc @ n_data
+
+        self.mle = RCSparseTable.from_matrix(counts, trials)
+
+
+    def build_cousage (self):
+        """
+        count how often each pair of datasets gets cited together in
+        the same publication, plus how many publications cite each
+        dataset
+        """
+        data_inc = self.incidence_matrix("datasets")
+        data_inc.sum_duplicates()
+        data_inc.data[:] = 1.0
+
+        cousage = (data_inc.T @ data_inc).tocsr()
+        n_publ = cousage.diagonal()
+
+        cousage.setdiag(0)
+        cousage.eliminate_zeros()
+
+        self.cousage = RCSparseTable.from_matrix(cousage, n_publ, ranked=True)
+
+
+    def build_analytics_graph (self):
+        """
+        build a graph to calculate analytics
+        """
+        self.nxg = nx.Graph()
+        store = self.store
+
+        for p_id in self.prov.ids:
+            if store.is_used(p_id):
+                self.nxg.add_node(int(p_id))
+
+        for d_id in self.data.ids:
+            if store.is_used(d_id):
+                self.nxg.add_node(int(d_id))
+                self.nxg.add_edge(int(d_id), int(store.provider[d_id]), weight=10.0)
+
+        for a_id in self.auth.ids:
+            if store.is_used(a_id):
+                self.nxg.add_node(int(a_id))
+
+        for j_id in self.jour.ids:
+            if store.is_used(j_id):
+                self.nxg.add_node(int(j_id))
+
+        for t_id in self.topi.ids:
+            if store.is_used(t_id):
+                self.nxg.add_node(int(t_id))
+
+        for p_id in self.publ.ids:
+            p_id = int(p_id)
+            self.nxg.add_node(p_id)
+
+            for j_id in store.linked(p_id, "journal"):
+                self.nxg.add_edge(p_id, int(j_id), weight=1.0)
+
+            for d_id in store.linked(p_id, "datasets"):
+                self.nxg.add_edge(p_id, int(d_id), weight=20.0)
+
+            for a_id in store.linked(p_id, "authors"):
+                self.nxg.add_edge(p_id, int(a_id), weight=20.0)
+
+            for t_id in store.linked(p_id, "topics"):
+                self.nxg.add_edge(p_id, int(t_id), weight=10.0)
+
+        self.graph = RCGraph.from_networkx(self.nxg, len(store))
+
+
+    @classmethod
+    def calc_quantiles (cls, metrics, num_q):
+        """
+        calculate quantiles for the given list of metrics
+        """
+        bins = np.linspace(0, 1, num=num_q, endpoint=True)
+        s = pd.Series(metrics)
+        q = s.quantile(bins, interpolation="nearest")
+
+        try:
+            dig = np.digitize(metrics, q) - 1
+        except ValueError as e:
+            print("ValueError:", str(e), metrics, s, q, bins)
+            sys.exit(-1)
+
+        quantiles = []
+
+        for idx, q_hi in q.iteritems():
+            quantiles.append(q_hi)
+
+        return quantiles
+
+
+    def scale_ranks (self, scale_factor=3):
+        """
+        run quantile analysis on centrality metrics, assessing the
+        relative impact of each element in the KG
+        """
+        result = nx.eigenvector_centrality_numpy(self.nxg, weight="weight")
+        ranks = list(result.values())
+
+        quant = self.calc_quantiles(ranks, num_q=10)
+        num_quant = len(quant)
+
+        for id, rank in sorted(result.items(), key=itemgetter(1), reverse=True):
+            impact = stats.percentileofscore(ranks, rank)
+            scale = (((impact / num_quant) + 5) * scale_factor)
+            self.scale[id] = [int(round(scale)), impact / 100.0]
+
+
+    def load_network (self, path):
+        """
+        run the full usage pattern, prior to use of serialize() or
+        subgraph()
+        """
+        t0 = time.time()
+
+        self.parse_corpus(path)
+
+        self.propagate_pdf([ "authors", "journal", "topics" ])
+        self.build_cousage()
+
+        self.build_analytics_graph()
+        self.scale_ranks()
+        self.embedding = RCEmbedding.from_graph(self.graph)
+        self.layout = RCLayout.from_graph(self.graph)
+        self.hood_sizes = RCNeighborhoodSizes.from_graph(self.graph)
+
+        elapsed_time = (time.time() - t0) * 1000.0
+        return elapsed_time
+
+
+    ######################################################################
+    ## serialize for a fast load/launch
+
+    def serialize (self, links, path=Path("precomp.json")):
+        """
+        serialize all of the data structures required to recreate the
+        knowledge graph
+        """
+        view = [
+            list(self.scale.items())
+            ]
+
+        with codecs.open(path, "wb", encoding="utf8") as f:
+            json.dump(view, f, ensure_ascii=False)
+
+        arrays = self.store.serialize()
+
+        for key, value in self.graph.serialize().items():
+            arrays["graph_" + key] = value
+
+        for key, value in self.embedding.serialize().items():
+            arrays["embed_" + key] = value
+
+        for key, value in self.layout.serialize().items():
+            arrays["layout_" + key] = value
+
+        for key, value in self.hood_sizes.serialize().items():
+            arrays["anf_" + key] = value
+
+        for key, value in self.mle.serialize().items():
+            arrays["mle_" + key] = value
+
+        for key, value in self.cousage.serialize().items():
+            arrays["cousage_" + key] = value
+
+        np.savez(path.with_suffix(".npz"), **arrays)
+
+        self.build_payloads(links).write(path.with_suffix(".blob"))
+        self.compile_templates(path.with_suffix(".templates.zip"))
+
+
+    def compile_templates (self, path):
+        """
+        compile the minified link templates into a zip file of Python
+        modules, which the web workers load without the minifier; the
+        file gets written under a temporary name then renamed
+        """
+        tmp_path = path.with_name(path.name + ".tmp")
+        env = self.get_environment(self.template_folder)
+
+        env.compile_templates(
+            str(tmp_path),
+            filter_func=lambda name: name.startswith(RCMinifyLoader.COMPILED_PREFIX),
+            zip="deflated",
+            ignore_errors=False
+            )
+
+        os.replace(tmp_path, path)
+
+
+    ######################################################################
+    ## pre-compressed response payloads
+
+    @classmethod
+    def encode_json (cls, obj):
+        """
+        encode a response payload as JSON, the same way as `jsonify()`
+        """
+        return (json.dumps(obj, separators=(",", ":"), sort_keys=True) + "\n").encode("utf-8")
+
+
+    @classmethod
+    def compress_payload (cls, data, encoding):
+        """
+        compress a response payload at a high ratio, since this only
+        runs once during pre-compute
+        """
+        if encoding == "br":
+            return brotli.compress(data, quality=11)
+        elif encoding == "gzip":
+            return gzip.compress(data, compresslevel=9, mtime=0)
+
+        raise ValueError(f"unknown encoding: {encoding}")
+
+
+    def build_payloads (self, links):
+        """
+        pre-compute the compressed JSON payloads for the links and the
+        lookup responses for each entity, indexed by numeric ID
+        """
+        links_json = [ None ] * len(self.store)
+        lookup_json = [ None ] * len(self.store)
+
+        for uuid, html in links.items():
+            i = self.get_id(uuid)
+
+            if html:
+                links_json[i] = self.encode_json(html)
+
+            response = self.lookup_entity(uuid)
+
+            if response:
+                lookup_json[i] = self.encode_json(response)
+
+        writer = RCBlobWriter()
+
+        for section, payloads in [ ("links", links_json), ("lookup", lookup_json) ]:
+            for encoding in self.PAYLOAD_ENCODINGS:
+                writer.add_section(
+                    "{}.{}".format(section, encoding),
+                    [ self.compress_payload(p, encoding) if p else None for p in payloads ]
+                    )
+
+            if section in self.RAW_PAYLOADS:
+                writer.add_section("{}.json".format(section), payloads)
+
+        sections = RCSearchIndex.build(self.search_documents(), len(self.store))
+        sections.update(self.store.text_sections())
+
+        for name, payloads in sections.items():
+            writer.add_section(name, payloads)
+
+        return writer
+
+
+    ######################################################################
+    ## linked data viewer
+
+    def render_links (self):
+        """
+        leverage the `nxg` graph to generate HTML to render links for
+        each entity in the knowledge graph
+        """
+        links = {}
+
+        for p in self.prov.values():
+            links[p.view["id"]] = self.render_prov(p)
+
+        for d in self.data.values():
+            links[d.view["id"]] = self.render_data(d)
+
+        for a in self.auth.values():
+            links[a.view["id"]] = self.render_auth(a)
+
+        for j in self.jour.values():
+            links[j.view["id"]] = self.render_jour(j)
+
+        for t in self.topi.values():
+            links[t.view["id"]] = self.render_topi(t)
+
+        for p in self.publ.values():
+            links[p.view["id"]] = self.render_publ(p)
+
+        return links
+
+
+    ######################################################################
+    ## full-text search
+
+    def search_documents (self):
+        """
+        iterate through the text fields to index for each entity in
+        the graph: titles, plus the abstracts of publications
+        """
+        for i in np.flatnonzero(self.graph.nodes).tolist():
+            if self.store.kind_of(i) == "publ":
+                yield i, [ self.store.get_title(i), self.store.get_abstract(i) or "" ]
+            else:
+                yield i, [ self.store.get_title(i) ]
+
+
+######################################################################
+
+def main ():
+    # build a graph from the JSON-LD corpus
+    net = RCNetworkBuilder()
+    net.parse_corpus(Path("full.jsonld"))
+
+    # rank and scale each entity
+    net.build_analytics_graph()
+    net.scale_ranks()
+
+    # constrain the graph
+    t0 = time.time()
+
+    search_term = "IRI Infoscan"
+    radius = 2
+
+    subgraph, paths, node_id = net.get_subgraph(search_term, radius)
+    hood, diagram = net.extract_neighborhood(radius, subgraph, paths, node_id, "corpus.html")
+
+    print(hood.serialize(t0))
+
+
+if __name__ == "__main__":
+    main()
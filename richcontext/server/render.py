@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from jinja2 import FileSystemLoader
+from pathlib import Path
+import re
+
+
+class RCMinifyLoader (FileSystemLoader):
+    """
+    load Jinja2 templates with their markup already minified, so that
+    rendering is plain string assembly without a minify pass over the
+    output
+
+    Jinja2 tags get swapped for placeholders while the markup goes
+    through `html_minify`; any whitespace next to a `{% ... %}` tag
+    becomes a marker, since whether it collapses depends on which
+    branch gets rendered; `resolve()` settles the markers after each
+    render
+
+    pre-compute compiles the minified templates into Python modules,
+    which the web workers load instead, without the minifier
+    """
+    TEMPLATE_TAG = re.compile(r"(\{\{.*?\}\}|\{%.*?%\}|\{#.*?#\})", re.S)
+    PLACEHOLDER = re.compile(r"\x01(\d+)\x02|\x03(\d+)\x04")
+    STATEMENT_SPACE = re.compile(r"(\s*)(\x03\d+\x04)(\s*)")
+
+    SPACE_MARK = "\x07"
+    SPACE_RUN = re.compile(r"[ \x07]*\x07[ \x07]*")
+    VALUE_SPACE = re.compile(r"\s{2,}|[\r\n]")
+
+    COMPILED_PREFIX = "links/"	# templates which get compiled during pre-compute
+
+
+    @classmethod
+    def is_compiled (cls, template_folder, compiled_path):
+        """
+        have the templates been compiled into `compiled_path` since
+        they last changed?
+        """
+        compiled_path = Path(compiled_path)
+
+        if not compiled_path.exists():
+            return False
+
+        sources = (Path(template_folder) / cls.COMPILED_PREFIX).glob("*.html")
+        return all([ p.stat().st_mtime <= compiled_path.stat().st_mtime for p in sources ])
+
+
+    def get_source (self, environment, template):
+        source, filename, uptodate = super(RCMinifyLoader, self).get_source(environment, template)
+        return self.minify(source), filename, uptodate
+
+
+    @classmethod
+    def minify_html (cls, html):
+        """
+        the same minification that used to run on each rendered output
+        """
+        # only needed when the templates get compiled
+        from css_html_js_minify import html_minify
+
+        return html_minify(html).replace("  ", " ").replace("> <", "><").replace(" >", ">")
+
+
+    @classmethod
+    def minify (cls, source):
+        """
+        minify the markup in a Jinja2 template source
+        """
+        parts = cls.TEMPLATE_TAG.split(source)
+        text = []
+
+        # odd indices are the Jinja2 tags
+        for i, part in enumerate(parts):
+            if i % 2 == 0:
+                text.append(part)
+            elif part.startswith("{{"):
+                text.append("\x01{}\x02".format(i))
+            else:
+                text.append("\x03{}\x04".format(i))
+
+        html = cls.minify_html("".join(text))
+
+        html = cls.STATEMENT_SPACE.sub(
+            lambda m: (cls.SPACE_MARK if m.group(1) else "") + m.group(2) + (cls.SPACE_MARK if m.group(3) else ""),
+            html
+            )
+
+        return cls.PLACEHOLDER.sub(lambda m: parts[int(m.group(1) or m.group(2))], html)
+
+
+    @classmethod
+    def condense (cls, value):
+        """
+        condense whitespace within the values inserted into a template
+        """
+        if isinstance(value, str):
+            return cls.VALUE_SPACE.sub(" ", value)
+
+        return value
+
+
+    @classmethod
+    def resolve (cls, html):
+        """
+        resolve the whitespace markers in a rendered template: drop
+        them between tags, otherwise collapse to one space
+        """
+        def collapse (m):
+            before = html[m.start() - 1] if m.start() > 0 else ""
+            after = html[m.end()] if m.end() < len(html) else ""
+
+            if (before == ">" and after == "<") or after == ">":
+                return ""
+
+            return " "
+
+        return cls.SPACE_RUN.sub(collapse, html).strip()
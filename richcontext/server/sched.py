@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from collections import deque
+import heapq
+import itertools
+import math
+import numpy as np
+import threading
+import time
+
+
+class RCTokenBucket:
+    """
+    token bucket rate limiter: allows bursts of up to `burst`
+    requests, refilled at `rate` requests per second
+    """
+    def __init__ (self, rate, burst, tokens=None, stamp=None):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst) if tokens is None else float(tokens)
+        self.stamp = time.monotonic() if stamp is None else stamp
+        self.lock = threading.Lock()
+
+
+    def take (self, now=None):
+        """
+        take one token if available; returns `0.0` on success,
+        otherwise the number of seconds until a token is available
+        """
+        with self.lock:
+            now = time.monotonic() if now is None else now
+            self.tokens = min(self.burst, self.tokens + max(now - self.stamp, 0.0) * self.rate)
+            self.stamp = now
+
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+
+            return (1.0 - self.tokens) / self.rate
+
+
+class RCRateLimiter:
+    """
+    token buckets per client, kept in the disk cache so that every
+    worker process sharing the cache enforces the same limits; each
+    bucket gets updated within a transaction, and expires once it
+    would have refilled anyway
+    """
+    def __init__ (self, disk_cache, prefix="rate-"):
+        self.disk_cache = disk_cache
+        self.prefix = prefix
+
+
+    def take (self, key, rate, burst):
+        """
+        take one token from the bucket for `key`; returns `0.0` on
+        success, otherwise the number of seconds until a token is
+        available
+        """
+        cache_key = self.prefix + key
+        now = time.time()
+
+        with self.disk_cache.transact():
+            state = self.disk_cache.get(cache_key)
+            tokens, stamp = state if state else (None, now)
+
+            bucket = RCTokenBucket(rate, burst, tokens=tokens, stamp=stamp)
+            retry = bucket.take(now=now)
+
+            expire = math.ceil(bucket.burst / bucket.rate) + 1
+            self.disk_cache.set(cache_key, (bucket.tokens, bucket.stamp), expire=expire)
+
+        return retry
+
+
+class RCScheduler:
+    """
+    admit requests into a bounded number of active slots, in order of
+    the priority of each request's role, with a concurrency limit per
+    role, so that a role which reaches its limit doesn't hold up the
+    other roles; requests which wait longer than `max_wait` seconds
+    time out
+    """
+    WAIT_WINDOW = 1024	# recent wait times kept for the percentiles
+
+    def __init__ (self, policies, max_active=16, max_wait=10.0):
+        """
+        `policies` maps each role to a dict of its `priority` (lower
+        goes first) and `limit` on concurrent requests
+        """
+        self.policies = policies
+        self.max_active = max_active
+        self.max_wait = max_wait
+
+        self.cond = threading.Condition()
+        self.counter = itertools.count()
+        self.waiting = []
+        self.total_active = 0
+
+        self.stats = {
+            role: {
+                "active": 0,
+                "queued": 0,
+                "granted": 0,
+                "rate_limited": 0,
+                "timed_out": 0,
+                "max_wait_ms": 0.0,
+                "waits": deque(maxlen=self.WAIT_WINDOW)
+                }
+            for role in policies
+            }
+
+
+    def next_grant (self):
+        """
+        the waiting entry to admit next, if any slot is open
+        """
+        if self.total_active >= self.max_active:
+            return None
+
+        for entry in sorted(self.waiting):
+            role = entry[2]
+
+            if self.stats[role]["active"] < self.policies[role]["limit"]:
+                return entry
+
+        return None
+
+
+    def acquire (self, role):
+        """
+        wait for an active slot for a request with the given role;
+        returns `False` if the wait timed out
+        """
+        t0 = time.monotonic()
+        deadline = t0 + self.max_wait
+        stats = self.stats[role]
+
+        with self.cond:
+            entry = (self.policies[role]["priority"], next(self.counter), role)
+            heapq.heappush(self.waiting, entry)
+            stats["queued"] += 1
+
+            while self.next_grant() != entry:
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0.0:
+                    self.waiting.remove(entry)
+                    heapq.heapify(self.waiting)
+                    stats["queued"] -= 1
+                    stats["timed_out"] += 1
+
+                    # another entry may now be next in line
+                    self.cond.notify_all()
+                    return False
+
+                self.cond.wait(remaining)
+
+            self.waiting.remove(entry)
+            heapq.heapify(self.waiting)
+            stats["queued"] -= 1
+            stats["active"] += 1
+            stats["granted"] += 1
+            self.total_active += 1
+
+            wait_ms = (time.monotonic() - t0) * 1000.0
+            stats["waits"].append(wait_ms)
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+
+            # a slot may remain open for the next entry in line
+            self.cond.notify_all()
+
+        return True
+
+
+    def release (self, role):
+        with self.cond:
+            self.stats[role]["active"] -= 1
+            self.total_active -= 1
+            self.cond.notify_all()
+
+
+    def rate_limited (self, role):
+        with self.cond:
+            self.stats[role]["rate_limited"] += 1
+
+
+    def metrics (self):
+        """
+        report the queue depth, active requests, and wait times (in
+        milliseconds) for each role
+        """
+        with self.cond:
+            view = {
+                "active": self.total_active,
+                "queued": len(self.waiting),
+                "roles": {}
+                }
+
+            for role, stats in self.stats.items():
+                waits = np.array(stats["waits"]) if stats["waits"] else np.zeros(1)
+                p50, p95 = np.percentile(waits, [ 50, 95 ]).tolist()
+
+                view["roles"][role] = {
+                    "active": stats["active"],
+                    "queued": stats["queued"],
+                    "granted": stats["granted"],
+                    "rate_limited": stats["rate_limited"],
+                    "timed_out": stats["timed_out"],
+                    "wait_p50_ms": round(p50, 2),
+                    "wait_p95_ms": round(p95, 2),
+                    "wait_max_ms": round(stats["max_wait_ms"], 2)
+                    }
+
+        return view
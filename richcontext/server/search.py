@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import numpy as np
+import re
+
+
+def encode_varints (values):
+    """
+    encode an array of non-negative integers as LEB128 varints
+    """
+    values = np.asarray(values, dtype=np.uint64)
+
+    if len(values) == 0:
+        return b""
+
+    nbytes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+
+    while rest.any():
+        nbytes += rest > 0
+        rest >>= np.uint64(7)
+
+    starts = np.cumsum(nbytes) - nbytes
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+
+    for k in range(int(nbytes.max())):
+        mask = nbytes > k
+        byte = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (nbytes[mask] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[mask] + k] = byte | more
+
+    return out.tobytes()
+
+
+def decode_varints (data):
+    """
+    decode a buffer of LEB128 varints into an array of integers
+    """
+    b = np.frombuffer(data, dtype=np.uint8)
+
+    if len(b) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    ends = np.flatnonzero(b < 0x80)
+    starts = np.concatenate([ [ 0 ], ends[:-1] + 1 ])
+
+    group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shift = (7 * (np.arange(len(b)) - starts[group])).astype(np.uint64)
+    parts = (b & 0x7f).astype(np.uint64) << shift
+
+    return np.add.reduceat(parts, starts).astype(np.int64)
+
+
+class RCSearchIndex:
+    """
+    inverted index for full-text search with BM25 scoring, stored as
+    sections of an `RCBlobWriter` file so that it gets served from a
+    memory map:
+
+      * `search.terms`: the vocabulary, in sorted order of its UTF-8 bytes
+      * `search.docs`: per term, varints of the document frequency, then
+        the delta-coded document IDs, then the term frequencies
+      * `search.pos`: per term, varints of the delta-coded positions
+        within each document, in the same order as `search.docs`
+      * `search.len`: the length of each document, as int32
+
+    queries match documents which contain every clause, where a clause
+    is a word, a `"quoted phrase"`, or a `prefix*`
+    """
+    K1 = 1.2
+    B = 0.75
+    MAX_EXPANSIONS = 64
+    FIELD_GAP = 1
+
+    TOKEN = re.compile(r"\w+")
+    CLAUSE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+    def __init__ (self, blob):
+        self.blob = blob
+        self.num_terms = blob.count("search.terms")
+
+        data = blob.get("search.len", 0)
+        self.doc_len = np.frombuffer(data, dtype="<i4") if data is not None else np.zeros(0, dtype="<i4")
+        has_len = self.doc_len > 0
+        self.avg_len = float(self.doc_len[has_len].mean()) if has_len.any() else 1.0
+        self.num_docs = int(has_len.sum())
+
+
+    @classmethod
+    def tokenize (cls, text):
+        return cls.TOKEN.findall(text.lower()) if text else []
+
+
+    @classmethod
+    def build (cls, docs, num_docs):
+        """
+        build the index for `docs`, an iterable of `(doc_id, fields)`
+        with each doc ID in the range `[0, num_docs)` and each field a
+        text string; returns the sections to add to an `RCBlobWriter`
+        """
+        postings = {}
+        doc_len = np.zeros(num_docs, dtype="<i4")
+
+        for doc_id, fields in docs:
+            pos = 0
+
+            for text in fields:
+                for token in cls.tokenize(text):
+                    postings.setdefault(token, {}).setdefault(doc_id, []).append(pos)
+                    pos += 1
+
+                # keep phrases from matching across fields
+                pos += cls.FIELD_GAP
+
+            doc_len[doc_id] = max(pos - cls.FIELD_GAP * len(fields), 0)
+
+        terms = sorted(postings, key=lambda t: t.encode("utf-8"))
+        term_list = []
+        docs_list = []
+        pos_list = []
+
+        for term in terms:
+            by_doc = postings[term]
+            doc_ids = np.array(sorted(by_doc), dtype=np.int64)
+            tfs = [ len(by_doc[d]) for d in doc_ids.tolist() ]
+
+            positions = np.concatenate([ np.diff(by_doc[d], prepend=0) for d in doc_ids.tolist() ])
+            doc_deltas = np.diff(doc_ids, prepend=0)
+
+            term_list.append(term.encode("utf-8"))
+            docs_list.append(encode_varints(np.concatenate([ [ len(doc_ids) ], doc_deltas, tfs ])))
+            pos_list.append(encode_varints(positions))
+
+        return {
+            "search.terms": term_list,
+            "search.docs": docs_list,
+            "search.pos": pos_list,
+            "search.len": [ doc_len.tobytes() ]
+            }
+
+
+    def term_at (self, t):
+        return bytes(self.blob.get("search.terms", t))
+
+
+    def lower_bound (self, key):
+        """
+        binary search for the first term ID whose bytes are `>= key`
+        """
+        lo = 0
+        hi = self.num_terms
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+
+            if self.term_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+
+    def find_term (self, term):
+        key = term.encode("utf-8")
+        t = self.lower_bound(key)
+
+        if t < self.num_terms and self.term_at(t) == key:
+            return t
+
+        return None
+
+
+    def prefix_terms (self, prefix):
+        """
+        list the IDs of up to `MAX_EXPANSIONS` terms that start with
+        `prefix`
+        """
+        key = prefix.encode("utf-8")
+        t = self.lower_bound(key)
+        expansions = []
+
+        while t < self.num_terms and len(expansions) < self.MAX_EXPANSIONS and self.term_at(t).startswith(key):
+            expansions.append(t)
+            t += 1
+
+        return expansions
+
+
+    def postings (self, t):
+        """
+        get the document IDs and term frequencies for term ID `t`
+        """
+        values = decode_varints(self.blob.get("search.docs", t))
+        df = int(values[0])
+
+        return np.cumsum(values[1:df + 1]), values[df + 1:]
+
+
+    def positions (self, t, docs, tfs):
+        """
+        get the positions of term ID `t` as keys combining the
+        document ID in the upper bits with the position in the lower
+        """
+        deltas = decode_varints(self.blob.get("search.pos", t))
+        group_starts = np.cumsum(tfs) - tfs
+
+        pos = np.cumsum(deltas)
+        pos -= np.repeat(pos[group_starts] - deltas[group_starts], tfs)
+
+        return (np.repeat(docs, tfs) << 32) | pos
+
+
+    def bm25 (self, docs, tfs):
+        """
+        BM25 scores for the postings of one term
+        """
+        df = len(docs)
+        idf = np.log(1.0 + (self.num_docs - df + 0.5) / (df + 0.5))
+        norm = self.K1 * (1.0 - self.B + self.B * self.doc_len[docs] / self.avg_len)
+
+        return idf * tfs * (self.K1 + 1.0) / (tfs + norm)
+
+
+    def parse_query (self, query):
+        """
+        parse a query into a list of clauses, each a list of words,
+        where a final `*` makes a clause a prefix query
+        """
+        clauses = []
+
+        for phrase, word in self.CLAUSE.findall(query):
+            if phrase:
+                words = self.tokenize(phrase)
+
+                if words:
+                    clauses.append(("phrase", words))
+
+            elif word.endswith("*") and len(self.tokenize(word)) == 1:
+                clauses.append(("prefix", self.tokenize(word)))
+
+            else:
+                clauses.extend([ ("word", [ w ]) for w in self.tokenize(word) ])
+
+        return clauses
+
+
+    def match_clause (self, kind, words):
+        """
+        find the documents which match one clause, along with their
+        BM25 scores
+        """
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0))
+
+        if kind == "prefix":
+            hits = [ self.postings(t) for t in self.prefix_terms(words[0]) ]
+
+            if not hits:
+                return empty
+
+            docs = np.concatenate([ d for d, tf in hits ])
+            scores = np.concatenate([ self.bm25(d, tf) for d, tf in hits ])
+            docs, inverse = np.unique(docs, return_inverse=True)
+
+            return docs, np.bincount(inverse, weights=scores)
+
+        term_ids = [ self.find_term(w) for w in words ]
+
+        if None in term_ids:
+            return empty
+
+        postings = [ self.postings(t) for t in term_ids ]
+        scores = [ self.bm25(d, tf) for d, tf in postings ]
+
+        docs = postings[0][0]
+
+        for d, tf in postings[1:]:
+            docs = np.intersect1d(docs, d, assume_unique=True)
+
+        if kind == "phrase" and len(words) > 1:
+            # align the positions of each word to the start of the phrase
+            starts = None
+
+            for offset, (t, (d, tf)) in enumerate(zip(term_ids, postings)):
+                keep = np.isin(d, docs, assume_unique=True)
+                keys = self.positions(t, d, tf)[np.repeat(keep, tf)] - offset
+                starts = keys if starts is None else np.intersect1d(starts, keys, assume_unique=True)
+
+            docs = np.unique(starts >> 32)
+
+        total = np.zeros(len(docs))
+
+        for (d, tf), s in zip(postings, scores):
+            total += s[np.searchsorted(d, docs)]
+
+        return docs, total
+
+
+    def search (self, query, k=10, mask=None):
+        """
+        run a query, returning the top `k` documents as a list of
+        `(doc_id, score)`; `mask` optionally restricts which documents
+        can match, as a boolean array indexed by doc ID
+        """
+        docs = None
+        scores = None
+
+        for kind, words in self.parse_query(query):
+            d, s = self.match_clause(kind, words)
+
+            if docs is None:
+                docs, scores = d, s
+            else:
+                docs, i, j = np.intersect1d(docs, d, assume_unique=True, return_indices=True)
+                scores = scores[i] + s[j]
+
+            if len(docs) == 0:
+                return []
+
+        if docs is None:
+            return []
+
+        if mask is not None:
+            keep = mask[docs]
+            docs = docs[keep]
+            scores = scores[keep]
+
+        if k < len(docs):
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(docs))
+
+        top = top[np.lexsort((docs[top], -scores[top]))]
+
+        return list(zip(docs[top].tolist(), scores[top].tolist()))
@@ -1,25 +1,41 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
-from collections import defaultdict
-from css_html_js_minify import html_minify
 from functools import lru_cache
-from jinja2 import Environment, FileSystemLoader
-from operator import itemgetter
+from jinja2 import Environment, ModuleLoader
 from pathlib import Path
-from pyvis.network import Network
+from .anf import RCNeighborhoodSizes
+from .blob import RCBlobReader
+from .cache import RCLRUCache
+from .embed import RCEmbedding
+from .facets import RCFacetIndex
+from .graph import RCGraph
+from .layout import RCLayout
+from .render import RCMinifyLoader
+from .search import RCSearchIndex
+from .store import RCEntityStore, RCKindMap
+import base64
 import codecs
+import csv
+import gzip
+import hashlib
+import io
 import json
-import networkx as nx
 import numpy as np
-import pandas as pd
-import scipy.stats as stats
-import sys
 import time
 import traceback
 
 
 class RCNeighbors:
+    KINDS = [ "prov", "data", "publ", "jour", "auth", "topi" ]
+
+    MIME_JSON = "application/json"
+    MIME_COLUMNAR = "application/vnd.richcontext.columnar+json"
+    MIME_MSGPACK = "application/msgpack"
+    MIME_NDJSON = "application/x-ndjson"
+
+    ENCODINGS = [ MIME_JSON, MIME_COLUMNAR, MIME_MSGPACK, MIME_NDJSON ]
+
     def __init__ (self):
         self.prov = []
         self.data = []
@@ -28,518 +44,554 @@ class RCNeighbors:
         self.auth = []
         self.topi = []
 
+        # for multi-seed queries
+        self.seeds = None
+        self.seed_dist = None
 
-    def serialize (self, t0, cache_token):
+
+    def sorted_rows (self, kind):
         """
-        serialize this subgraph/neighborhood as JSON
+        rows for one kind of entity, in descending order of rank
         """
-        view = {
-            "prov": sorted(self.prov, key=lambda x: x[1], reverse=True),
-            "data": sorted(self.data, key=lambda x: x[1], reverse=True),
-            "publ": sorted(self.publ, key=lambda x: x[1], reverse=True),
-            "jour": sorted(self.jour, key=lambda x: x[1], reverse=True),
-            "auth": sorted(self.auth, key=lambda x: x[1], reverse=True),
-            "topi": sorted(self.topi, key=lambda x: x[1], reverse=True),
-            "toke": cache_token,
-            "time": "{:.2f}".format((time.time() - t0) * 1000.0)
-            }
+        return sorted(getattr(self, kind), key=lambda x: x[1], reverse=True)
 
-        return json.dumps(view, indent=4, sort_keys=True, ensure_ascii=False)
 
+    def serialize (self, t0, cache_token, encoding=MIME_JSON):
+        """
+        serialize this subgraph/neighborhood as JSON, or in one of the
+        compact encodings
+        """
+        if encoding == self.MIME_COLUMNAR:
+            view = self.columnar(t0, cache_token)
+            return json.dumps(view, separators=(",", ":"), ensure_ascii=False)
 
-class RCNetworkNode:
-    def __init__ (self, view=None, elem=None):
-        self.view = view
-        self.elem = elem
+        elif encoding == self.MIME_MSGPACK:
+            # only needed by the clients which ask for it
+            import msgpack
 
+            view = self.columnar(t0, cache_token)
+            return msgpack.packb(view, use_bin_type=True)
 
-class RCNetwork:
-    MAX_TITLE_LEN = 100
-    Z_975 = stats.norm.ppf(q=0.975)
+        view = { kind: self.sorted_rows(kind) for kind in self.KINDS }
 
-    def __init__ (self):
-        self.id_list = []
-        self.labels = {}
+        if self.seeds is not None:
+            ids = [ r[0] for kind in self.KINDS for r in getattr(self, kind) ]
+            view["seeds"] = self.seeds
+            view["dist"] = { i: self.seed_dist[i] for i in ids }
+            view["shared"] = sorted([ i for i in ids if self.is_shared(i) ])
 
-        self.nxg = None
-        self.scale = {}
+        view["toke"] = cache_token
+        view["time"] = "{:.2f}".format((time.time() - t0) * 1000.0)
 
-        self.prov = {}
-        self.data = {}
-        self.publ = {}
-        self.jour = {}
-        self.auth = {}
-        self.topi = {}
+        return json.dumps(view, indent=4, sort_keys=True, ensure_ascii=False)
 
 
-    def get_id (self, id):
+    def columnar (self, t0, cache_token):
         """
-        lookup the numeric ID for an element
+        represent the neighborhood as parallel arrays per kind of
+        entity, with the numeric fields left unformatted
+        """
+        view = {}
+
+        for kind in self.KINDS:
+            rows = self.sorted_rows(kind)
+
+            view[kind] = {
+                "id": [ r[0] for r in rows ],
+                "proximity": [ r[1][0] for r in rows ],
+                "count": [ r[1][1] for r in rows ],
+                "estimate": [ r[1][2] for r in rows ],
+                "impact": [ r[1][3] for r in rows ],
+                "label": [ r[3] for r in rows ],
+                "title": [ r[4] for r in rows ],
+                "shown": [ r[5] for r in rows ]
+                }
+
+            if self.seeds is not None:
+                view[kind]["dist"] = [ self.seed_dist[r[0]] for r in rows ]
+                view[kind]["shared"] = [ self.is_shared(r[0]) for r in rows ]
+
+        if self.seeds is not None:
+            view["seeds"] = self.seeds
+
+        view["toke"] = cache_token
+        view["time"] = (time.time() - t0) * 1000.0
+
+        return view
+
+
+    def is_shared (self, i):
         """
-        return int(self.id_list.index(id))
+        is this node within the radius of more than one seed?
+        """
+        return sum([ 1 for d in self.seed_dist[i] if d >= 0 ]) > 1
 
 
-    def parse_metadata (self, elem):
+    def row_record (self, row):
         """
-        parse the required metadata items from one element in the graph
+        represent one row as a dict, with the same fields as the
+        columnar encoding
         """
-        kind = elem["@type"]
-        title = elem["dct:title"]["@value"]
-        id = elem["@id"].split("#")[1]
+        record = {
+            "id": row[0],
+            "proximity": row[1][0],
+            "count": row[1][1],
+            "estimate": row[1][2],
+            "impact": row[1][3],
+            "label": row[3],
+            "title": row[4],
+            "shown": row[5]
+            }
 
-        self.id_list.append(id)
-        self.labels[self.get_id(id)] = title
+        if self.seeds is not None:
+            record["dist"] = self.seed_dist[row[0]]
+            record["shared"] = self.is_shared(row[0])
 
-        return id, kind, title, elem
+        return record
 
 
-    def parse_corpus (self, path):
+    def records (self, radius):
         """
-        parse each of the entities within the KG
+        generate the rows of every kind as `(hop, kind, record)`, the
+        nearest hop first and each hop in descending order of rank,
+        the same order in which a streamed query sends them
         """
-        with codecs.open(path, "r", encoding="utf8") as f:
-            jld_corpus = json.load(f)
-            corpus = jld_corpus["@graph"]
-
-        entities = [ self.parse_metadata(e) for e in corpus ]
-        unknown_journal = None
-
-        # providers
-        for id, kind, title, elem in entities:
-            if kind == "Provider":
-                if "dct:identifier" in elem:
-                    ror = elem["dct:identifier"]["@value"]
-                else:
-                    ror = ""
-
-                self.prov[id] = RCNetworkNode(
-                    view={
-                        "id": id,
-                        "title": title,
-                        "ror": ror
-                        },
-                    elem=elem
-                    )
-
-        # datasets
-        for id, kind, title, elem in entities:
-            if kind == "Dataset":
-                prov_id = elem["dct:publisher"]["@value"]
-
-                # url, if any
-                if "foaf:page" in elem:
-                    url = elem["foaf:page"]["@value"]
-                else:
-                    url = None
-
-                self.data[id] = RCNetworkNode(
-                    view={
-                        "id": id,
-                        "title": title,
-                        "provider": prov_id,
-                        "url": url
-                        },
-                    elem=elem
-                    )
-
-        # journals
-        for id, kind, title, elem in entities:
-            if kind == "Journal":
-                if title == "unknown":
-                    unknown_journal = id
-
-                else:
-                    if "dct:identifier" in elem:
-                        issn = elem["dct:identifier"]["@value"]
-                    else:
-                        issn = ""
-
-                    # url, if any
-                    if "foaf:page" in elem:
-                        url = elem["foaf:page"]["@value"]
-                    else:
-                        url = None
-
-                    self.jour[id] = RCNetworkNode(
-                        view={
-                            "id": id,
-                            "title": title,
-                            "issn": issn,
-                            "url": url
-                            },
-                        elem=elem
-                        )
-
-        # authors
-        for id, kind, title, elem in entities:
-            if kind == "Author":
-                if "dct:identifier" in elem:
-                    orcid = elem["dct:identifier"]["@value"]
-                else:
-                    orcid = ""
-
-                self.auth[id] = RCNetworkNode(
-                    view={
-                        "id": id,
-                        "title": title,
-                        "orcid": orcid
-                        },
-                    elem=elem
-                    )
-
-        # topics
-        for id, kind, title, elem in entities:
-            if kind == "Topic":
-                self.topi[id] = RCNetworkNode(
-                    view={
-                        "id": id,
-                        "title": title
-                        },
-                    elem=elem
-                    )
-
-        # publications
-        for id, kind, title, elem in entities:
-            if kind == "ResearchPublication":
-                # link the datasets
-                data_list = []
-                l = elem["cito:citesAsDataSource"]
-
-                # if there's only one element, JSON-LD will link
-                # directly rather than enclose within a list
-                if isinstance(l, dict):
-                    l = [l]
-            
-                for d in l:
-                    data_id = d["@id"].split("#")[1]
-                    self.data[data_id].view["used"] = True
-                    data_list.append(data_id)
-
-                    prov_id = self.data[data_id].view["provider"]
-                    self.prov[prov_id].view["used"] = True
-
-                # link the authors
-                auth_list = []
-        
-                if "dct:creator" in elem:
-                    l = elem["dct:creator"]
-                else:
-                    l = []
-
-                # ibid.
-                if isinstance(l, dict):
-                    l = [l]
-
-                for a in l:
-                    auth_id = a["@id"].split("#")[1]
-                    self.auth[auth_id].view["used"] = True
-                    auth_list.append(auth_id)
-
-                # link the topics
-                topi_list = []
-
-                if "dct:subject" in elem:
-                    l = elem["dct:subject"]
-                else:
-                    l = []
-
-                # ibid.
-                if isinstance(l, dict):
-                    l = [l]
-
-                for t in l:
-                    topi_id = t["@id"].split("#")[1]
-                    self.topi[topi_id].view["used"] = True
-                    topi_list.append(topi_id)
-
-                # add DOI
-                if "dct:identifier" in elem:
-                    doi = elem["dct:identifier"]["@value"]
-                else:
-                    doi = ""
-
-                # add journal
-                if "dct:publisher" in elem:
-                    jour_id = elem["dct:publisher"]["@id"].split("#")[1]
-
-                    if jour_id == unknown_journal:
-                        jour_id = None
-                    else:
-                        self.jour[jour_id].view["used"] = True
-
-                # add abstract
-                if "cito:description" in elem:
-                    abstract = elem["cito:description"]["@value"]
-                else:
-                    abstract = ""
-
-                # open access PDF, if any
-                if "openAccess" in elem:
-                    pdf = elem["openAccess"]["@value"]
-                else:
-                    pdf = None
-
-                self.publ[id] = RCNetworkNode(
-                    view={
-                        "id": id,
-                        "title": title,
-                        "doi": doi,
-                        "pdf": pdf,
-                        "journal": jour_id,
-                        "abstract": abstract,
-                        "datasets": data_list,
-                        "authors": auth_list,
-                        "topics": topi_list
-                        },
-                    elem=elem
-                    )
+        rows = [ (row, kind) for kind in self.KINDS for row in getattr(self, kind) ]
+        rows.sort(key=lambda x: (x[0][1], -x[0][0]), reverse=True)
 
+        for row, kind in rows:
+            yield radius - row[1][0], kind, self.row_record(row)
 
-    ######################################################################
-    ## graph analytics
 
     @classmethod
-    @lru_cache()
-    def point_estimate (cls, x, n):
-        return (float(x) + cls.Z_975) / (float(n) + 2.0 * cls.Z_975)
+    def encode_cursor (cls, row):
+        """
+        opaque cursor for keyset pagination, which resumes after `row`
+        """
+        key = json.dumps([ list(row[1]), row[0] ], separators=(",", ":"))
+        return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
 
 
-    def propagate_pdf (self, entity_class, entity_kind):
+    @classmethod
+    def decode_cursor (cls, cursor):
         """
-        propagate probability distribution functions across the graph,
-        for conditional probabilities related to datasets
+        returns the `(rank, id)` key of a cursor, or raises
+        `ValueError` if it's malformed
         """
-        trials = defaultdict(int)
-        counts = defaultdict(dict)
+        try:
+            rank, i = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return tuple(rank), int(i)
+        except Exception:
+            raise ValueError("bad cursor: {}".format(cursor))
 
-        for p in self.publ.values():
-            if p.view[entity_kind]:
-                coll = p.view[entity_kind]
 
-                if isinstance(coll, str):
-                    coll = [coll]
+    def page (self, t0, cache_token, kind, limit, cursor=None):
+        """
+        one page of the rows for a kind of entity, in descending order
+        of rank then ascending ID; the `next` cursor resumes after the
+        last row, so pages stay stable while cached
+        """
+        # order ties by ID, to match the key which the cursor resumes
+        # after, regardless of the order in which the rows were added
+        rows = sorted(getattr(self, kind), key=lambda r: (tuple(r[1]), -r[0]), reverse=True)
 
-                for e in coll:
-                    n = float(len(p.view["datasets"]))
-                    trials[e] += n
+        if cursor:
+            rank, i = self.decode_cursor(cursor)
+            rows = [ r for r in rows if tuple(r[1]) < rank or (tuple(r[1]) == rank and r[0] > i) ]
 
-                    for d in p.view["datasets"]:
-                        if d not in counts[e]:
-                            counts[e][d] = 1
-                        else:
-                            counts[e][d] += 1
+        view = {
+            "kind": kind,
+            "total": len(getattr(self, kind)),
+            "rows": [ self.row_record(r) for r in rows[:limit] ],
+            "next": self.encode_cursor(rows[limit - 1]) if len(rows) > limit else None,
+            "toke": cache_token,
+            "time": "{:.2f}".format((time.time() - t0) * 1000.0)
+            }
 
-        for e in entity_class.values():
-            e_id = e.view["id"]
-            mle = {}
+        return json.dumps(view, indent=4, sort_keys=True, ensure_ascii=False)
 
-            for d, x in counts[e_id].items():
-                pt_est = self.point_estimate(x, trials[e_id])
-                mle[self.get_id(d)] = [x, pt_est]
 
-            e.view["mle"] = mle
+class RCSparseTable:
+    """
+    co-occurrence counts between entities and datasets, stored in CSR
+    form: one row per entity, with a column for each dataset
+    """
+    def __init__ (self, indptr=None, indices=None, counts=None, trials=None, order=None):
+        self.indptr = np.asarray(indptr if indptr is not None else [0], dtype=np.int64)
+        self.indices = np.asarray(indices if indices is not None else [], dtype=np.int32)
+        self.counts = np.asarray(counts if counts is not None else [], dtype=np.int32)
+        self.trials = np.asarray(trials if trials is not None else [], dtype=np.float64)
+        self.order = np.asarray(order, dtype=np.int64) if order is not None else None
 
 
-    def build_analytics_graph (self):
+    @classmethod
+    def from_matrix (cls, counts, trials, ranked=False):
         """
-        build a graph to calculate analytics
+        construct from a `scipy.sparse` matrix of counts, plus a vector
+        of the number of trials per row; if `ranked` then also keep the
+        entries of each row in descending order of count, for `top()`
         """
-        self.nxg = nx.Graph()
+        m = counts.tocsr()
+        m.sum_duplicates()
+        m.sort_indices()
+        order = None
 
-        for p in self.prov.values():
-            if "used" in p.view:
-                self.nxg.add_node(self.get_id(p.view["id"]))
+        if ranked:
+            rows = np.repeat(np.arange(m.shape[0]), np.diff(m.indptr))
+            order = np.lexsort((m.indices, -m.data, rows))
 
-        for d in self.data.values():
-            if "used" in d.view:
-                self.nxg.add_node(self.get_id(d.view["id"]))
-                self.nxg.add_edge(self.get_id(d.view["id"]), self.get_id(d.view["provider"]), weight=10.0)
+        return cls(m.indptr, m.indices, m.data, np.ravel(trials), order)
 
-        for a in self.auth.values():
-            if "used" in a.view:
-                self.nxg.add_node(self.get_id(a.view["id"]))
 
-        for j in self.jour.values():
-            if "used" in j.view:
-                self.nxg.add_node(self.get_id(j.view["id"]))
+    def get (self, row, col):
+        """
+        lookup the count at (`row`, `col`) and the number of trials
+        for that row; returns `None` if there's no entry
+        """
+        if row < 0 or row + 1 >= len(self.indptr):
+            return None
 
-        for t in self.topi.values():
-            if "used" in t.view:
-                self.nxg.add_node(self.get_id(t.view["id"]))
+        lo = self.indptr[row]
+        hi = self.indptr[row + 1]
+        i = lo + np.searchsorted(self.indices[lo:hi], col)
 
-        for p in self.publ.values():
-            self.nxg.add_node(self.get_id(p.view["id"]))
+        if i < hi and self.indices[i] == col:
+            return int(self.counts[i]), float(self.trials[row])
 
-            if p.view["journal"]:
-                self.nxg.add_edge(self.get_id(p.view["id"]), self.get_id(p.view["journal"]), weight=1.0)
+        return None
 
-            for d in p.view["datasets"]:
-                self.nxg.add_edge(self.get_id(p.view["id"]), self.get_id(d), weight=20.0)
 
-            for a in p.view["authors"]:
-                self.nxg.add_edge(self.get_id(p.view["id"]), self.get_id(a), weight=20.0)
+    def top (self, row, k):
+        """
+        list the `k` entries in a ranked row with the highest counts,
+        as `(col, count)`, plus the number of trials for that row
+        """
+        if row < 0 or row + 1 >= len(self.indptr):
+            return [], 0.0
 
-            for t in p.view["topics"]:
-                self.nxg.add_edge(self.get_id(p.view["id"]), self.get_id(t), weight=10.0)
+        lo = self.indptr[row]
+        hi = min(self.indptr[row + 1], lo + k)
+        pos = self.order[lo:hi]
 
+        return list(zip(self.indices[pos].tolist(), self.counts[pos].tolist())), float(self.trials[row])
 
-    @classmethod
-    def calc_quantiles (cls, metrics, num_q):
+
+    def serialize (self):
         """
-        calculate quantiles for the given list of metrics
+        return the table as a dict of numpy arrays
         """
-        bins = np.linspace(0, 1, num=num_q, endpoint=True)
-        s = pd.Series(metrics)
-        q = s.quantile(bins, interpolation="nearest")
+        arrays = {
+            "indptr": self.indptr,
+            "indices": self.indices,
+            "counts": self.counts,
+            "trials": self.trials
+            }
 
-        try:
-            dig = np.digitize(metrics, q) - 1
-        except ValueError as e:
-            print("ValueError:", str(e), metrics, s, q, bins)
-            sys.exit(-1)
+        if self.order is not None:
+            arrays["order"] = self.order
+
+        return arrays
+
+
+    @classmethod
+    def deserialize (cls, arrays):
+        return cls(arrays["indptr"], arrays["indices"], arrays["counts"], arrays["trials"], arrays.get("order"))
+
+
+class RCNetwork:
+    """
+    serve runtime for the knowledge graph, loaded from the files which
+    `RCNetworkBuilder` writes during pre-compute; see `precompute.py`
+    """
+    MAX_TITLE_LEN = 100
+    ANCHOR_CACHE_SIZE = 32
+    LAYOUT_CACHE_SIZE = 256
 
-        quantiles = []
+    # the order of the entity kinds in a network diagram, their colors,
+    # and which field to show as the detail for each
+    HOOD_KINDS = [ "prov", "data", "auth", "topi", "jour", "publ" ]
+    HOOD_COLORS = { "prov": "orange", "data": "red", "auth": "purple", "topi": "cyan", "jour": "green", "publ": "blue" }
+    HOOD_DETAIL = { "prov": "ror", "auth": "orcid", "jour": "issn", "publ": "doi" }
+    Z_975 = 1.959963984540054	# scipy.stats.norm.ppf(q=0.975)
 
-        for idx, q_hi in q.iteritems():
-            quantiles.append(q_hi)
+    def __init__ (self):
+        self.store = None
+        self.id_list = []
+        self.labels = {}
 
-        return quantiles
+        self.graph = None
+        self.embedding = None
+        self.anchor_cache = RCLRUCache(maxsize=self.ANCHOR_CACHE_SIZE)
+        self.layout = RCLayout()
+        self.layout_cache = RCLRUCache(maxsize=self.LAYOUT_CACHE_SIZE)
+        self.hood_sizes = RCNeighborhoodSizes()
+        self.facets = None
+        self.scale = {}
+        self.mle = RCSparseTable()
+        self.cousage = RCSparseTable()
+        self.payloads = None
+        self.search_index = None
+        self.build_id = None
+        self.template_folder = None
+
+        self.prov = {}
+        self.data = {}
+        self.publ = {}
+        self.jour = {}
+        self.auth = {}
+        self.topi = {}
+
+
+    def get_id (self, id):
+        """
+        lookup the numeric ID for an element
+        """
+        return self.store.get_id(id)
 
 
-    def scale_ranks (self, scale_factor=3):
+    def attach_store (self, store):
         """
-        run quantile analysis on centrality metrics, assessing the
-        relative impact of each element in the KG
+        use the entity store as the source for the entity lookups
         """
-        result = nx.eigenvector_centrality_numpy(self.nxg, weight="weight")
-        ranks = list(result.values())
+        self.store = store
+        self.id_list = store.id_list
+        self.labels = store.labels
+
+        self.prov = RCKindMap(store, "prov")
+        self.data = RCKindMap(store, "data")
+        self.publ = RCKindMap(store, "publ")
+        self.jour = RCKindMap(store, "jour")
+        self.auth = RCKindMap(store, "auth")
+        self.topi = RCKindMap(store, "topi")
 
-        quant = self.calc_quantiles(ranks, num_q=10)
-        num_quant = len(quant)
 
-        for id, rank in sorted(result.items(), key=itemgetter(1), reverse=True):
-            impact = stats.percentileofscore(ranks, rank)
-            scale = (((impact / num_quant) + 5) * scale_factor)
-            self.scale[id] = [int(round(scale)), impact / 100.0]
+    ######################################################################
+    ## graph analytics
 
+    @classmethod
+    @lru_cache()
+    def point_estimate (cls, x, n):
+        return (float(x) + cls.Z_975) / (float(n) + 2.0 * cls.Z_975)
 
-    def load_network (self, path):
+
+    def get_cousage (self, d_id, k=10):
         """
-        run the full usage pattern, prior to use of serialize() or
-        subgraph()
+        list the `k` datasets most often cited together with dataset
+        `d_id`, as `[uuid, title, count, point_estimate]`
         """
-        t0 = time.time()
+        top, n_publ = self.cousage.top(d_id, k)
+
+        return [
+            [ self.id_list[i], self.labels[i], count, self.point_estimate(count, n_publ) ]
+            for i, count in top
+            ]
 
-        self.parse_corpus(path)
 
-        self.propagate_pdf(self.auth, "authors")
-        self.propagate_pdf(self.jour, "journal")
-        self.propagate_pdf(self.topi, "topics")
+    def get_mle (self, e_id, d_id):
+        """
+        lookup the co-occurrence count and point estimate for the
+        entity `e_id` with the dataset `d_id`
+        """
+        try:
+            entry = self.mle.get(int(e_id), int(d_id))
+        except (TypeError, ValueError):
+            entry = None
 
-        self.build_analytics_graph()
-        self.scale_ranks()
+        if entry:
+            count, trials = entry
+            return count, self.point_estimate(count, trials)
 
-        elapsed_time = (time.time() - t0) * 1000.0
-        return elapsed_time
+        return 0, 0.0
 
 
     ######################################################################
-    ## ser/de for pre-computing, then later a fast load/launch
+    ## faceted filtering of publications
 
-    def serialize (self, links, path=Path("precomp.json")):
+    def facet_query (self, all_of, any_of, none_of, offset=0, limit=50, k=10):
         """
-        serialize all of the data structures required to recreate the
-        knowledge graph
+        filter the publications by facets given as entity UUIDs: linked
+        to all of `all_of`, at least one of `any_of`, and none of
+        `none_of`; returns the number of matches, a page of them as
+        `[uuid, title]` in descending order of impact, and the top `k`
+        facets of each kind among the matches, as `[uuid, title,
+        count]`; raises `ValueError` for an unknown facet
         """
-        g = nx.readwrite.json_graph.node_link_data(self.nxg),
+        def resolve (uuids):
+            facets = []
 
-        view = [
-            g,
-            links,
+            for uuid in uuids:
+                i = self.store.find_id(uuid)
+                kind = self.store.kind_of(i) if i is not None else None
 
-            self.id_list,
-            list(self.labels.items()),
-            list(self.scale.items()),
+                if kind not in RCFacetIndex.FACETS:
+                    raise ValueError(f"not a dataset, topic, journal, author, or provider: {uuid}")
 
-            [ p.view for p in self.prov.values() ],
-            [ d.view for d in self.data.values() ],
-            [ p.view for p in self.publ.values() ],
-            [ j.view for j in self.jour.values() ],
-            [ a.view for a in self.auth.values() ],
-            [ t.view for t in self.topi.values() ]
-            ]
+                facets.append((kind, i))
 
-        with codecs.open(path, "wb", encoding="utf8") as f:
-            json.dump(view, f, ensure_ascii=False)
+            return facets
 
+        selected = self.facets.select(resolve(all_of), resolve(any_of), resolve(none_of))
+
+        view = {
+            "count": int(selected.sum()),
+            "publ": [ [ self.id_list[i], self.labels[i] ] for i in self.facets.ranked(selected, offset, limit) ],
+            "facets": {
+                kind: [ [ self.id_list[i], self.labels[i], count ] for i, count in counts ]
+                for kind, counts in self.facets.counts(selected, k).items()
+                }
+            }
+
+        return view
+
+
+    ######################################################################
+    ## ser/de for pre-computing, then later a fast load/launch
 
     def deserialize (self, path=Path("precomp.json")):
         """
         deserialize all of the data structures required to recreate
         the knowledge graph
         """
+        npz_path = path.with_suffix(".npz")
+        self.build_id = "{:x}".format(npz_path.stat().st_mtime_ns)
+
+        with np.load(npz_path) as arrays:
+            arrays = dict(arrays)
+            self.attach_store(RCEntityStore(arrays))
+
+            def select (prefix):
+                return { key[len(prefix):]: value for key, value in arrays.items() if key.startswith(prefix) }
+
+            self.graph = RCGraph.deserialize(select("graph_"))
+            self.embedding = RCEmbedding.deserialize(select("embed_"))
+            self.layout = RCLayout.deserialize(select("layout_"))
+            self.hood_sizes = RCNeighborhoodSizes.deserialize(select("anf_"))
+            self.mle = RCSparseTable.deserialize(select("mle_"))
+            self.cousage = RCSparseTable.deserialize(select("cousage_"))
+
         with codecs.open(path, "r", encoding="utf8") as f:
             view = json.load(f)
-            g, links, id_list, labels, scale, prov, data, publ, jour, auth, topi = view
+            scale, = view
 
             # deserialize the graph metadata
-            self.nxg = nx.readwrite.json_graph.node_link_graph(g[0])
-            self.id_list = id_list
-
-            for k, v in labels:
-                self.labels[k] = v
-
             for k, v in scale:
                 self.scale[k] = v
 
-            # deserialize each dimension of entities in the KG
-            for view in prov:
-                self.prov[view["id"]] = RCNetworkNode(view=view)
+        self.payloads = RCBlobReader(path.with_suffix(".blob"))
+        self.store.attach_text(self.payloads)
+        self.facets = RCFacetIndex.from_store(self.store, self.scale)
+
+        if "search.terms" in self.payloads:
+            self.search_index = RCSearchIndex(self.payloads)
+
+
+    ######################################################################
+    ## pre-compressed response payloads
+
+    PAYLOAD_ENCODINGS = [ "br", "gzip" ]
+    RAW_PAYLOADS = [ "lookup" ]	# sections also stored uncompressed
 
-            for view in data:
-                self.data[view["id"]] = RCNetworkNode(view=view)
 
-            for view in publ:
-                self.publ[view["id"]] = RCNetworkNode(view=view)
+    def get_payload (self, section, i, encoding=None):
+        """
+        get the pre-computed payload for numeric ID `i`, compressed
+        with `encoding`; uncompressed if `encoding` is `None`
+        """
+        if not self.payloads or i is None:
+            return None
 
-            for view in jour:
-                self.jour[view["id"]] = RCNetworkNode(view=view)
+        if encoding:
+            data = self.payloads.get("{}.{}".format(section, encoding), i)
+            return bytes(data) if data is not None else None
 
-            for view in auth:
-                self.auth[view["id"]] = RCNetworkNode(view=view)
+        raw_section = "{}.json".format(section)
 
-            for view in topi:
-                self.topi[view["id"]] = RCNetworkNode(view=view)
+        if raw_section in self.payloads:
+            data = self.payloads.get(raw_section, i)
+            return bytes(data) if data is not None else None
 
-            return links
+        data = self.payloads.get("{}.gzip".format(section), i)
+        return gzip.decompress(data) if data is not None else None
 
 
     ######################################################################
     ## linked data viewer
 
     @classmethod
-    def get_template (cls, template_folder, template_path):
+    @lru_cache()
+    def get_environment (cls, template_folder, compiled_path=None):
+        """
+        one Jinja2 environment per template folder: the templates get
+        loaded from the modules compiled during pre-compute, if those
+        are up to date, otherwise each gets minified and compiled only
+        once
+        """
+        if compiled_path is not None and RCMinifyLoader.is_compiled(template_folder, compiled_path):
+            loader = ModuleLoader(str(compiled_path))
+        else:
+            loader = RCMinifyLoader(template_folder)
+
+        return Environment(loader=loader, finalize=RCMinifyLoader.condense)
+
+
+    @classmethod
+    def get_template (cls, template_folder, template_path, compiled_path=None):
         """
         load a Jinja2 template
         """
-        return Environment(loader=FileSystemLoader(template_folder)).get_template(template_path)
+        return cls.get_environment(template_folder, compiled_path).get_template(template_path)
 
 
     @classmethod
     def render_template (cls, template, **kwargs):
-        return html_minify(template.render(kwargs)).replace("  ", " ").replace("> <", "><").replace(" >", ">")
+        return RCMinifyLoader.resolve(template.render(kwargs))
+
+
+    def setup_render (self, template_folder, compiled_path=Path("precomp.templates.zip")):
+        self.template_folder = template_folder
+        self.data_template = self.get_template(template_folder, "links/data.html", compiled_path)
+        self.prov_template = self.get_template(template_folder, "links/prov.html", compiled_path)
+        self.publ_template = self.get_template(template_folder, "links/publ.html", compiled_path)
+        self.jour_template = self.get_template(template_folder, "links/jour.html", compiled_path)
+        self.auth_template = self.get_template(template_folder, "links/auth.html", compiled_path)
+        self.topi_template = self.get_template(template_folder, "links/topi.html", compiled_path)
+
+
+    def hood_rank (self, i, kind, radius, dist, node_id):
+        """
+        rank an entity within the neighborhood of `node_id`, found at
+        hop distance `dist` by a query with the given `radius`
+        """
+        scale, impact = self.scale[i]
 
+        if kind in [ "auth", "topi", "jour" ]:
+            count, pt_est = self.get_mle(i, node_id)
+        else:
+            count, pt_est = 0, 0.0
 
-    def setup_render (self, template_folder):
-        self.data_template = self.get_template(template_folder, "links/data.html")
-        self.prov_template = self.get_template(template_folder, "links/prov.html")
-        self.publ_template = self.get_template(template_folder, "links/publ.html")
-        self.jour_template = self.get_template(template_folder, "links/jour.html")
-        self.auth_template = self.get_template(template_folder, "links/auth.html")
-        self.topi_template = self.get_template(template_folder, "links/topi.html")
+        return (radius - dist, count, pt_est, impact)
 
 
-    def calc_rank (self, rerank, neighbor, e):
+    def anchor_paths (self, anchor, radius):
+        """
+        hop distances to the nodes within `radius` of the `anchor`
+        node of a query, cached per build of the network
+        """
+        key = (self.build_id, anchor, radius)
+        paths = self.anchor_cache.get(key)
+
+        if paths is None:
+            try:
+                paths = self.graph.bfs(int(anchor), depth_limit=radius)
+            except (TypeError, ValueError):
+                paths = {}
+
+            self.anchor_cache.put(key, paths)
+
+        return paths
+
+
+    def calc_rank (self, rerank, neighbor, e, radius=None):
         """
         calculate a distance metric to the selected dataset 
         """
@@ -547,17 +599,13 @@ class RCNetwork:
         rank = (0, 0, 0.0, neighbor_impact)
 
         if rerank:
-            p = self.publ[self.id_list[neighbor]]
+            paths = self.anchor_paths(rerank, radius)
 
-            if "rank" in p.view:
-                rank = p.view["rank"]
+            if neighbor in paths:
+                kind = self.store.kind_of(neighbor)
+                rank = self.hood_rank(neighbor, kind, radius, paths[neighbor], rerank)
             else:
-                if rerank in e.view["mle"]:
-                    count, pt_est = e.view["mle"][rerank]
-                else:
-                    count = 0
-                    pt_est = 0.0
-
+                count, pt_est = self.get_mle(e.node_id, rerank)
                 rank = (0, count, pt_est, neighbor_impact)
 
         return rank
@@ -574,14 +622,13 @@ class RCNetwork:
         ror = None
         data_list = None
 
-        p_id = self.get_id(p.view["id"])
+        p_id = p.node_id
 
         if p_id in self.scale:
             scale, impact = self.scale[p_id]
-            edges = self.nxg[self.get_id(p.view["id"])]
             data_list = []
 
-            for neighbor, attr in edges.items():
+            for neighbor in self.graph.neighbors(p_id):
                 neighbor_scale, neighbor_impact = self.scale[neighbor]
                 data_list.append([ neighbor, self.labels[neighbor], neighbor_impact ])
 
@@ -632,17 +679,16 @@ class RCNetwork:
         provider = None
         publ_list = []
 
-        d_id = self.get_id(d.view["id"])
+        d_id = d.node_id
 
         if d_id in self.scale:
             scale, impact = self.scale[d_id]
-            edges = self.nxg[self.get_id(d.view["id"])]
             publ_list = []
 
-            p_id = self.get_id(d.view["provider"])
+            p_id = int(self.store.provider[d_id])
             seen_set = set([ p_id ])
 
-            for neighbor, attr in edges.items():
+            for neighbor in self.graph.neighbors(d_id):
                 if neighbor not in seen_set:
                     neighbor_scale, neighbor_impact = self.scale[neighbor]
                     publ_list.append([ neighbor, self.labels[neighbor], neighbor_impact ])
@@ -678,7 +724,7 @@ class RCNetwork:
         return html
 
 
-    def reco_auth (self, a, rerank):
+    def reco_auth (self, a, rerank, radius=None):
         """
         recommend ordered links to this author entity
         """
@@ -689,15 +735,14 @@ class RCNetwork:
         orcid = None
         publ_list = None
 
-        a_id = self.get_id(a.view["id"])
+        a_id = a.node_id
 
         if a_id in self.scale:
             scale, impact = self.scale[a_id]
-            edges = self.nxg[self.get_id(a.view["id"])]
             publ_list = []
 
-            for neighbor, attr in edges.items():
-                rank = self.calc_rank(rerank, neighbor, a)
+            for neighbor in self.graph.neighbors(a_id):
+                rank = self.calc_rank(rerank, neighbor, a, radius)
                 publ_list.append([ neighbor, self.labels[neighbor], rank ])
 
             if len(a.view["orcid"]) < 1:
@@ -715,12 +760,14 @@ class RCNetwork:
         return uuid, title, rank, url, orcid, publ_list
 
 
-    def render_auth (self, a, rerank=False):
+    def render_auth (self, a, rerank=False, radius=None):
         """
-        render HTML for an author
+        render HTML for an author, optionally reranking its links by
+        their distance to the `rerank` node of a query with the given
+        `radius`
         """
         html = None
-        uuid, title, rank, url, orcid, publ_list = self.reco_auth(a, rerank)
+        uuid, title, rank, url, orcid, publ_list = self.reco_auth(a, rerank, radius)
 
         if uuid:
             html = self.render_template(
@@ -747,14 +794,13 @@ class RCNetwork:
         issn = None
         publ_list = None
 
-        j_id = self.get_id(j.view["id"])
+        j_id = j.node_id
 
         if j_id in self.scale:
             scale, impact = self.scale[j_id]
-            edges = self.nxg[self.get_id(j.view["id"])]
             publ_list = []
 
-            for neighbor, attr in edges.items():
+            for neighbor in self.graph.neighbors(j_id):
                 neighbor_scale, neighbor_impact = self.scale[neighbor]
                 publ_list.append([ neighbor, self.labels[neighbor], neighbor_scale ])
 
@@ -808,14 +854,13 @@ class RCNetwork:
         rank = None
         publ_list = None
 
-        t_id = self.get_id(t.view["id"])
+        t_id = t.node_id
 
         if t_id in self.scale:
             scale, impact = self.scale[t_id]
-            edges = self.nxg[self.get_id(t.view["id"])]
             publ_list = []
 
-            for neighbor, attr in edges.items():
+            for neighbor in self.graph.neighbors(t_id):
                 neighbor_scale, neighbor_impact = self.scale[neighbor]
                 publ_list.append([ neighbor, self.labels[neighbor], neighbor_scale ])
 
@@ -862,36 +907,36 @@ class RCNetwork:
         data_list = None
         topi_list = None
 
-        p_id = self.get_id(p.view["id"])
+        p_id = p.node_id
 
         if p_id in self.scale:
             scale, impact = self.scale[p_id]
             journal = None
 
-            if p.view["journal"]:
-                j_id = self.get_id(p.view["journal"])
+            for j_id in self.store.linked(p_id, "journal"):
+                j_id = int(j_id)
 
                 if self.labels[j_id] != "unknown":
                     journal = [ j_id, self.labels[j_id] ]
 
             auth_list = []
 
-            for a in p.view["authors"]:
-                a_id = self.get_id(a)
+            for a_id in self.store.linked(p_id, "authors"):
+                a_id = int(a_id)
                 # do not sort; preserve the author order
                 auth_list.append([ a_id, self.labels[a_id] ])
 
             data_list = []
 
-            for d in p.view["datasets"]:
-                d_id = self.get_id(d)
+            for d_id in self.store.linked(p_id, "datasets"):
+                d_id = int(d_id)
                 neighbor_scale, neighbor_impact = self.scale[d_id]
                 data_list.append([ d_id, self.labels[d_id], neighbor_scale ])
 
             topi_list = []
 
-            for t in p.view["topics"]:
-                t_id = self.get_id(t)
+            for t_id in self.store.linked(p_id, "topics"):
+                t_id = int(t_id)
                 neighbor_scale, neighbor_impact = self.scale[t_id]
                 topi_list.append([ t_id, self.labels[t_id], neighbor_scale ])
 
@@ -959,330 +1004,515 @@ class RCNetwork:
         if uuid in self.prov:
             uuid, title, rank, url, ror, data_list = self.reco_prov(self.prov[uuid])
 
-            response = {
-                "title": title,
-                "rank": rank,
-                "url": url,
-                "ror": ror,
-                "data": self.remap_list(data_list)
-                }
+            if uuid:
+                response = {
+                    "title": title,
+                    "rank": rank,
+                    "url": url,
+                    "ror": ror,
+                    "data": self.remap_list(data_list)
+                    }
 
         elif uuid in self.data:
             uuid, title, rank, url, provider, publ_list = self.reco_data(self.data[uuid])
 
-            response = {
-                "title": title,
-                "rank": rank,
-                "url": url,
-                "prov": [ self.id_list[provider[0]], provider[1] ],
-                "publ": self.remap_list(publ_list)
-                }
+            if uuid:
+                response = {
+                    "title": title,
+                    "rank": rank,
+                    "url": url,
+                    "prov": [ self.id_list[provider[0]], provider[1] ],
+                    "publ": self.remap_list(publ_list)
+                    }
 
         elif uuid in self.publ:
             uuid, title, rank, url, doi, pdf, journal, abstract, auth_list, data_list, topi_list = self.reco_publ(self.publ[uuid])
 
-            response = {
-                "title": title,
-                "rank": rank,
-                "url": url,
-                "doi": doi,
-                "pdf": pdf,
-                "abstract": abstract,
-                "jour": [ self.id_list[journal[0]], journal[1] ],
-                "auth": self.remap_list(auth_list),
-                "data": self.remap_list(data_list),
-                "topi": self.remap_list(topi_list)
-                }
+            if uuid:
+                response = {
+                    "title": title,
+                    "rank": rank,
+                    "url": url,
+                    "doi": doi,
+                    "pdf": pdf,
+                    "abstract": abstract,
+                    "jour": [ self.id_list[journal[0]], journal[1] ] if journal else None,
+                    "auth": self.remap_list(auth_list),
+                    "data": self.remap_list(data_list),
+                    "topi": self.remap_list(topi_list)
+                    }
 
         elif uuid in self.auth:
             uuid, title, rank, url, orcid, publ_list = self.reco_auth(self.auth[uuid], rerank=False)
 
-            response = {
-                "title": title,
-                "rank": rank,
-                "url": url,
-                "orcid": orcid,
-                "publ": self.remap_list(publ_list)
-                }
+            if uuid:
+                response = {
+                    "title": title,
+                    "rank": rank,
+                    "url": url,
+                    "orcid": orcid,
+                    "publ": self.remap_list(publ_list)
+                    }
 
         elif uuid in self.jour:
             uuid, title, rank, url, issn, publ_list = self.reco_jour(self.jour[uuid])
 
-            response = {
-                "title": title,
-                "rank": rank,
-                "url": url,
-                "issn": issn,
-                "publ": self.remap_list(publ_list)
-                }
+            if uuid:
+                response = {
+                    "title": title,
+                    "rank": rank,
+                    "url": url,
+                    "issn": issn,
+                    "publ": self.remap_list(publ_list)
+                    }
 
         elif uuid in self.topi:
             uuid, title, rank, publ_list = self.reco_topi(self.topi[uuid])
 
-            response = {
-                "title": title,
-                "rank": rank,
-                "publ": self.remap_list(publ_list)
-                }
+            if uuid:
+                response = {
+                    "title": title,
+                    "rank": rank,
+                    "publ": self.remap_list(publ_list)
+                    }
 
         return response
 
 
-    def render_links (self):
+    def download_links (self, uuid):
         """
-        leverage the `nxg` graph to generate HTML to render links for
-        each entity in the knowledge graph
+        download links for the given dataset ID
         """
-        links = {}
+        dataset = self.data[uuid].view["title"]
+        l = []
 
-        for p in self.prov.values():
-            links[p.view["id"]] = self.render_prov(p)
+        for p_id in self.store.linked_from("datasets", self.get_id(uuid)):
+            node = self.store.get_entity(p_id)
+            jour_uuid = node.view["journal"]
 
-        for d in self.data.values():
-            links[d.view["id"]] = self.render_data(d)
+            if jour_uuid in self.jour:
+                jour_title = self.jour[jour_uuid].view["title"]
+            else:
+                jour_title = ""
 
-        for a in self.auth.values():
-            links[a.view["id"]] = self.render_auth(a)
+            l.append([
+                    dataset,
+                    node.view["title"],
+                    jour_title,
+                    node.view["doi"],
+                    node.view["abstract"]
+                    ])
 
-        for j in self.jour.values():
-            links[j.view["id"]] = self.render_jour(j)
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow([ "", "dataset", "publication", "journal", "url", "abstract" ])
 
-        for t in self.topi.values():
-            links[t.view["id"]] = self.render_topi(t)
+        for i, row in enumerate(l):
+            writer.writerow([ i ] + row)
 
-        for p in self.publ.values():
-            links[p.view["id"]] = self.render_publ(p)
+        data_rows = buf.getvalue()
+        data_name = dataset.replace(" ", "")[:8].upper()
 
-        return links
+        return data_rows, data_name
 
 
-    def download_links (self, uuid):
+    ######################################################################
+    ## full-text search
+
+    def search_entities (self, query, k=10, kind=None):
         """
-        download links for the given dataset ID
+        full-text search for entities, optionally of only one kind;
+        returns a list of `[uuid, kind, title, score]`
         """
-        dataset = self.data[uuid].view["title"]
-        l = []
+        if not self.search_index:
+            return []
 
-        for id, node in self.publ.items():
-            if uuid in node.view["datasets"]:
-                jour_uuid = node.view["journal"]
-
-                if jour_uuid in self.jour:
-                    jour_title = self.jour[jour_uuid].view["title"]
-                else:
-                    jour_title = ""
-
-                l.append([
-                        dataset,
-                        node.view["title"],
-                        jour_title,
-                        node.view["doi"],
-                        node.view["abstract"]
-                        ])
-
-        df = pd.DataFrame(l, columns=["dataset", "publication", "journal", "url", "abstract"])
-        data_rows = df.to_csv()
-        data_name = dataset.replace(" ", "")[:8].upper()
+        mask = None
 
-        return data_rows, data_name
+        if kind:
+            mask = self.store.kind == self.store.KIND_NAMES.index(kind)
+
+        return [
+            [ self.id_list[i], self.store.kind_of(i), self.labels[i], float("{:.4g}".format(score)) ]
+            for i, score in self.search_index.search(query, k=k, mask=mask)
+            ]
 
 
     ######################################################################
     ## neighborhoods
 
+    def similar_entities (self, node_id, kind, k=10):
+        """
+        find the `k` entities of the given kind whose graph embeddings
+        are nearest to `node_id`; returns a list of `[uuid, title,
+        similarity]`
+        """
+        candidates = self.store.ids_of_kind(kind)
+        candidates = candidates[self.graph.nodes[candidates]]
+
+        return [
+            [ self.id_list[i], self.labels[i], float("{:.4g}".format(sim)) ]
+            for i, sim in self.embedding.nearest(node_id, candidates, k=k)
+            ]
+
+
+    def related_entities (self, node_id, k=10, epsilon=1e-5):
+        """
+        rank the entities related to `node_id` by personalized
+        PageRank, normalized by weighted degree so that hubs don't
+        dominate; returns the top `k` entities of each kind as `[uuid,
+        title, score]`
+        """
+        scores = self.graph.personalized_pagerank(node_id, epsilon=epsilon)
+        scores.pop(node_id, None)
+
+        ids = np.array(list(scores), dtype=np.int64)
+        norm = np.array(list(scores.values())) / self.graph.strength[ids] * self.graph.mean_weight
+        kinds = self.store.kind[ids]
+        response = {}
+
+        for code, kind in enumerate(self.store.KIND_NAMES):
+            mask = kinds == code
+            kind_ids = ids[mask]
+            kind_norm = norm[mask]
+            top = np.argsort(-kind_norm, kind="stable")[:k]
+
+            response[kind] = [
+                [ self.id_list[i], self.labels[i], float("{:.4g}".format(score)) ]
+                for i, score in zip(kind_ids[top].tolist(), kind_norm[top].tolist())
+                ]
+
+        return response
+
+
+    def explain_paths (self, node_a, node_b, k=3, max_length=None):
+        """
+        explain how two entities connect: the `k` shortest paths
+        between them, each as a list of `[uuid, kind, title]` for the
+        entities along the path
+        """
+        return [
+            [ [ self.id_list[i], self.store.kind_of(i), self.labels[i] ] for i in path ]
+            for path in self.graph.k_shortest_paths(node_a, node_b, k=k, max_length=max_length)
+            ]
+
+
+    def query_cost (self, search_terms, radius):
+        """
+        estimate the number of nodes in a neighborhood query, from the
+        precomputed neighborhood sizes of each seed; returns `None`
+        if there are no estimates
+        """
+        sizes = [ self.hood_sizes.size(self.store.find_title(term), radius) for term in search_terms ]
+        sizes = [ size for size in sizes if size is not None ]
+
+        return sum(sizes) if sizes else None
+
+
     def get_subgraph (self, search_term, radius):
         """
         use BFS to label nodes as part of a 'neighborhood' subgraph
         """
         subgraph = set([])
         paths = {}
-        the_node_id = None
+        the_node_id = self.store.find_title(search_term)
 
-        for node_id, label in self.labels.items():
-            if label == search_term:
-                the_node_id = node_id
-                r = nx.bfs_edges(self.nxg, source=node_id, depth_limit=radius)
-                subgraph = set([node_id])
+        if the_node_id is not None:
+            paths = self.graph.bfs(the_node_id, depth_limit=radius)
+            subgraph = set(paths)
 
-                for _, neighbor in r:
-                    subgraph.add(neighbor)
+        return subgraph, paths, str(the_node_id)
 
-                paths = nx.single_source_shortest_path_length(self.nxg, node_id, cutoff=radius)
-                break
 
-        return subgraph, paths, str(the_node_id)
+    def get_multi_subgraph (self, search_terms, radius):
+        """
+        use one multi-source BFS to label nodes as part of the union of
+        the neighborhoods of several seed entities; returns the
+        subgraph, the distance to the nearest seed and the ID of that
+        seed for each node, plus the seeds as `[uuid, title]` and a
+        dict of the distance from each seed to each node (-1 if not
+        within `radius`)
+        """
+        seed_ids = [ self.store.find_title(term) for term in search_terms ]
+        found = [ j for j, i in enumerate(seed_ids) if i is not None ]
+
+        nodes, found_dist = self.graph.multi_bfs([ seed_ids[j] for j in found ], depth_limit=radius)
+        dist = np.full((len(seed_ids), len(nodes)), -1, dtype=np.int32)
+        dist[found] = found_dist
+
+        masked = np.where(found_dist >= 0, found_dist, np.iinfo(np.int32).max)
+        nearest = np.array([ seed_ids[j] for j in found ], dtype=np.int64)[masked.argmin(axis=0)] if found else []
+
+        nodes = nodes.tolist()
+        paths = dict(zip(nodes, masked.min(axis=0).tolist())) if found else {}
+        anchors = dict(zip(nodes, [ str(i) for i in nearest ]))
+
+        seeds = [
+            [ self.id_list[i] if i is not None else None, term ]
+            for i, term in zip(seed_ids, search_terms)
+            ]
+
+        seed_dist = dict(zip(nodes, dist.T.tolist()))
+
+        return set(nodes), paths, anchors, seeds, seed_dist
 
 
-    def extract_neighborhood (self, radius, subgraph, paths, node_id, html_path):
+    def neighborhood_layout (self, subgraph, edges):
         """
-        extract the neighbor entities from the subgraph, while
-        generating a network diagram
+        pixel coordinates for drawing the nodes of a subgraph, cached
+        by its set of nodes
         """
-        hood = RCNeighbors()
+        nodes = np.array(sorted(subgraph), dtype=np.int64)
+        key = hashlib.blake2b(nodes.tobytes(), digest_size=16).hexdigest()
+        positions = self.layout_cache.get(key)
+
+        if positions is None:
+            xy = np.round(self.layout.force_directed(nodes, edges), 1)
+            positions = dict(zip(nodes.tolist(), xy.tolist()))
+            self.layout_cache.put(key, positions)
+
+        return positions
+
+
+    def is_shown (self, i):
+        """
+        does entity `i` get shown in the neighborhoods which reach it?
+        """
+        kind = self.store.kind_of(i)
+        return kind in self.HOOD_COLORS and (kind == "publ" or self.store.is_used(i))
+
+
+    def hood_entry (self, i, radius, dist, anchor):
+        """
+        the row for entity `i` within the neighborhood of `anchor`,
+        plus its node in the diagram as `(id, label, title, color,
+        size)`; returns `None` for entities which aren't shown
+        """
+        if not self.is_shown(i):
+            return None
+
+        store = self.store
+        kind = store.kind_of(i)
+
+        view = store.get_entity(i).view
+        title = view["title"]
+        scale, impact = self.scale[i]
+        rank = self.hood_rank(i, kind, radius, dist, anchor)
+
+        row_title = title
+        shown = True
+
+        if kind == "data":
+            detail = self.labels[int(store.provider[i])]
+            caption = "provider: {}".format(detail)
+        elif kind == "topi":
+            detail = None
+            caption = None
+        else:
+            detail = view[self.HOOD_DETAIL[kind]]
+            caption = detail
+
+        if kind == "jour" and title == "unknown":
+            shown = False
+
+        if kind == "publ" and len(title) >= self.MAX_TITLE_LEN:
+            row_title = title[:self.MAX_TITLE_LEN] + "..."
+
+        row = [ i, rank, "{:.4f}".format(impact), row_title, detail, shown ]
+
+        node_title = "{}<br/>rank: {:.4f}".format(title, impact)
+
+        if caption is not None:
+            node_title += "<br/>{}".format(caption)
+
+        return kind, row, (i, title, node_title, self.HOOD_COLORS[kind], scale)
+
+
+    def write_diagram (self, nodes, subgraph, html_path, positions=None):
+        """
+        write the network diagram for a neighborhood, given its nodes
+        as returned by `hood_entry()`, laid out from scratch unless
+        their `positions` are given; returns the nodes drawn, each
+        with its coordinates appended
+        """
+        # pyvis pulls in IPython and networkx, so defer that cost from
+        # worker start to the first query
+        from pyvis.edge import Edge
+        from pyvis.network import Network
+
         g = Network(notebook=False, height="450px", width="100%")
-        g.force_atlas_2based()
-
-        for p in self.prov.values():
-            if "used" in p.view:
-                p_id = self.get_id(p.view["id"])
-        
-                if p_id in subgraph:
-                    scale, impact = self.scale[p_id]
-                    rank = (radius - paths[p_id], 0, 0.0, impact)
-                    p.view["rank"] = rank
-                    hood.prov.append([ p_id, rank, "{:.4f}".format(impact), p.view["title"], p.view["ror"], True ])
-
-                    title = "{}<br/>rank: {:.4f}<br/>{}".format(p.view["title"], impact, p.view["ror"])
-                    g.add_node(p_id, label=p.view["title"], title=title, color="orange", size=scale)
-
-        for d in self.data.values():
-            if "used" in d.view:
-                d_id = self.get_id(d.view["id"])
-        
-                if d_id in subgraph:
-                    p_id = self.get_id(d.view["provider"])
-                    scale, impact = self.scale[d_id]
-                    rank = (radius - paths[d_id], 0, 0.0, impact)
-                    d.view["rank"] = rank
-                    hood.data.append([ d_id, rank, "{:.4f}".format(impact), d.view["title"], self.labels[p_id], True ])
-
-                    title = "{}<br/>rank: {:.4f}<br/>provider: {}".format(d.view["title"], impact, self.labels[p_id])
-                    g.add_node(d_id, label=d.view["title"], title=title, color="red", size=scale)
-
-                    if p_id in subgraph:
-                        g.add_edge(d_id, p_id, color="gray")
-
-        for a in self.auth.values():
-            if "used" in a.view:
-                a_id = self.get_id(a.view["id"])
-
-                if a_id in subgraph:
-                    if node_id in a.view["mle"]:
-                        count, pt_est = a.view["mle"][node_id]
-                    else:
-                        count = 0
-                        pt_est = 0.0
-
-                    scale, impact = self.scale[a_id]
-                    rank = (radius - paths[a_id], count, pt_est, impact)
-                    a.view["rank"] = rank
-                    hood.auth.append([ a_id, rank, "{:.4f}".format(impact), a.view["title"], a.view["orcid"], True ])
-
-                    title = "{}<br/>rank: {:.4f}<br/>{}".format(a.view["title"], impact, a.view["orcid"])
-                    g.add_node(a_id, label=a.view["title"], title=title, color="purple", size=scale)
-
-        for t in self.topi.values():
-            if "used" in t.view:
-                t_id = self.get_id(t.view["id"])
-
-                if t_id in subgraph:
-                    if node_id in t.view["mle"]:
-                        count, pt_est = t.view["mle"][node_id]
-                    else:
-                        count = 0
-                        pt_est = 0.0
-
-                    scale, impact = self.scale[t_id]
-                    rank = (radius - paths[t_id], count, pt_est, impact)
-                    t.view["rank"] = rank
-                    hood.topi.append([ t_id, rank, "{:.4f}".format(impact), t.view["title"], None, True ])
-
-                    title = "{}<br/>rank: {:.4f}".format(t.view["title"], impact)
-                    g.add_node(t_id, label=t.view["title"], title=title, color="cyan", size=scale)
-
-        for j in self.jour.values():
-            if "used" in j.view:
-                j_id = self.get_id(j.view["id"])
-
-                if j_id in subgraph:
-                    if j.view["title"] == "unknown":
-                        shown = False
-                    else:
-                        shown = True
-
-                    if node_id in j.view["mle"]:
-                        count, pt_est = j.view["mle"][node_id]
-                    else:
-                        count = 0
-                        pt_est = 0.0
-
-                    scale, impact = self.scale[j_id]
-                    rank = (radius - paths[j_id], count, pt_est, impact)
-                    j.view["rank"] = rank
-                    hood.jour.append([ j_id, rank, "{:.4f}".format(impact), j.view["title"], j.view["issn"], shown ])
-
-                    title = "{}<br/>rank: {:.4f}<br/>{}".format(j.view["title"], impact, j.view["issn"])
-                    g.add_node(j_id, label=j.view["title"], title=title, color="green", size=scale)
-
-        for p in self.publ.values():
-            p_id = self.get_id(p.view["id"])
-
-            if p_id in subgraph:
-                if len(p.view["title"]) >= self.MAX_TITLE_LEN:
-                    abbrev_title = p.view["title"][:self.MAX_TITLE_LEN] + "..."
-                else:
-                    abbrev_title = p.view["title"]
-
-                scale, impact = self.scale[p_id]
-                rank = (radius - paths[p_id], 0, 0.0, impact)
-                p.view["rank"] = rank
-                hood.publ.append([ p_id, rank, "{:.4f}".format(impact), abbrev_title, p.view["doi"], True ])
-
-                title = "{}<br/>rank: {:.4f}<br/>{}".format(p.view["title"], impact, p.view["doi"])
-                g.add_node(p_id, label=p.view["title"], title=title, color="blue", size=scale)
-
-                if p.view["journal"]:
-                    j_id = self.get_id(p.view["journal"])
-
-                    if j_id in subgraph:
-                        g.add_edge(p_id, j_id, color="gray")
-
-                for d in p.view["datasets"]:
-                    d_id = self.get_id(d)
-            
-                    if d_id in subgraph:
-                        g.add_edge(p_id, d_id, color="gray")
-
-                for a in p.view["authors"]:
-                    a_id = self.get_id(a)
-            
-                    if a_id in subgraph:
-                        g.add_edge(p_id, a_id, color="gray")
-
-                for t in p.view["topics"]:
-                    t_id = self.get_id(t)
-            
-                    if t_id in subgraph:
-                        g.add_edge(p_id, t_id, color="gray")
+
+        # lay out the diagram here, so that browsers don't need to run a
+        # physics simulation
+        g.toggle_physics(False)
+        edges = self.graph.subgraph_edges(subgraph)
+
+        if positions is None:
+            positions = self.neighborhood_layout(subgraph, edges)
+
+        for i, label, title, color, size in nodes:
+            g.add_node(i, label=label, title=title, color=color, size=size)
+
+        for node in g.nodes:
+            node["x"], node["y"] = positions[node["id"]]
+
+        shown = set(g.get_nodes())
+
+        for u, v, weight in edges:
+            if u in shown and v in shown:
+                # each edge is listed once, so skip the linear scans
+                # for duplicates in `g.add_edge()`
+                g.edges.append(Edge(u, v, g.directed, color="gray").options)
 
         #g.show_buttons()
         g.write_html(html_path, notebook=False)
 
-        return hood
+        return [ list(node) + list(positions[node[0]]) for node in nodes ]
 
 
-######################################################################
+    def extract_neighborhood (self, radius, subgraph, paths, node_id, html_path, anchors=None, hood=None):
+        """
+        extract the neighbor entities from the subgraph, while
+        generating a network diagram; for a multi-seed query, `anchors`
+        maps each node to the ID of its nearest seed; returns the
+        neighborhood plus the diagram nodes, as for `write_diagram()`
+        """
+        hood = hood if hood is not None else RCNeighbors()
+        anchors = anchors or {}
+        members = {}
+        nodes = []
+
+        for i in sorted(subgraph):
+            members.setdefault(self.store.kind_of(i), []).append(i)
+
+        for kind in self.HOOD_KINDS:
+            for i in members.get(kind, []):
+                entry = self.hood_entry(i, radius, paths[i], anchors.get(i, node_id))
+
+                if entry:
+                    getattr(hood, kind).append(entry[1])
+                    nodes.append(entry[2])
+
+        diagram = self.write_diagram(nodes, subgraph, html_path)
+
+        return hood, diagram
+
+
+    def expand_neighborhood (self, added, visited, node_id, radius, drawn, xy, center, anchors=None):
+        """
+        rank the nodes `added` to a neighborhood which had reached the
+        sorted `visited` array, now at `radius`, and place them in its
+        diagram next to the nodes already drawn: the sorted `drawn`
+        array, at coordinates `xy`, around the `center`; only the
+        neighbors of the added nodes get looked up, so the work
+        depends on the size of the additions
+
+        returns their entries as for `hood_entry()`, the diagram edges
+        which touch them, and their positions
+        """
+        anchors = anchors or {}
+        entries = [ self.hood_entry(i, radius, added[i], anchors.get(i, node_id)) for i in sorted(added, key=lambda i: (added[i], i)) ]
+        entries = [ e for e in entries if e ]
+
+        # the edges which touch the added nodes, from the added nodes
+        # plus their neighbors already drawn in the diagram
+        new_ids = np.array(sorted(added), dtype=np.int64)
+        neighbors = np.unique(self.graph.expand(new_ids)).astype(np.int64)
+        pos, found = self.graph.find_sorted(visited, neighbors)
+        boundary = neighbors[found]
+
+        pos, found = self.graph.find_sorted(drawn, boundary)
+        positions = dict(zip(boundary[found].tolist(), xy[pos[found]].tolist()))
+        shown = set([ e[2][0] for e in entries ]) | set(positions)
+
+        edges = [
+            (u, v, weight)
+            for u, v, weight in self.graph.subgraph_edges(set(added) | set(boundary.tolist()))
+            if (u in added or v in added) and u in shown and v in shown
+            ]
+
+        placed = self.layout.place(positions, [ e[2][0] for e in entries ], edges, center=center)
+
+        return entries, edges, placed
+
+
+    def extend_multi_subgraph (self, seeds, nodes, seed_dist, radius, new_radius):
+        """
+        grow the union of the neighborhoods from a multi-seed query,
+        as returned by `get_multi_subgraph()`, from `radius` out to
+        `new_radius`: the BFS from each seed continues from where it
+        left off, given the sorted array of `nodes` reached and a
+        matrix `seed_dist` of the distance from each seed to each of
+        them
+
+        returns the hop distances and the nearest seed for the nodes
+        added, plus the distances from each seed to every node which
+        any seed has newly reached
+        """
+        seed_ids = [ self.store.find_id(uuid) if uuid else None for uuid, title in seeds ]
+        extended = []
+
+        for j, seed_id in enumerate(seed_ids):
+            if seed_id is None:
+                continue
+
+            reached = seed_dist[:, j] >= 0
+            frontier = nodes[seed_dist[:, j] == radius]
+            extended.append((j, self.graph.extend_bfs(nodes[reached], frontier, radius, depth_limit=new_radius)))
+
+        ids = np.array(sorted(set().union(*[ reached for j, reached in extended ])), dtype=np.int64)
+        pos, found = self.graph.find_sorted(nodes, ids)
 
-def main ():
-    # build a graph from the JSON-LD corpus
-    net = RCNetwork()
-    net.parse_corpus(Path("full.jsonld"))
+        # the distances so far, for the nodes already reached
+        dist = np.full((len(ids), len(seeds)), -1, dtype=np.int64)
+        dist[found] = seed_dist[pos[found]]
+        row = dict(zip(ids.tolist(), range(len(ids))))
 
-    # rank and scale each entity
-    net.build_analytics_graph()
-    net.scale_ranks()
+        for j, reached in extended:
+            for i, d in reached.items():
+                dist[row[i], j] = d
 
-    # constrain the graph
-    t0 = time.time()
+        updated = dict(zip(ids.tolist(), dist.tolist()))
+        added = {}
+        anchors = {}
 
-    search_term = "IRI Infoscan"
-    radius = 2
+        for i in ids[~found].tolist():
+            # the nearest seed, with ties going to the first one
+            hop, j = min([ (d, j) for j, d in enumerate(updated[i]) if d >= 0 ])
+            added[i] = hop
+            anchors[i] = str(seed_ids[j])
 
-    subgraph, paths, node_id = net.get_subgraph(search_term, radius)
-    hood = net.extract_neighborhood(radius, subgraph, paths, node_id, "corpus.html")
+        return added, anchors, updated
+
+
+    def rank_neighborhood (self, radius, subgraph, paths, node_id, anchors=None):
+        """
+        extract the neighbor entities from the subgraph, the same as
+        `extract_neighborhood()` but without a network diagram
+        """
+        hood = RCNeighbors()
+
+        for hop, kind, row, node in self.stream_neighborhood(radius, subgraph, paths, node_id, anchors=anchors):
+            getattr(hood, kind).append(row)
+
+        return hood
+
+
+    def stream_neighborhood (self, radius, subgraph, paths, node_id, anchors=None):
+        """
+        generate the entries of a neighborhood one hop at a time,
+        nearest first, each hop in descending order of rank; yields
+        `(hop, kind, row, node)` as for `hood_entry()`
+        """
+        anchors = anchors or {}
+        hops = {}
 
-    print(hood.serialize(t0))
+        for i in sorted(subgraph):
+            hops.setdefault(paths[i], []).append(i)
 
+        for hop in sorted(hops):
+            entries = [ self.hood_entry(i, radius, hop, anchors.get(i, node_id)) for i in hops[hop] ]
+            entries = sorted([ e for e in entries if e ], key=lambda e: e[1][1], reverse=True)
 
-if __name__ == "__main__":
-    main()
+            for kind, row, node in entries:
+                yield hop, kind, row, node
@@ -0,0 +1,594 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from .cache import RCLRUCache
+from collections.abc import Mapping, Sequence
+import numpy as np
+import zlib
+
+
+class RCStringTable:
+    """
+    a table of strings packed as one UTF-8 blob plus an array of
+    offsets, so that each entry costs only a few bytes of overhead
+    """
+    def __init__ (self, blob=b"", offsets=None):
+        self.blob = bytes(blob)
+
+        if offsets is None:
+            self.offsets = np.zeros(1, dtype=np.int64)
+        else:
+            self.offsets = np.asarray(offsets, dtype=np.int64)
+
+
+    def __len__ (self):
+        return len(self.offsets) - 1
+
+
+    def __getitem__ (self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+
+    def find (self, text):
+        """
+        find the index of the entry which exactly matches `text`, or
+        `None` if there isn't one
+        """
+        key = text.encode("utf-8")
+        pos = self.blob.find(key)
+
+        while pos >= 0:
+            # the last entry starting at `pos`, past any empty ones
+            i = int(np.searchsorted(self.offsets, pos, side="right")) - 1
+
+            if i < len(self) and self.offsets[i] == pos and self.offsets[i + 1] - pos == len(key):
+                return i
+
+            pos = self.blob.find(key, pos + 1)
+
+        return None
+
+
+class RCBlockStringTable:
+    """
+    a table of long strings kept off-heap: the UTF-8 blob gets split
+    into fixed-size blocks, each compressed with zlib and stored as a
+    section of an `RCBlobWriter` file, then served from its memory map
+    and decompressed on access through a small LRU of blocks
+    """
+    BLOCK_SIZE = 1 << 16
+    CACHE_SIZE = 16	# decompressed blocks, 1 MB
+
+    def __init__ (self, reader, section, offsets, block_size=BLOCK_SIZE):
+        self.reader = reader
+        self.section = section
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.block_size = block_size
+        self.cache = RCLRUCache(maxsize=self.CACHE_SIZE)
+
+
+    @classmethod
+    def compress_blocks (cls, table, block_size=BLOCK_SIZE):
+        """
+        split the blob of an `RCStringTable` into compressed blocks
+        """
+        return [
+            zlib.compress(table.blob[lo:lo + block_size], 9)
+            for lo in range(0, len(table.blob), block_size)
+            ]
+
+
+    def __len__ (self):
+        return len(self.offsets) - 1
+
+
+    def get_block (self, b):
+        block = self.cache.get(b)
+
+        if block is None:
+            block = zlib.decompress(self.reader.get(self.section, b))
+            self.cache.put(b, block)
+
+        return block
+
+
+    def __getitem__ (self, i):
+        lo = int(self.offsets[i])
+        hi = int(self.offsets[i + 1])
+
+        if lo == hi:
+            return ""
+
+        first = lo // self.block_size
+        last = (hi - 1) // self.block_size
+        data = b"".join([ self.get_block(b) for b in range(first, last + 1) ])
+        base = first * self.block_size
+
+        return data[lo - base:hi - base].decode("utf-8")
+
+
+class RCStringTableBuilder:
+    """
+    intern strings while building an `RCStringTable`
+    """
+    def __init__ (self):
+        self.index = {}
+        self.strings = []
+
+
+    def intern (self, text):
+        """
+        return the index for `text`, or -1 for `None`
+        """
+        if text is None:
+            return -1
+
+        if text not in self.index:
+            self.index[text] = len(self.strings)
+            self.strings.append(text)
+
+        return self.index[text]
+
+
+    def freeze (self):
+        encoded = [ s.encode("utf-8") for s in self.strings ]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([ len(b) for b in encoded ], out=offsets[1:])
+
+        return RCStringTable(b"".join(encoded), offsets)
+
+
+class RCIdColumn (Sequence):
+    """
+    read-only sequence of entity UUIDs, indexed by numeric ID
+    """
+    def __init__ (self, uuids):
+        self.uuids = uuids
+
+
+    def __len__ (self):
+        return len(self.uuids)
+
+
+    def __getitem__ (self, i):
+        return self.uuids[i].decode("utf-8")
+
+
+class RCLabelMap (Mapping):
+    """
+    read-only mapping from numeric ID to the title of an entity
+    """
+    def __init__ (self, store):
+        self.store = store
+
+
+    def __len__ (self):
+        return len(self.store)
+
+
+    def __iter__ (self):
+        return iter(range(len(self.store)))
+
+
+    def __getitem__ (self, i):
+        if not isinstance(i, (int, np.integer)) or i < 0 or i >= len(self.store):
+            raise KeyError(i)
+
+        return self.store.get_title(i)
+
+
+class RCEntityView (Mapping):
+    """
+    read-only, dict-like view of the metadata for one entity
+    """
+    def __init__ (self, store, node_id):
+        self.store = store
+        self.node_id = node_id
+
+
+    def keys (self):
+        kind = self.store.kind_of(self.node_id)
+        keys = list(self.store.FIELDS.get(kind, ()))
+
+        if self.store.used[self.node_id]:
+            keys.append("used")
+
+        return keys
+
+
+    def __iter__ (self):
+        return iter(self.keys())
+
+
+    def __len__ (self):
+        return len(self.keys())
+
+
+    def __contains__ (self, key):
+        return key in self.keys()
+
+
+    def __getitem__ (self, key):
+        if key not in self.keys():
+            raise KeyError(key)
+
+        return self.store.get_field(self.node_id, key)
+
+
+class RCNetworkNode:
+    """
+    lightweight handle for one entity in the store
+    """
+    __slots__ = ("store", "node_id")
+
+    def __init__ (self, store, node_id):
+        self.store = store
+        self.node_id = node_id
+
+
+    @property
+    def view (self):
+        return RCEntityView(self.store, self.node_id)
+
+
+class RCKindMap (Mapping):
+    """
+    read-only mapping from UUID to the entities of one kind
+    """
+    def __init__ (self, store, kind):
+        self.store = store
+        self.kind = kind
+        self.ids = store.ids_of_kind(kind)
+
+
+    def __len__ (self):
+        return len(self.ids)
+
+
+    def __iter__ (self):
+        for i in self.ids:
+            yield self.store.id_list[i]
+
+
+    def __contains__ (self, uuid):
+        i = self.store.find_id(uuid)
+        return i is not None and self.store.kind_of(i) == self.kind
+
+
+    def __getitem__ (self, uuid):
+        i = self.store.find_id(uuid)
+
+        if i is None or self.store.kind_of(i) != self.kind:
+            raise KeyError(uuid)
+
+        return RCNetworkNode(self.store, i)
+
+
+    def values (self):
+        return [ RCNetworkNode(self.store, int(i)) for i in self.ids ]
+
+
+    def items (self):
+        return [ (self.store.id_list[i], RCNetworkNode(self.store, int(i))) for i in self.ids ]
+
+
+class RCEntityStore:
+    """
+    struct-of-arrays storage for the entities in the KG: one column
+    per field, indexed by numeric ID, with interned strings and CSR
+    offset arrays for the lists of linked entities
+    """
+    KIND_NAMES = [ "prov", "data", "publ", "jour", "auth", "topi" ]
+    KIND_NONE = 255
+
+    FIELDS = {
+        "prov": ( "id", "title", "ror" ),
+        "data": ( "id", "title", "provider", "url" ),
+        "publ": ( "id", "title", "doi", "pdf", "journal", "abstract", "datasets", "authors", "topics" ),
+        "jour": ( "id", "title", "issn", "url" ),
+        "auth": ( "id", "title", "orcid" ),
+        "topi": ( "id", "title" )
+        }
+
+    IDENT_FIELDS = set([ "ror", "doi", "issn", "orcid" ])
+    LINK_FIELDS = ( "datasets", "authors", "topics" )
+
+    STRING_COLUMNS = ( "title", "ident", "url", "pdf" )
+    ID_COLUMNS = ( "provider", "journal" )
+
+    TEXT_SECTION = "text.zlib"
+
+
+    def __init__ (self, arrays):
+        self.uuids = arrays["uuids"]
+        self.uuid_order = arrays["uuid_order"]
+        self.kind = arrays["kind"]
+        self.used = arrays["used"]
+
+        for name in self.STRING_COLUMNS + self.ID_COLUMNS:
+            setattr(self, name, arrays[name])
+
+        self.strings = RCStringTable(arrays["strings_blob"].tobytes(), arrays["strings_offsets"])
+        # the long text fields are off-heap once attached to the
+        # blob file, see `attach_text()`
+        if "text_blob" in arrays:
+            self.text = RCStringTable(arrays["text_blob"].tobytes(), arrays["text_offsets"])
+        else:
+            self.text = RCStringTable(offsets=np.zeros_like(arrays["text_offsets"]))
+
+        self.text_offsets = arrays["text_offsets"]
+        self.abstract = arrays["abstract"]
+
+        self.links = {}
+
+        for field in self.LINK_FIELDS:
+            self.links[field] = ( arrays[field + "_indptr"], arrays[field + "_indices"] )
+
+        self.id_list = RCIdColumn(self.uuids)
+        self.labels = RCLabelMap(self)
+
+
+    def __len__ (self):
+        return len(self.uuids)
+
+
+    @classmethod
+    def build (cls, id_list, titles, entities):
+        """
+        build the columns from a list of UUIDs and titles, plus a
+        list of `(kind, views)` pairs where `views` is a dict of
+        metadata for each entity of that kind, keyed by UUID
+        """
+        n = len(id_list)
+        uuids = np.array([ id.encode("utf-8") for id in id_list ], dtype="S")
+        uuid_order = np.argsort(uuids, kind="stable").astype(np.int32)
+
+        def get_id (id, linked_from=None):
+            # a dangling link must fail, rather than land on whichever
+            # entity sorts next to it
+            key = id.encode("utf-8")
+            i = int(np.searchsorted(uuids, key, sorter=uuid_order))
+
+            if i == n or uuids[uuid_order[i]] != key:
+                if linked_from:
+                    raise KeyError(f"{linked_from} links to an entity not in the corpus: {id}")
+
+                raise KeyError(id)
+
+            return int(uuid_order[i])
+
+        strings = RCStringTableBuilder()
+        text = RCStringTableBuilder()
+
+        arrays = {
+            "uuids": uuids,
+            "uuid_order": uuid_order,
+            "kind": np.full(n, cls.KIND_NONE, dtype=np.uint8),
+            "used": np.zeros(n, dtype=bool),
+            "title": np.array([ strings.intern(t) for t in titles ], dtype=np.int32),
+            "abstract": np.full(n, -1, dtype=np.int32)
+            }
+
+        for name in ( "ident", "url", "pdf" ) + cls.ID_COLUMNS:
+            arrays[name] = np.full(n, -1, dtype=np.int32)
+
+        links = { field: [ [] for _ in range(n) ] for field in cls.LINK_FIELDS }
+
+        for kind, views in entities:
+            kind_code = cls.KIND_NAMES.index(kind)
+
+            for id, view in views.items():
+                i = get_id(id)
+                arrays["kind"][i] = kind_code
+                arrays["used"][i] = "used" in view
+
+                for key, value in view.items():
+                    if key in cls.IDENT_FIELDS:
+                        arrays["ident"][i] = strings.intern(value)
+                    elif key in ( "url", "pdf" ):
+                        arrays[key][i] = strings.intern(value)
+                    elif key == "abstract":
+                        arrays["abstract"][i] = text.intern(value)
+                    elif key in cls.ID_COLUMNS:
+                        arrays[key][i] = get_id(value, linked_from=id) if value else -1
+                    elif key in cls.LINK_FIELDS:
+                        links[key][i] = [ get_id(x, linked_from=id) for x in value ]
+
+        for field, rows in links.items():
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum([ len(r) for r in rows ], out=indptr[1:])
+            arrays[field + "_indptr"] = indptr
+            arrays[field + "_indices"] = np.array([ x for r in rows for x in r ], dtype=np.int32)
+
+        for name, table in [ ("strings", strings.freeze()), ("text", text.freeze()) ]:
+            arrays[name + "_blob"] = np.frombuffer(table.blob, dtype=np.uint8)
+            arrays[name + "_offsets"] = table.offsets
+
+        return cls(arrays)
+
+
+    def serialize (self):
+        """
+        return the columns as a dict of numpy arrays; the long text
+        fields get stored separately, see `text_sections()`
+        """
+        arrays = {
+            "uuids": self.uuids,
+            "uuid_order": self.uuid_order,
+            "kind": self.kind,
+            "used": self.used,
+            "abstract": self.abstract,
+            "strings_blob": np.frombuffer(self.strings.blob, dtype=np.uint8),
+            "strings_offsets": self.strings.offsets,
+            "text_offsets": self.text_offsets
+            }
+
+        for name in self.STRING_COLUMNS + self.ID_COLUMNS:
+            arrays[name] = getattr(self, name)
+
+        for field, (indptr, indices) in self.links.items():
+            arrays[field + "_indptr"] = indptr
+            arrays[field + "_indices"] = indices
+
+        return arrays
+
+
+    def text_sections (self):
+        """
+        return the compressed blocks of the long text fields, as
+        sections to add to an `RCBlobWriter`
+        """
+        return {
+            self.TEXT_SECTION: RCBlockStringTable.compress_blocks(self.text)
+            }
+
+
+    def attach_text (self, reader):
+        """
+        serve the long text fields from the memory map of a blob
+        file, if it has them
+        """
+        if self.TEXT_SECTION in reader:
+            self.text = RCBlockStringTable(reader, self.TEXT_SECTION, self.text_offsets)
+
+
+    ######################################################################
+    ## read-only view API, by numeric ID
+
+    def find_id (self, uuid):
+        """
+        lookup the numeric ID for a UUID, or `None` if not found
+        """
+        if not isinstance(uuid, str):
+            return None
+
+        key = uuid.encode("utf-8")
+        i = int(np.searchsorted(self.uuids, key, sorter=self.uuid_order))
+
+        if i < len(self.uuids) and self.uuids[self.uuid_order[i]] == key:
+            return int(self.uuid_order[i])
+
+        return None
+
+
+    def get_id (self, uuid):
+        i = self.find_id(uuid)
+
+        if i is None:
+            raise KeyError(uuid)
+
+        return i
+
+
+    def find_title (self, title):
+        """
+        lookup the first numeric ID for an entity with the given
+        title, or `None` if not found
+        """
+        s = self.strings.find(title)
+
+        if s is not None:
+            match = np.flatnonzero(self.title == s)
+
+            if len(match) > 0:
+                return int(match[0])
+
+        return None
+
+
+    def get_entity (self, i):
+        return RCNetworkNode(self, int(i))
+
+
+    def ids_of_kind (self, kind):
+        return np.flatnonzero(self.kind == self.KIND_NAMES.index(kind))
+
+
+    def kind_of (self, i):
+        code = self.kind[i]
+
+        if code == self.KIND_NONE:
+            return None
+
+        return self.KIND_NAMES[code]
+
+
+    def is_used (self, i):
+        return bool(self.used[i])
+
+
+    def get_string (self, column, i):
+        s = getattr(self, column)[i]
+
+        if s < 0:
+            return None
+
+        return self.strings[s]
+
+
+    def get_title (self, i):
+        return self.get_string("title", i)
+
+
+    def get_ident (self, i):
+        return self.get_string("ident", i)
+
+
+    def get_abstract (self, i):
+        s = self.abstract[i]
+
+        if s < 0:
+            return None
+
+        return self.text[s]
+
+
+    def linked (self, i, field):
+        """
+        numeric IDs of the entities linked from `i` through `field`
+        """
+        if field in self.ID_COLUMNS:
+            j = getattr(self, field)[i]
+            return np.array([ j ] if j >= 0 else [], dtype=np.int32)
+
+        indptr, indices = self.links[field]
+        return indices[indptr[i]:indptr[i + 1]]
+
+
+    def linked_from (self, field, j):
+        """
+        numeric IDs of the entities which link to `j` through `field`
+        """
+        if field in self.ID_COLUMNS:
+            return np.flatnonzero(getattr(self, field) == j)
+
+        indptr, indices = self.links[field]
+        rows = np.searchsorted(indptr, np.flatnonzero(indices == j), side="right") - 1
+
+        return np.unique(rows)
+
+
+    def get_field (self, i, key):
+        """
+        get a field value, in the same form used by the JSON-LD
+        parser for the entity views
+        """
+        if key == "id":
+            return self.id_list[i]
+        elif key == "title":
+            return self.get_title(i)
+        elif key == "used":
+            return True
+        elif key in self.IDENT_FIELDS:
+            return self.get_ident(i) or ""
+        elif key in ( "url", "pdf" ):
+            return self.get_string(key, i)
+        elif key == "abstract":
+            return self.get_abstract(i) or ""
+        elif key in self.ID_COLUMNS:
+            j = getattr(self, key)[i]
+            return self.id_list[j] if j >= 0 else None
+        elif key in self.LINK_FIELDS:
+            return [ self.id_list[j] for j in self.linked(i, key) ]
+
+        raise KeyError(key)
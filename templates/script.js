@@ -3,6 +3,14 @@
 
 var cache_token = "";
 
+// the neighborhood shown, so that a larger radius for the same entity
+// can be merged into it
+var hood = null;
+var hood_entity = "";
+var hood_radius = 0;
+
+const HOOD_KINDS = ["prov", "data", "publ", "jour", "auth", "topi"];
+
 
 function fetch_graph_html () {
     const url = `/graph/${cache_token}`;
@@ -80,7 +88,88 @@ function run_query_string (entity, radius) {
 };
 
 
+function show_hood (obj) {
+    // populate the neighbor <div>'s
+    enum_hood(obj.prov, "neighbor-prov", false);
+    enum_hood(obj.data, "neighbor-data", false);
+    enum_hood(obj.publ, "neighbor-publ", true);
+    enum_hood(obj.jour, "neighbor-jour", false);
+    enum_hood(obj.auth, "neighbor-auth", false);
+    enum_hood(obj.topi, "neighbor-topi", false);
+};
+
+
+function compare_rank (a, b) {
+    // descending order of the rank tuples
+    for (let i = 0; i < a[1].length; i++) {
+	if (a[1][i] != b[1][i]) {
+	    return b[1][i] - a[1][i];
+	};
+    };
+
+    return 0;
+};
+
+
+function merge_hood (delta) {
+    // the entities already shown are now further from the edge of
+    // the neighborhood
+    const shift = delta.radius - delta.from;
+
+    for (const kind of HOOD_KINDS) {
+	for (const row of hood[kind]) {
+	    row[1][0] += shift;
+	};
+
+	hood[kind] = hood[kind].concat(delta[kind]).sort(compare_rank);
+    };
+};
+
+
+function merge_graph (delta) {
+    // add the delta to the diagram already shown, which pyvis renders
+    // with vis.js DataSets named `nodes` and `edges`; returns false if
+    // there's no diagram to merge into
+    const frame = document.getElementById("f");
+    const graph = frame ? frame.contentWindow : null;
+
+    if (!graph || !graph.nodes || !graph.edges) {
+	return false;
+    };
+
+    graph.nodes.add(delta.nodes.map(([id, label, title, color, size, x, y]) => (
+	{ id: id, label: label, title: title, color: color, size: size, shape: "dot", x: x, y: y }
+    )));
+
+    graph.edges.add(delta.edges.map(([u, v]) => (
+	{ from: u, to: v, color: "gray" }
+    )));
+
+    return true;
+};
+
+
 function run_query (entity, radius) {
+    if (hood && cache_token && entity == hood_entity && Number(radius) > hood_radius) {
+	expand_query(entity, radius);
+    } else {
+	fetch_query(entity, radius);
+    };
+
+    // update the browser history
+    document.title = `Rich Contex: @${radius} / ${entity}`;
+    shareable_url = `/?radius=${radius}&entity=${entity}`;
+
+    history.pushState({ id: "homepage" },
+		      document.title,
+		      shareable_url
+		      );
+
+    return true;
+};
+
+
+function fetch_query (entity, radius) {
     const url = `/api/v1/query/${radius}/`.concat(encodeURI(entity));
     //console.log(url);
 
@@ -97,14 +186,11 @@ function run_query (entity, radius) {
 	} else { // use the result
 	    const obj = xhr.response;
 	    cache_token = obj.toke;
+	    hood = obj;
+	    hood_entity = entity;
+	    hood_radius = Number(radius);
 
-	    // populate the neighbor <div>'s
-	    enum_hood(obj.prov, "neighbor-prov", false);
-	    enum_hood(obj.data, "neighbor-data", false);
-	    enum_hood(obj.publ, "neighbor-publ", true);
-	    enum_hood(obj.jour, "neighbor-jour", false);
-	    enum_hood(obj.auth, "neighbor-auth", false);
-	    enum_hood(obj.topi, "neighbor-topi", false);
+	    show_hood(hood);
 
 	    // by default, show the first publication
 	    get_links(obj.publ[0][0]);
@@ -118,17 +204,47 @@ function run_query (entity, radius) {
     xhr.onerror = function() {
 	alert("API request failed");
     };
+};
 
-    // update the browser history
-    document.title = `Rich Contex: @${radius} / ${entity}`;
-    shareable_url = `/?radius=${radius}&entity=${entity}`;
 
-    history.pushState({ id: "homepage" },
-		      document.title,
-		      shareable_url
-		      );
+function expand_query (entity, radius) {
+    // only fetch what a larger radius adds to the neighborhood shown
+    const url = `/api/v1/expand/${cache_token}/${radius}`;
 
-    return true;
+    const xhr = new XMLHttpRequest();
+    xhr.responseType = "json";
+    xhr.open("GET", url);
+
+    document.body.style.cursor = "wait";
+    xhr.send();
+
+    xhr.onload = function() {
+	if (xhr.status == 404) {
+	    // the query expired, so run it again
+	    fetch_query(entity, radius);
+	} else if (xhr.status != 200) {
+	    alert(`Error ${xhr.status}: ${xhr.statusText}`); // e.g. 404: Not Found
+	} else { // use the result
+	    const obj = xhr.response;
+
+	    if (!merge_graph(obj)) {
+		// no diagram to merge into, so run the whole query
+		fetch_query(entity, radius);
+		return;
+	    };
+
+	    cache_token = obj.toke;
+	    hood_radius = obj.radius;
+
+	    merge_hood(obj);
+	    show_hood(hood);
+	    document.body.style.cursor = "default";
+	};
+    };
+
+    xhr.onerror = function() {
+	alert("API request failed");
+    };
 };
 
 
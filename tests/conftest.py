@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from pathlib import Path
+from richcontext.server.precompute import RCNetworkBuilder
+from richcontext.server.server import RCNetwork
+import itertools
+import json
+import os
+import pytest
+import random
+
+
+TEMPLATES = str(Path(__file__).parents[1] / "templates")
+
+VOCAB = "https://github.com/Coleridge-Initiative/adrf-onto/wiki/Vocabulary#"
+WORDS = "census survey health income food labor retail tobacco employment education wages nutrition poverty housing".split()
+
+
+def make_corpus (seed=7, n_prov=3, n_data=8, n_publ=40, n_auth=12, n_topi=5, n_jour=4):
+    """
+    generate a small random KG in the JSON-LD format of the corpus
+    """
+    rng = random.Random(seed)
+    graph = []
+
+    def title (k):
+        return " ".join([ rng.choice(WORDS) for _ in range(k) ]).title()
+
+    def link (ids):
+        # JSON-LD links a single element directly, not in a list
+        links = [ { "@id": VOCAB + i } for i in ids ]
+        return links[0] if len(links) == 1 else links
+
+    prov = [ f"provider-{i:020x}" for i in range(n_prov) ]
+    data = [ f"dataset-{i:020x}" for i in range(n_data) ]
+    auth = [ f"author-{i:020x}" for i in range(n_auth) ]
+    topi = [ f"topic-{i:020x}" for i in range(n_topi) ]
+    jour = [ f"journal-{i:020x}" for i in range(n_jour) ]
+
+    for i, p in enumerate(prov):
+        graph.append({ "@id": VOCAB + p, "@type": "Provider", "dct:title": { "@value": f"Provider {i} " + title(2) }, "dct:identifier": { "@value": f"https://ror.org/0{i:06d}" } })
+
+    # the last dataset never gets cited
+    for i, d in enumerate(data):
+        graph.append({ "@id": VOCAB + d, "@type": "Dataset", "dct:publisher": { "@value": prov[i % n_prov] }, "dct:title": { "@value": f"Dataset {i} " + title(3) } })
+
+    for i, j in enumerate(jour):
+        graph.append({ "@id": VOCAB + j, "@type": "Journal", "dct:title": { "@value": "unknown" if i == 0 else f"Journal of {title(2)} {i}" } })
+
+    for i, a in enumerate(auth):
+        graph.append({ "@id": VOCAB + a, "@type": "Author", "dct:title": { "@value": f"Author{i}, {title(1)}" } })
+
+    for i, t in enumerate(topi):
+        graph.append({ "@id": VOCAB + t, "@type": "Topic", "dct:title": { "@value": f"{title(2).lower()} {i}" } })
+
+    for i in range(n_publ):
+        elem = {
+            "@id": VOCAB + f"publication-{i:020x}",
+            "@type": "ResearchPublication",
+            "dct:title": { "@value": f"On {title(rng.randint(3, 8))} paper {i}" },
+            "cito:citesAsDataSource": link(rng.sample(data[:-1], rng.choice([ 1, 1, 2, 3 ]))),
+            "dct:publisher": { "@id": VOCAB + rng.choice(jour) },
+            "dct:creator": link(rng.sample(auth, rng.choice([ 1, 2, 3 ]))),
+            "dct:identifier": { "@value": f"https://doi.org/10.1/{i}" },
+            "cito:description": { "@value": " ".join([ rng.choice(WORDS) for _ in range(rng.randint(5, 60)) ]) }
+            }
+
+        topics = rng.sample(topi, rng.choice([ 0, 1, 2 ]))
+
+        if topics:
+            elem["dct:subject"] = link(topics)
+
+        graph.append(elem)
+
+    return { "@context": {}, "@graph": graph }
+
+
+@pytest.fixture(scope="session")
+def corpus_path (tmp_path_factory):
+    path = tmp_path_factory.mktemp("corpus") / "kg.jsonld"
+
+    with open(path, "w") as f:
+        json.dump(make_corpus(), f)
+
+    return path
+
+
+@pytest.fixture(scope="session")
+def builder (corpus_path):
+    """
+    a network built from the small corpus, as for pre-compute
+    """
+    net = RCNetworkBuilder()
+    net.setup_render(TEMPLATES)
+    net.load_network(corpus_path)
+
+    return net
+
+
+@pytest.fixture(scope="session")
+def links (builder):
+    return builder.render_links()
+
+
+@pytest.fixture(scope="session")
+def network (builder, links, tmp_path_factory):
+    """
+    the same network, serialized then loaded as for the web app
+    """
+    path = tmp_path_factory.mktemp("precomp") / "precomp.json"
+    builder.serialize(links, path)
+
+    net = RCNetwork()
+    net.setup_render(TEMPLATES, compiled_path=path.with_suffix(".templates.zip"))
+    net.deserialize(path)
+
+    return net
+
+
+@pytest.fixture(scope="session")
+def web_app (network, tmp_path_factory):
+    """
+    the web app, serving the same network, with its own config and
+    disk cache
+    """
+    path = tmp_path_factory.mktemp("app")
+    config = path / "flask.cfg"
+    config.write_text('SECRET_KEY = "test"\nPATH_DC_CACHE = "{}"\n'.format(path / "cache"))
+    os.environ["FLASK_CONFIG"] = str(config)
+
+    import app
+
+    app.APP.net = network
+    app.APP.net_loaded = True
+
+    return app.APP
+
+
+CLIENT_ADDRS = itertools.count(1)
+
+@pytest.fixture
+def client (web_app):
+    """
+    a test client for the web app, with an address of its own, so
+    that each test gets its own rate limit as an anonymous user
+    """
+    client = web_app.test_client()
+    client.environ_base["REMOTE_ADDR"] = "10.0.0.{}".format(next(CLIENT_ADDRS))
+
+    return client
+
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.anf import RCNeighborhoodSizes
+from richcontext.server.flight import RCSharedSemaphore
+from test_graph import make_graph
+import diskcache as dc
+import numpy as np
+import pytest
+import time
+
+
+@pytest.fixture
+def grid ():
+    # a 30x30 grid, plus an isolated node at the end
+    side = 30
+    edges = []
+
+    for i in range(side):
+        for j in range(side):
+            if i + 1 < side:
+                edges.append((i * side + j, (i + 1) * side + j))
+            if j + 1 < side:
+                edges.append((i * side + j, i * side + j + 1))
+
+    return make_graph(side * side + 1, edges)
+
+
+def test_sizes_estimate_bfs (grid):
+    hood_sizes = RCNeighborhoodSizes.from_graph(grid, max_radius=6)
+
+    for node in [ 0, 15, 465, 899 ]:
+        for radius in [ 2, 4, 6 ]:
+            exact = len(grid.bfs(node, depth_limit=radius))
+            estimate = hood_sizes.size(node, radius)
+
+            # within three standard errors
+            assert abs(estimate - exact) <= 3 * RCNeighborhoodSizes.STD_ERROR * exact
+
+
+def test_sizes_edge_cases (grid):
+    hood_sizes = RCNeighborhoodSizes.from_graph(grid, max_radius=4)
+
+    # the isolated node only reaches itself, at every radius
+    assert [ hood_sizes.size(900, r) for r in range(1, 5) ] == [ 1, 1, 1, 1 ]
+
+    # radii past the estimates use the largest one
+    assert hood_sizes.size(0, 10) == hood_sizes.size(0, 4)
+    assert hood_sizes.size(0, 0) is None
+    assert RCNeighborhoodSizes().size(0, 2) is None
+
+
+def test_sizes_round_trip (grid):
+    hood_sizes = RCNeighborhoodSizes.from_graph(grid, max_radius=3)
+    loaded = RCNeighborhoodSizes.deserialize(hood_sizes.serialize())
+
+    assert np.array_equal(loaded.sizes, hood_sizes.sizes)
+
+
+def test_shared_semaphore (tmp_path):
+    # two workers sharing the disk cache share the slots
+    with dc.Cache(str(tmp_path)) as cache_a, dc.Cache(str(tmp_path)) as cache_b:
+        lane_a = RCSharedSemaphore(cache_a, "lane", 2)
+        lane_b = RCSharedSemaphore(cache_b, "lane", 2)
+
+        first = lane_a.acquire()
+        second = lane_b.acquire()
+
+        assert first and second and first.slot != second.slot
+        assert lane_a.acquire() is None
+        assert lane_b.held() == 2
+
+        # releasing twice frees only the one slot
+        first.release()
+        first.release()
+        assert lane_a.held() == 1
+
+        third = lane_a.acquire()
+        assert third and lane_b.acquire() is None
+
+
+def test_shared_semaphore_expire (tmp_path):
+    with dc.Cache(str(tmp_path)) as cache:
+        lane = RCSharedSemaphore(cache, "lane", 1, expire=0.05)
+        stale = lane.acquire()
+
+        time.sleep(0.1)
+        fresh = lane.acquire()
+        assert fresh
+
+        # the expired lease doesn't free the slot its successor holds
+        stale.release()
+        assert lane.held() == 1 and lane.acquire() is None
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from collections import defaultdict
+from richcontext.server.server import RCSparseTable
+from scipy import sparse
+import itertools
+import json
+import numpy as np
+import pytest
+
+
+def publications (corpus_path):
+    """
+    the links of each publication in the corpus, as lists of UUIDs
+    """
+    with open(corpus_path) as f:
+        graph = json.load(f)["@graph"]
+
+    unknown = [ e["@id"] for e in graph if e["@type"] == "Journal" and e["dct:title"]["@value"] == "unknown" ]
+
+    def links (elem, key):
+        l = elem.get(key, [])
+        l = [ l ] if isinstance(l, dict) else l
+        return [ x["@id"].split("#")[1] for x in l if x["@id"] not in unknown ]
+
+    for elem in graph:
+        if elem["@type"] == "ResearchPublication":
+            yield {
+                "datasets": links(elem, "cito:citesAsDataSource"),
+                "authors": links(elem, "dct:creator"),
+                "journal": links(elem, "dct:publisher"),
+                "topics": links(elem, "dct:subject")
+                }
+
+
+def test_sparse_table ():
+    counts = sparse.coo_matrix(([ 2, 1, 5, 1, 3 ], ([ 0, 0, 2, 2, 0 ], [ 3, 1, 1, 4, 3 ])), shape=(4, 5))
+    table = RCSparseTable.from_matrix(counts, np.array([ 9.0, 0.0, 7.0, 0.0 ]), ranked=True)
+
+    # duplicate entries get summed
+    assert table.get(0, 3) == (5, 9.0)
+    assert table.get(0, 1) == (1, 9.0)
+    assert table.get(2, 4) == (1, 7.0)
+    assert table.get(0, 2) is None
+    assert table.get(1, 0) is None
+    assert table.get(9, 0) is None
+
+    assert table.top(0, 1) == ([ (3, 5) ], 9.0)
+    assert table.top(2, 10) == ([ (1, 5), (4, 1) ], 7.0)
+    assert table.top(9, 10) == ([], 0.0)
+
+    loaded = RCSparseTable.deserialize(table.serialize())
+    assert loaded.get(0, 3) == (5, 9.0) and loaded.top(0, 2) == table.top(0, 2)
+
+
+def test_mle_matches_counts (builder, corpus_path):
+    # the co-occurrence counts, tallied as dicts the way they used to be
+    trials = defaultdict(int)
+    counts = defaultdict(dict)
+
+    for p in publications(corpus_path):
+        for kind in [ "authors", "journal", "topics" ]:
+            for e in p[kind]:
+                trials[e] += float(len(p["datasets"]))
+
+                for d in p["datasets"]:
+                    counts[e][d] = counts[e].get(d, 0) + 1
+
+    entities = builder.auth.ids.tolist() + builder.jour.ids.tolist() + builder.topi.ids.tolist()
+    datasets = builder.data.ids.tolist()
+    assert sum([ len(c) for c in counts.values() ]) > 0
+
+    for e_id, d_id in itertools.product(entities, datasets):
+        e = builder.id_list[e_id]
+        d = builder.id_list[d_id]
+
+        if d in counts[e]:
+            x = counts[e][d]
+            expected = (x, builder.point_estimate(x, trials[e]))
+        else:
+            expected = (0, 0.0)
+
+        assert builder.get_mle(e_id, d_id) == pytest.approx(expected)
+
+
+def test_cousage_matches_pairs (builder, corpus_path):
+    pairs = defaultdict(int)
+    n_publ = defaultdict(int)
+
+    for p in publications(corpus_path):
+        datasets = sorted(set(p["datasets"]))
+
+        for d in datasets:
+            n_publ[d] += 1
+
+        for d, e in itertools.permutations(datasets, 2):
+            pairs[d, e] += 1
+
+    for d_id in builder.data.ids.tolist():
+        d = builder.id_list[d_id]
+        used = builder.get_cousage(d_id, k=100)
+
+        # descending order of count, with ties by ascending ID
+        expected = sorted([ (-x, builder.get_id(e), e) for (a, e), x in pairs.items() if a == d ])
+        assert [ (uuid, count) for uuid, title, count, pt_est in used ] == [ (e, -x) for x, i, e in expected ]
+        assert [ pt_est for uuid, title, count, pt_est in used ] == [ builder.point_estimate(-x, n_publ[d]) for x, i, e in expected ]
+
+        assert builder.get_cousage(d_id, k=2) == used[:2]
+
+
+def test_cousage_symmetric (builder):
+    for d_id in builder.data.ids.tolist():
+        used = builder.get_cousage(d_id, k=100)
+        n_publ = builder.cousage.top(d_id, 1)[1]
+
+        for uuid, title, count, pt_est in used:
+            e_id = builder.get_id(uuid)
+
+            # the same count either way round, never the dataset itself,
+            # and no more than the publications which cite it
+            assert e_id != d_id
+            assert builder.cousage.get(e_id, d_id)[0] == count
+            assert 0 < count <= n_publ
+            assert 0.0 < pt_est < 1.0
+            assert pt_est == builder.point_estimate(count, n_publ)
+
+
+def test_cousage_api (client, network):
+    d_id = network.data.ids[0]
+    uuid = network.id_list[d_id]
+
+    response = client.get(f"/api/v1/cousage/{uuid}?k=2")
+    assert response.status_code == 200
+    assert json.loads(response.data) == json.loads(json.dumps(network.get_cousage(d_id, k=2)))
+
+    # any other kind of entity, or an unknown UUID, isn't a dataset
+    for other in [ network.id_list[network.auth.ids[0]], "no-such-uuid" ]:
+        assert client.get(f"/api/v1/cousage/{other}").status_code == 404
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.batch import RCBatchRunner
+import json
+import multiprocessing
+import pyarrow.parquet as pq
+import pytest
+
+
+def parse_radius (radius):
+    return min(max(int(radius), 1), 10)
+
+
+@pytest.fixture
+def batch_path (network, tmp_path):
+    title = network.labels[int(network.data.ids[0])]
+    uuid = network.id_list[int(network.auth.ids[0])]
+
+    lines = [
+        "kind\tentity\tradius",
+        f"query\t{title}\t1",
+        f"QUERY\t{title}",
+        f"lookup\t{uuid}",
+        "lookup\tno-such-uuid",
+        "bad format",
+        f"explain\t{title}\t2"
+        ]
+
+    path = tmp_path / "batch.tsv"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    return path
+
+
+@pytest.fixture
+def runner (network):
+    return RCBatchRunner(network, parse_radius, 2)
+
+
+def test_read_jobs (runner, batch_path):
+    jobs = runner.read_jobs(batch_path)
+
+    # the line with a bad format gets skipped
+    assert [ (line, kind) for line, kind, entity, radius in jobs ] == [ (2, "query"), (3, "query"), (4, "lookup"), (5, "lookup"), (7, "explain") ]
+    assert [ radius for line, kind, entity, radius in jobs ][:2] == [ "1", 2 ]
+
+
+def check_records (network, records):
+    assert [ (r["line"], r["kind"], r["status"], r["radius"]) for r in records ] == [
+        (2, "query", 200, 1),
+        (3, "query", 200, 2),
+        (4, "lookup", 200, None),
+        (5, "lookup", 400, None),
+        (7, "explain", 400, None)
+        ]
+
+    # the same neighbors as a query through the network
+    query = records[1]
+    subgraph, paths, node_id = network.get_subgraph(query["entity"], 2)
+    hood = network.rank_neighborhood(2, subgraph, paths, node_id)
+
+    assert query["result"] == { k: [ hood.row_record(r) for r in hood.sorted_rows(k) ] for k in hood.KINDS }
+    assert sum([ len(rows) for rows in query["result"].values() ]) > 1
+
+    assert records[2]["result"] == json.loads(json.dumps(network.lookup_entity(records[2]["entity"])))
+
+
+def test_run_ndjson (runner, network, batch_path, tmp_path):
+    out_path = tmp_path / "out.ndjson"
+    report = runner.run(batch_path, out_path, workers=2)
+
+    with open(out_path, encoding="utf-8") as f:
+        records = [ json.loads(line) for line in f ]
+
+    check_records(network, records)
+
+    assert report["queries"] == 5
+    assert report["workers"] == 2
+    assert report["kinds"]["query"]["count"] == 2
+    assert report["kinds"]["lookup"]["errors"] == 1
+    assert report["kinds"]["explain"]["errors"] == 1
+
+
+def test_run_parquet (runner, network, batch_path, tmp_path):
+    out_path = tmp_path / "out.parquet"
+    runner.run(batch_path, out_path, workers=1)
+
+    records = pq.read_table(out_path).to_pylist()
+
+    for r in records:
+        r["result"] = json.loads(r["result"])
+
+    check_records(network, records)
+
+
+@pytest.mark.parametrize("method", [ "spawn", "forkserver" ])
+def test_run_start_method (runner, network, batch_path, tmp_path, method):
+    # the default start method on macOS, or on Linux from Python 3.14
+    default = multiprocessing.get_start_method()
+    multiprocessing.set_start_method(method, force=True)
+
+    try:
+        out_path = tmp_path / "out.ndjson"
+        runner.run(batch_path, out_path, workers=2)
+    finally:
+        multiprocessing.set_start_method(default, force=True)
+
+    with open(out_path, encoding="utf-8") as f:
+        check_records(network, [ json.loads(line) for line in f ])
+
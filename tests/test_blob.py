@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from flask import jsonify
+from richcontext.server.blob import RCBlobReader, RCBlobWriter
+import brotli
+import gzip
+import json
+import pytest
+
+
+def test_blob_round_trip (tmp_path):
+    sections = {
+        "empty": [],
+        "sparse": [ None, b"one", b"", None, b"\x00\xff" ],
+        "dense": [ bytes([ i ]) * i for i in range(1, 50) ]
+        }
+
+    writer = RCBlobWriter()
+
+    for name, payloads in sections.items():
+        writer.add_section(name, payloads)
+
+    writer.write(tmp_path / "test.blob")
+    reader = RCBlobReader(tmp_path / "test.blob")
+
+    for name, payloads in sections.items():
+        assert name in reader
+        assert reader.count(name) == len(payloads)
+
+        # missing and empty payloads both read back as `None`
+        for i, p in enumerate(payloads):
+            data = reader.get(name, i)
+            assert (bytes(data) if data is not None else None) == (p or None)
+
+    assert "missing" not in reader
+    assert reader.get("missing", 0) is None
+    assert reader.get("sparse", -1) is None
+    assert reader.get("sparse", 5) is None
+
+
+def test_blob_large_header (tmp_path):
+    # enough sections that the header outgrows its initial size
+    writer = RCBlobWriter()
+
+    for i in range(500):
+        writer.add_section("section-{:04d}".format(i), [ str(i).encode("utf-8") ])
+
+    writer.write(tmp_path / "test.blob")
+    reader = RCBlobReader(tmp_path / "test.blob")
+
+    assert [ bytes(reader.get("section-{:04d}".format(i), 0)) for i in range(500) ] == [ str(i).encode("utf-8") for i in range(500) ]
+
+
+def test_blob_magic (tmp_path):
+    (tmp_path / "test.blob").write_bytes(b"not a blob file at all")
+
+    with pytest.raises(ValueError):
+        RCBlobReader(tmp_path / "test.blob")
+
+
+def test_payloads (network, links):
+    # every entity except the unknown journal
+    assert len(links) == len(network.store) - 1
+
+    for uuid, html in links.items():
+        i = network.get_id(uuid)
+
+        # entities without links have no payloads
+        if not html:
+            assert [ network.get_payload("links", i, encoding) for encoding in [ "gzip", "br", None ] ] == [ None, None, None ]
+            continue
+
+        expected = (json.dumps(html, separators=(",", ":"), sort_keys=True) + "\n").encode("utf-8")
+
+        assert gzip.decompress(network.get_payload("links", i, "gzip")) == expected
+        assert brotli.decompress(network.get_payload("links", i, "br")) == expected
+        assert network.get_payload("links", i) == expected
+
+    assert network.get_payload("links", None) is None
+
+
+def test_lookup_payloads (network, builder):
+    # the lookups also get stored uncompressed, to serve without any
+    # decompression
+    assert "lookup.json" in network.payloads
+
+    for i, uuid in enumerate(network.id_list):
+        response = builder.lookup_entity(uuid)
+        payload = network.get_payload("lookup", i)
+
+        if not response:
+            assert payload is None
+            continue
+
+        assert json.loads(payload) == json.loads(json.dumps(response))
+        assert gzip.decompress(network.get_payload("lookup", i, "gzip")) == payload
+
+
+@pytest.mark.parametrize("encoding", [ None, "gzip", "br" ])
+def test_payload_matches_jsonify (client, web_app, network, encoding):
+    # the pre-serialized payload goes out exactly as `jsonify()` would
+    # have sent the same response
+    uuid = next(u for u in network.id_list if network.lookup_entity(u))
+    headers = { "Accept-Encoding": encoding or "identity" }
+
+    response = client.get(f"/api/v1/lookup/{uuid}", headers=headers)
+    data = response.data
+
+    if encoding == "gzip":
+        data = gzip.decompress(data)
+    elif encoding == "br":
+        data = brotli.decompress(data)
+
+    with web_app.test_request_context():
+        expected = jsonify(network.lookup_entity(uuid))
+
+    assert response.status_code == 200
+    assert response.headers.get("Content-Encoding") == encoding
+    assert response.headers["Content-Type"] == expected.headers["Content-Type"]
+    assert data == expected.get_data()
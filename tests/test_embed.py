@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.embed import RCEmbedding
+from test_graph import make_graph
+import itertools
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def embedding ():
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(50, 8))
+    vectors /= np.linalg.norm(vectors, axis=1)[:, None]
+
+    # node 49 has no embedding
+    vectors[49] = 0.0
+
+    return RCEmbedding(vectors)
+
+
+@pytest.mark.parametrize("k", [ 1, 5, 20, 100 ])
+def test_nearest_brute_force (embedding, k):
+    candidates = np.arange(0, 50, 2)
+
+    for i in [ 0, 3, 10 ]:
+        sims = embedding.vectors[candidates] @ embedding.vectors[i]
+        expected = sorted([ (-s, c) for c, s in zip(candidates.tolist(), sims.tolist()) if c != i ])[:k]
+
+        nearest = embedding.nearest(i, candidates, k=k)
+        assert [ c for c, s in nearest ] == [ c for s, c in expected ]
+        assert [ s for c, s in nearest ] == pytest.approx([ -s for s, c in expected ])
+
+
+def test_nearest_edge_cases (embedding):
+    assert embedding.nearest(49, np.arange(10), k=3) == []
+    assert embedding.nearest(0, np.array([ 0 ]), k=3) == []
+    assert embedding.nearest(0, np.array([], dtype=np.int64), k=3) == []
+
+
+def test_from_graph ():
+    # two cliques of five nodes, joined by one edge, plus an isolated node
+    edges = [ e for base in [ 0, 5 ] for e in itertools.combinations(range(base, base + 5), 2) ] + [ (4, 5) ]
+    graph = make_graph(11, edges)
+    embedding = RCEmbedding.from_graph(graph, dim=1)
+
+    lengths = np.linalg.norm(embedding.vectors, axis=1)
+    assert lengths[:10] == pytest.approx(1.0, abs=1e-5)
+    assert lengths[10] == 0.0
+
+    # each node is nearest to the others in its own clique
+    for i in [ 0, 2, 7, 9 ]:
+        clique = set(range(0, 5)) if i < 5 else set(range(5, 10))
+        nearest = embedding.nearest(i, np.arange(10), k=4)
+        assert set([ c for c, s in nearest ]) == clique - { i }
+
+    loaded = RCEmbedding.deserialize(embedding.serialize())
+    assert np.array_equal(loaded.vectors, embedding.vectors)
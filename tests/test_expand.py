@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import numpy as np
+import pytest
+
+
+def seed_titles (network, count):
+    """
+    titles of the most connected datasets, as seeds for queries
+    """
+    ids = network.store.ids_of_kind("data")
+    ids = ids[np.argsort(-np.diff(network.graph.indptr)[ids], kind="stable")]
+
+    return [ network.labels[int(i)] for i in ids[:count] ]
+
+
+@pytest.mark.parametrize("count", [ 1, 2, 3 ])
+def test_extend_multi_subgraph (network, count):
+    seeds = seed_titles(network, count)
+    subgraph, paths, anchors, seed_list, seed_dist = network.get_multi_subgraph(seeds, 1)
+
+    nodes = np.array(sorted(subgraph), dtype=np.int64)
+    dist = np.array([ seed_dist[i] for i in nodes.tolist() ], dtype=np.int8).reshape(len(nodes), count)
+
+    for new_radius in [ 2, 3 ]:
+        added, added_anchors, updated = network.extend_multi_subgraph(seed_list, nodes, dist, 1, new_radius)
+        subgraph_2, paths_2, anchors_2, seed_list_2, seed_dist_2 = network.get_multi_subgraph(seeds, new_radius)
+
+        # the same as a query at the larger radius from the start
+        assert subgraph | set(added) == subgraph_2
+        assert { **paths, **added } == paths_2
+        assert { i: anchors_2[i] for i in added } == added_anchors
+        assert { **seed_dist, **updated } == seed_dist_2
+
+        # only nodes whose distances changed get updated
+        assert all([ updated[i] != seed_dist[i] for i in updated if i in seed_dist ])
+
+
+def test_expand_neighborhood (network):
+    seed, = seed_titles(network, 1)
+    subgraph, paths, node_id = network.get_subgraph(seed, 1)
+    diagram = [ entry[2] for entry in [ network.hood_entry(i, 1, paths[i], node_id) for i in sorted(subgraph) ] if entry ]
+    layout = network.neighborhood_layout(subgraph, network.graph.subgraph_edges(subgraph))
+
+    visited = np.array(sorted(subgraph), dtype=np.int64)
+    drawn = np.array(sorted([ node[0] for node in diagram ]), dtype=np.int64)
+    xy = np.array([ layout[i] for i in drawn.tolist() ], dtype=np.float64)
+
+    frontier = [ i for i, d in paths.items() if d == 1 ]
+    added = network.graph.extend_bfs(visited, frontier, 1, depth_limit=2)
+    entries, edges, placed = network.expand_neighborhood(added, visited, node_id, 2, drawn, xy, xy.mean(axis=0))
+
+    # the added entities rank the same as in a query at radius 2
+    subgraph_2, paths_2, node_id_2 = network.get_subgraph(seed, 2)
+    hood = network.rank_neighborhood(2, subgraph_2, paths_2, node_id_2)
+    ranked = { row[0]: row for kind in hood.KINDS for row in getattr(hood, kind) }
+
+    assert len(entries) > 0
+    assert [ row for kind, row, node in entries ] == [ ranked[node[0]] for kind, row, node in entries ]
+
+    # each new node gets placed, without moving the nodes already drawn
+    new_ids = set([ node[0] for kind, row, node in entries ])
+    assert set(placed) == new_ids
+
+    # edges touch a new node, and join nodes which both get drawn
+    for u, v, weight in edges:
+        assert u in new_ids or v in new_ids
+        assert (u in new_ids or u in drawn) and (v in new_ids or v in drawn)
+
+
+KINDS = [ "prov", "data", "publ", "jour", "auth", "topi" ]
+
+
+def query_ids (client, radius, seeds):
+    if len(seeds) == 1:
+        response = client.get(f"/api/v1/query/{radius}/{seeds[0]}")
+    else:
+        response = client.get(f"/api/v1/query/{radius}", query_string={ "entity": seeds })
+
+    assert response.status_code == 200
+    view = json.loads(response.data)
+
+    return view["toke"], set([ row[0] for kind in KINDS for row in view[kind] ])
+
+
+@pytest.mark.parametrize("count", [ 1, 2 ])
+def test_expand_query (web_app, client, network, count):
+    seeds = seed_titles(network, count)
+
+    toke, ids = query_ids(client, 1, seeds)
+
+    for radius in [ 2, 3 ]:
+        response = client.get(f"/api/v1/expand/{toke}/{radius}")
+        assert response.status_code == 200
+
+        delta = json.loads(response.data)
+        expanded = web_app.disk_cache.get("frontier-" + delta["toke"])
+
+        # only the entities, and diagram nodes, which the larger radius
+        # adds, compared with a query at the new radius from the start
+        toke_full, ids_full = query_ids(client, radius, seeds)
+        full = web_app.disk_cache.get("frontier-" + toke_full)
+        added = set([ row[0] for kind in KINDS for row in delta[kind] ])
+
+        assert delta["toke"] == toke_full
+        assert (delta["from"], delta["radius"]) == (radius - 1, radius)
+        assert added == ids_full - ids
+        assert set([ node[0] for node in delta["nodes"] ]) == added
+
+        # the merged BFS state matches that of the full query
+        for key in [ "radius", "nodes", "dist", "seed_dist", "drawn" ]:
+            assert np.array_equal(expanded[key], full[key])
+
+        # then chain the next expansion from the merged state
+        web_app.disk_cache.set("frontier-" + delta["toke"], expanded)
+        toke, ids = delta["toke"], ids_full
+
+
+def test_expand_query_radius (web_app, client, network, monkeypatch):
+    toke, ids = query_ids(client, 2, seed_titles(network, 1))
+
+    # a radius which isn't larger is a bad request
+    for radius in [ 1, 2 ]:
+        assert client.get(f"/api/v1/expand/{toke}/{radius}").status_code == 400
+
+    # a downgrade to no larger a radius gets rejected
+    monkeypatch.setattr(web_app, "admit_query", lambda prefix, entities, radius_val: (2, None))
+    response = client.get(f"/api/v1/expand/{toke}/3")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(web_app.RETRY_AFTER)
+
+    assert client.get("/api/v1/expand/unknown/3").status_code == 404
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.export import RCExporter
+from richcontext.server.server import RCSparseTable
+import copy
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+
+def read_table (path, fmt):
+    if fmt == "parquet":
+        return pq.read_table(path)
+
+    with pa.ipc.open_file(path) as reader:
+        return reader.read_all()
+
+
+def expected_rows (net):
+    rows = { kind: len(net.store.ids_of_kind(kind)) for kind in RCExporter.KIND_TABLES }
+
+    rows["edges"] = len(net.graph.indices) // 2
+    rows["scale"] = len(net.scale)
+    rows["mle"] = len(net.mle.indices)
+    rows["cousage"] = len(net.cousage.indices)
+
+    return rows
+
+
+@pytest.mark.parametrize("fmt", [ "parquet", "arrow" ])
+def test_export (network, tmp_path, fmt):
+    # small row groups, so that each table gets written in several
+    exporter = RCExporter(network, row_group_size=7)
+    manifest = exporter.export(tmp_path, fmt=fmt)
+    rows = expected_rows(network)
+
+    assert manifest == RCExporter.read_manifest(tmp_path)
+    assert manifest["build"] == network.build_id
+    assert { table: entry[fmt]["rows"] for table, entry in manifest["tables"].items() } == rows
+
+    for table in RCExporter.TABLES:
+        path = RCExporter.table_path(tmp_path, table, fmt)
+        assert read_table(path, fmt).num_rows == rows[table]
+        assert manifest["tables"][table][fmt]["bytes"] == path.stat().st_size
+
+    # the exported values match the network
+    publ = read_table(RCExporter.table_path(tmp_path, "publ", fmt), fmt).to_pylist()
+    assert [ r["uuid"] for r in publ ] == [ network.id_list[i] for i in network.store.ids_of_kind("publ") ]
+    assert [ r["datasets"] for r in publ ] == [ network.store.get_field(r["id"], "datasets") for r in publ ]
+
+    for r in read_table(RCExporter.table_path(tmp_path, "mle", fmt), fmt).to_pylist():
+        assert (r["count"], r["estimate"]) == pytest.approx(network.get_mle(r["entity"], r["dataset"]))
+
+
+def test_export_formats (network, tmp_path):
+    exporter = RCExporter(network)
+    exporter.export(tmp_path, fmt="parquet")
+    manifest = exporter.export(tmp_path, fmt="arrow")
+
+    # exports in each format accumulate for the same build
+    assert all([ set(entry) == { "parquet", "arrow" } for entry in manifest["tables"].values() ])
+
+    with pytest.raises(ValueError):
+        exporter.export(tmp_path, fmt="csv")
+
+
+def test_export_empty_table (network, tmp_path):
+    RCExporter(network).export(tmp_path)
+    path = RCExporter.table_path(tmp_path, "cousage", "parquet")
+    assert path.exists()
+
+    # a later build without any co-usage
+    rebuilt = copy.copy(network)
+    rebuilt.cousage = RCSparseTable()
+    rebuilt.build_id = network.build_id + "-next"
+
+    manifest = RCExporter(rebuilt).export(tmp_path)
+
+    assert "cousage" not in manifest["tables"]
+    assert not path.exists()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.facets import RCFacetIndex
+import numpy as np
+import pytest
+
+
+# publications with node IDs 10-15; datasets 1-3 and topics 20-21
+PUBL = np.array([ 10, 11, 12, 13, 14, 15 ], dtype=np.int64)
+IMPACT = np.array([ 0.1, 0.6, 0.3, 0.6, 0.2, 0.5 ])
+
+LINKS = {
+    "data": [ (0, 1), (1, 1), (1, 2), (2, 2), (3, 3), (4, 1), (4, 3) ],
+    "topi": [ (0, 20), (2, 20), (3, 21), (4, 20), (5, 21) ]
+    }
+
+
+@pytest.fixture
+def facets ():
+    pairs = {
+        kind: ( np.array([ p for p, e in links ], dtype=np.int64), np.array([ e for p, e in links ], dtype=np.int64) )
+        for kind, links in LINKS.items()
+        }
+
+    return RCFacetIndex(PUBL, IMPACT, pairs)
+
+
+def selected_ids (facets, selected):
+    return facets.publ[selected].tolist()
+
+
+def test_mask (facets):
+    assert selected_ids(facets, facets.mask("data", 1)) == [ 10, 11, 14 ]
+    assert selected_ids(facets, facets.mask("topi", 21)) == [ 13, 15 ]
+    assert selected_ids(facets, facets.mask("data", 99)) == []
+
+
+def test_select_and (facets):
+    selected = facets.select(all_of=[ ("data", 1), ("topi", 20) ])
+    assert selected_ids(facets, selected) == [ 10, 14 ]
+
+    selected = facets.select(all_of=[ ("data", 1), ("data", 3) ])
+    assert selected_ids(facets, selected) == [ 14 ]
+
+
+def test_select_or (facets):
+    selected = facets.select(any_of=[ ("data", 2), ("data", 3) ])
+    assert selected_ids(facets, selected) == [ 11, 12, 13, 14 ]
+
+
+def test_select_not (facets):
+    selected = facets.select(none_of=[ ("data", 1) ])
+    assert selected_ids(facets, selected) == [ 12, 13, 15 ]
+
+
+def test_select_combined (facets):
+    selected = facets.select(all_of=[ ("topi", 20) ], any_of=[ ("data", 1), ("data", 2) ], none_of=[ ("data", 3) ])
+    assert selected_ids(facets, selected) == [ 10, 12 ]
+
+    # no clauses selects every publication
+    assert selected_ids(facets, facets.select()) == PUBL.tolist()
+
+
+def test_counts (facets):
+    view = facets.counts(facets.select(none_of=[ ("topi", 21) ]), k=2)
+
+    assert view["data"] == [ (1, 3), (2, 2) ]
+    assert view["topi"] == [ (20, 3) ]
+
+    # descending order of count, with ties by ascending ID
+    view = facets.counts(facets.select(), k=3)
+    assert view["data"] == [ (1, 3), (2, 2), (3, 2) ]
+    assert view["topi"] == [ (20, 3), (21, 2) ]
+
+
+def test_ranked (facets):
+    selected = facets.select()
+
+    # descending order of impact, with ties by ascending position
+    assert facets.ranked(selected, 0, 10) == [ 11, 13, 15, 12, 14, 10 ]
+    assert facets.ranked(selected, 2, 2) == [ 15, 12 ]
+    assert facets.ranked(selected, 6, 2) == []
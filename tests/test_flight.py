@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.flight import RCSingleFlight
+import diskcache as dc
+import pytest
+import threading
+import time
+
+
+def run_concurrently (fns):
+    """
+    call each of `fns` in its own thread, returning their results or
+    the exceptions they raised
+    """
+    results = [ None ] * len(fns)
+
+    def call (j):
+        try:
+            results[j] = fns[j]()
+        except Exception as e:
+            results[j] = e
+
+    threads = [ threading.Thread(target=call, args=(j,)) for j in range(len(fns)) ]
+
+    for t in threads:
+        t.start()
+
+    for t in threads:
+        t.join()
+
+    return results
+
+
+def slow_compute (calls, result, delay=0.2):
+    def compute ():
+        calls.append(1)
+        time.sleep(delay)
+
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+    return compute
+
+
+def test_coalesce ():
+    flight = RCSingleFlight()
+    calls = []
+
+    results = run_concurrently([ lambda: flight.do("key", slow_compute(calls, [ 42 ])) for _ in range(5) ])
+
+    assert calls == [ 1 ]
+    assert results == [ [ 42 ] ] * 5
+    assert (flight.leaders, flight.followers) == (1, 4)
+    assert not flight.in_flight("key")
+
+
+def test_distinct_keys ():
+    flight = RCSingleFlight()
+    calls = []
+
+    results = run_concurrently([ lambda j=j: flight.do(f"key-{j}", slow_compute(calls, j, delay=0.05)) for j in range(3) ])
+
+    assert results == [ 0, 1, 2 ]
+    assert len(calls) == 3
+
+
+def test_errors_propagate ():
+    flight = RCSingleFlight()
+    calls = []
+
+    results = run_concurrently([ lambda: flight.do("key", slow_compute(calls, ValueError("failed"))) for _ in range(3) ])
+
+    assert calls == [ 1 ]
+    assert all([ isinstance(r, ValueError) and str(r) == "failed" for r in results ])
+
+    # the failure doesn't stick to the key
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_coalesce_across_workers (tmp_path):
+    # separate instances, as in separate worker processes, which share
+    # a disk cache
+    with dc.Cache(str(tmp_path)) as cache_a, dc.Cache(str(tmp_path)) as cache_b:
+        flights = [ RCSingleFlight(cache_a), RCSingleFlight(cache_b) ]
+        calls = []
+
+        results = run_concurrently([ lambda f=f: f.do("key", slow_compute(calls, { "n": 1 })) for f in flights ])
+
+        assert calls == [ 1 ]
+        assert results == [ { "n": 1 } ] * 2
+
+
+def test_no_result_without_waiters (tmp_path):
+    with dc.Cache(str(tmp_path)) as cache:
+        flight = RCSingleFlight(cache)
+
+        assert flight.do("key", lambda: [ 1 ]) == [ 1 ]
+
+        # nobody waited, so nothing got pickled into the cache
+        assert list(cache.iterkeys()) == []
+
+
+def test_in_flight_across_workers (tmp_path):
+    with dc.Cache(str(tmp_path)) as cache_a, dc.Cache(str(tmp_path)) as cache_b:
+        flight_a = RCSingleFlight(cache_a)
+        flight_b = RCSingleFlight(cache_b)
+        seen = []
+
+        def compute ():
+            seen.append(flight_b.in_flight("key"))
+            return 1
+
+        flight_a.do("key", compute)
+
+        assert seen == [ True ]
+        assert not flight_b.in_flight("key")
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.graph import RCGraph
+import numpy as np
+import pytest
+
+
+def make_graph (num_nodes, edges, weights=None):
+    """
+    build an `RCGraph` from a list of undirected `(u, v)` edges, with
+    unit weights unless given
+    """
+    adj = [ [] for _ in range(num_nodes) ]
+    weights = weights if weights is not None else [ 1.0 ] * len(edges)
+
+    for (u, v), w in zip(edges, weights):
+        adj[u].append((v, w))
+        adj[v].append((u, w))
+
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum([ len(a) for a in adj ], out=indptr[1:])
+    indices = [ v for a in adj for v, w in a ]
+    weights = [ w for a in adj for v, w in a ]
+
+    return RCGraph(indptr, indices, weights, np.ones(num_nodes, dtype=bool))
+
+
+def random_graph (num_nodes, num_edges, seed=0):
+    rng = np.random.default_rng(seed)
+    edges = set()
+
+    while len(edges) < num_edges:
+        u, v = rng.integers(num_nodes, size=2).tolist()
+
+        if u != v:
+            edges.add((min(u, v), max(u, v)))
+
+    edges = sorted(edges)
+    return make_graph(num_nodes, edges, weights=rng.choice([ 1.0, 10.0, 20.0 ], size=len(edges)).tolist())
+
+
+@pytest.fixture
+def graph ():
+    # two 2-hop paths from 0 to 3, joined by the edge 1-2, plus a
+    # 3-hop detour through 4 and 5; node 6 is isolated
+    return make_graph(7, [ (0, 1), (1, 3), (0, 2), (2, 3), (1, 2), (0, 4), (4, 5), (5, 3) ])
+
+
+def is_path (graph, path):
+    return all([ v in graph.neighbors(u) for u, v in zip(path, path[1:]) ])
+
+
+def test_shortest_path (graph):
+    assert graph.shortest_path(0, 3) in ([ 0, 1, 3 ], [ 0, 2, 3 ])
+    assert graph.shortest_path(0, 0) == [ 0 ]
+    assert graph.shortest_path(0, 6) is None
+    assert graph.shortest_path(0, 3, blocked=[ 1, 2 ]) == [ 0, 4, 5, 3 ]
+    assert graph.shortest_path(0, 3, max_length=2, blocked=[ 1, 2 ]) is None
+
+
+def test_k_shortest_paths_order (graph):
+    paths = graph.k_shortest_paths(0, 3, k=10)
+    lengths = [ len(p) for p in paths ]
+
+    assert lengths == sorted(lengths)
+    assert lengths == [ 3, 3, 4, 4, 4 ]
+    assert sorted(map(tuple, paths)) == [ (0, 1, 2, 3), (0, 1, 3), (0, 2, 1, 3), (0, 2, 3), (0, 4, 5, 3) ]
+
+    for path in paths:
+        assert path[0] == 0 and path[-1] == 3
+        assert len(set(path)) == len(path)
+        assert is_path(graph, path)
+
+
+def test_k_shortest_paths_prefix (graph):
+    # asking for fewer paths returns a prefix of the longer list
+    paths = graph.k_shortest_paths(0, 3, k=10)
+
+    for k in range(1, len(paths) + 1):
+        assert graph.k_shortest_paths(0, 3, k=k) == paths[:k]
+
+
+def test_k_shortest_paths_max_length (graph):
+    assert sorted(graph.k_shortest_paths(0, 3, k=10, max_length=2)) == [ [ 0, 1, 3 ], [ 0, 2, 3 ] ]
+    assert graph.k_shortest_paths(0, 6, k=3) == []
+
+
+@pytest.mark.parametrize("source", [ 0, 3, 5, 6 ])
+def test_extend_bfs (graph, source):
+    for radius in range(0, 3):
+        paths = graph.bfs(source, depth_limit=radius)
+        frontier = [ i for i, d in paths.items() if d == radius ]
+
+        for new_radius in range(radius + 1, 4):
+            added = graph.extend_bfs(paths, frontier, radius, depth_limit=new_radius)
+
+            # only the nodes newly reached, at the same distances as a
+            # BFS out to the larger radius
+            assert not set(added) & set(paths)
+            assert { **paths, **added } == graph.bfs(source, depth_limit=new_radius)
+
+
+def test_multi_bfs ():
+    graph = random_graph(60, 90)
+    sources = [ 0, 7, 7, 31 ]
+
+    for depth_limit in [ 0, 1, 2, 3, None ]:
+        nodes, dist = graph.multi_bfs(sources, depth_limit=depth_limit)
+        reached = set()
+
+        # the same distances as a separate BFS from each source
+        for source, row in zip(sources, dist):
+            paths = graph.bfs(source, depth_limit=depth_limit)
+            assert { i: d for i, d in zip(nodes.tolist(), row.tolist()) if d >= 0 } == paths
+            reached.update(paths)
+
+        assert nodes.tolist() == sorted(reached)
+
+    with pytest.raises(ValueError):
+        graph.multi_bfs(list(range(RCGraph.MAX_SOURCES + 1)))
+
+
+def test_multi_bfs_max_sources ():
+    # a full bitmask, where the last source sets the top bit
+    graph = random_graph(100, 180, seed=3)
+    sources = list(range(0, 2 * RCGraph.MAX_SOURCES, 2))
+    assert len(sources) == RCGraph.MAX_SOURCES
+
+    nodes, dist = graph.multi_bfs(sources, depth_limit=3)
+
+    for source, row in zip(sources, dist):
+        paths = graph.bfs(source, depth_limit=3)
+        assert { i: d for i, d in zip(nodes.tolist(), row.tolist()) if d >= 0 } == paths
+
+    # one more source doesn't fit the bitmask
+    with pytest.raises(ValueError, match=str(RCGraph.MAX_SOURCES)):
+        graph.multi_bfs(sources + [ 1 ])
+
+
+def exact_pagerank (graph, source, alpha):
+    """
+    solve for the personalized PageRank vector of `source` directly
+    """
+    n = len(graph.indptr) - 1
+    walk = np.zeros((n, n))
+
+    for u in range(n):
+        for v, w in zip(graph.neighbors(u), graph.weights[graph.indptr[u]:graph.indptr[u + 1]]):
+            walk[u, v] += w / graph.strength[u]
+
+    start = np.zeros(n)
+    start[source] = 1.0
+
+    return alpha * np.linalg.solve(np.eye(n) - (1.0 - alpha) * walk.T, start)
+
+
+@pytest.mark.parametrize("source", [ 0, 5, 17 ])
+def test_personalized_pagerank (source):
+    graph = random_graph(40, 80, seed=1)
+    exact = exact_pagerank(graph, source, 0.15)
+    errors = []
+
+    for epsilon in [ 1e-3, 1e-5, 1e-7 ]:
+        scores = graph.personalized_pagerank(source, alpha=0.15, epsilon=epsilon)
+        approx = np.zeros(len(exact))
+        approx[list(scores)] = list(scores.values())
+
+        # the push only ever underestimates, converging on the exact
+        # scores as `epsilon` shrinks
+        assert np.all(approx <= exact + 1e-12)
+        assert approx.sum() <= 1.0 + 1e-9
+        errors.append(np.abs(exact - approx).max())
+
+    assert errors == sorted(errors, reverse=True)
+    assert errors[-1] < 1e-5
+
+
+def test_personalized_pagerank_isolated (graph):
+    assert graph.personalized_pagerank(6) == { 6: 1.0 }
+    assert graph.personalized_pagerank(99) == {}
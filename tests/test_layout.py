@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.layout import RCLayout
+import json
+import numpy as np
+import pytest
+
+
+def diagram_options (html):
+    """
+    the vis.js options in a diagram written by pyvis
+    """
+    start = html.index("options = {") + len("options = ")
+    return json.JSONDecoder().raw_decode(html[start:])[0]
+
+
+def test_spectral_layout (network):
+    layout = RCLayout.from_graph(network.graph)
+
+    assert layout.xy.shape == (len(network.graph.nodes), 2)
+    assert np.all(np.isfinite(layout.xy))
+    assert np.array_equal(RCLayout.from_graph(network.graph).xy, layout.xy)
+
+    loaded = RCLayout.deserialize(layout.serialize())
+    assert np.array_equal(loaded.xy, layout.xy)
+
+
+def test_force_directed (network):
+    nodes = np.array(sorted(network.graph.bfs(network.data.ids[0], depth_limit=2)), dtype=np.int64)
+    edges = network.graph.subgraph_edges(set(nodes.tolist()))
+    pos = network.layout.force_directed(nodes, edges)
+
+    assert pos.shape == (len(nodes), 2)
+    assert np.all(np.isfinite(pos))
+    assert np.array_equal(network.layout.force_directed(nodes, edges), pos)
+
+    # centered, with the nodes spread apart
+    assert np.allclose(pos.mean(axis=0), 0.0, atol=1e-6)
+    assert len(set(map(tuple, pos.round(1).tolist()))) == len(nodes)
+
+
+def test_force_directed_edge_cases ():
+    layout = RCLayout()
+
+    assert layout.force_directed(np.array([], dtype=np.int64), []).shape == (0, 2)
+    assert layout.force_directed(np.array([ 7 ]), []).tolist() == [ [ 0.0, 0.0 ] ]
+
+
+def test_force_directed_cap (network, monkeypatch):
+    nodes = np.array(sorted(network.graph.bfs(network.data.ids[0], depth_limit=2)), dtype=np.int64)
+    edges = network.graph.subgraph_edges(set(nodes.tolist()))
+
+    # too many nodes for the force layout keep their spectral positions
+    monkeypatch.setattr(RCLayout, "MAX_FORCE_NODES", len(nodes) - 1)
+    pos = network.layout.force_directed(nodes, edges)
+
+    expected = network.layout.initial_positions(nodes)
+    expected -= expected.mean(axis=0)
+    expected *= RCLayout.SPACING * np.sqrt(len(nodes)) / 2.0
+
+    assert np.allclose(pos, expected)
+
+
+def test_neighborhood_layout_cache (network, monkeypatch):
+    subgraph = network.graph.bfs(network.data.ids[1], depth_limit=2)
+    edges = network.graph.subgraph_edges(subgraph)
+    network.layout_cache.clear()
+
+    positions = network.neighborhood_layout(subgraph, edges)
+    assert set(positions) == set(subgraph)
+
+    # the same set of nodes gets its positions from the cache
+    def fail (nodes, edges):
+        raise AssertionError("laid out again")
+
+    monkeypatch.setattr(network.layout, "force_directed", fail)
+    assert network.neighborhood_layout(set(reversed(list(subgraph))), edges) is positions
+
+
+def test_place ():
+    layout = RCLayout()
+    positions = { 1: [ 0.0, 0.0 ], 2: [ 120.0, 0.0 ] }
+    edges = [ (1, 3, 1.0), (2, 3, 1.0), (3, 4, 1.0) ]
+    before = dict(positions)
+
+    placed = layout.place(positions, [ 3, 4, 5 ], edges, center=[ 500.0, 500.0 ])
+
+    # only the new nodes, leaving the existing ones where they were
+    assert set(placed) == { 3, 4, 5 }
+    assert positions == before
+
+    # next to the centroid of their placed neighbors, else the center
+    assert np.hypot(placed[3][0] - 60.0, placed[3][1]) == pytest.approx(RCLayout.SPACING, abs=0.1)
+    assert np.hypot(placed[4][0] - placed[3][0], placed[4][1] - placed[3][1]) == pytest.approx(RCLayout.SPACING, abs=0.1)
+    assert np.hypot(placed[5][0] - 500.0, placed[5][1] - 500.0) == pytest.approx(RCLayout.SPACING, abs=0.1)
+
+    assert layout.place(positions, [ 3, 4, 5 ], edges, center=[ 500.0, 500.0 ]) == placed
+
+
+def test_write_diagram (network, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    node_id = int(network.data.ids[0])
+    paths = network.graph.bfs(node_id, depth_limit=2)
+    subgraph = set(paths)
+
+    hood, diagram = network.extract_neighborhood(2, subgraph, paths, str(node_id), str(tmp_path / "hood.html"))
+    html = (tmp_path / "hood.html").read_text()
+
+    # laid out on the server, so the browser runs no physics
+    assert diagram_options(html)["physics"]["enabled"] is False
+
+    positions = network.neighborhood_layout(subgraph, network.graph.subgraph_edges(subgraph))
+    assert [ row[-2:] for row in diagram ] == [ positions[row[0]] for row in diagram ]
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.server import RCNeighbors
+import json
+import msgpack
+import os
+import pytest
+
+
+def make_row (i, proximity, impact):
+    return [ i, (proximity, 1, 0.5, impact), "{:.4f}".format(impact), f"label {i}", f"title {i}", True ]
+
+
+@pytest.fixture
+def hood ():
+    hood = RCNeighbors()
+
+    # ties in rank, added out of order of ID
+    hood.auth = [
+        make_row(7, 0.5, 0.1),
+        make_row(9, 1.0, 0.2),
+        make_row(4, 0.5, 0.1),
+        make_row(2, 0.5, 0.3),
+        make_row(8, 0.5, 0.1),
+        make_row(1, 0.25, 0.9)
+        ]
+
+    hood.data = [ make_row(3, 1.0, 0.5) ]
+
+    return hood
+
+
+def pages (hood, kind, limit):
+    """
+    follow the cursors through every page, returning the pages of IDs
+    """
+    ids = []
+    cursor = None
+
+    while True:
+        view = json.loads(hood.page(0.0, "token", kind, limit, cursor=cursor))
+        ids.append([ r["id"] for r in view["rows"] ])
+        cursor = view["next"]
+
+        assert view["total"] == len(getattr(hood, kind))
+
+        if cursor is None:
+            return ids
+
+
+def test_cursor_round_trip ():
+    row = make_row(42, 0.75, 0.125)
+    cursor = RCNeighbors.encode_cursor(row)
+
+    assert RCNeighbors.decode_cursor(cursor) == ((0.75, 1, 0.5, 0.125), 42)
+    assert cursor.isascii() and "/" not in cursor and "+" not in cursor
+
+
+@pytest.mark.parametrize("cursor", [ "", "not a cursor", "W10=", "WzEsMiwzXQ==" ])
+def test_cursor_malformed (cursor):
+    with pytest.raises(ValueError):
+        RCNeighbors.decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("limit", [ 1, 2, 3, 5, 6, 50 ])
+def test_pages_cover_rows (hood, limit):
+    ids = pages(hood, "auth", limit)
+
+    # descending order of rank, then ascending ID
+    assert sum(ids, []) == [ 9, 2, 4, 7, 8, 1 ]
+    assert all([ len(p) == limit for p in ids[:-1] ])
+    assert 0 < len(ids[-1]) <= limit
+
+
+def test_page_rows (hood):
+    view = json.loads(hood.page(0.0, "token", "data", 10))
+
+    assert view["next"] is None
+    assert view["kind"] == "data"
+    assert view["toke"] == "token"
+    assert view["rows"] == [ {
+        "id": 3,
+        "proximity": 1.0,
+        "count": 1,
+        "estimate": 0.5,
+        "impact": 0.5,
+        "label": "label 3",
+        "title": "title 3",
+        "shown": True
+        } ]
+
+
+def test_records_order (hood):
+    records = list(hood.records(2))
+
+    # nearest first, then descending order of rank, across kinds
+    assert [ (kind, r["id"]) for hop, kind, r in records ][:3] == [ ("data", 3), ("auth", 9), ("auth", 2) ]
+    assert [ hop for hop, kind, r in records ] == [ 1.0, 1.0, 1.5, 1.5, 1.5, 1.5, 1.75 ]
+
+
+@pytest.mark.parametrize("mimetype, first", [ (RCNeighbors.MIME_JSON, 0), (RCNeighbors.MIME_NDJSON, 3) ])
+def test_query_closes_files (client, network, mimetype, first):
+    # different seeds for each encoding, so neither gets served from
+    # the neighborhoods which the other cached
+    seeds = [ network.labels[i] for i in network.store.ids_of_kind("data").tolist()[::-1][first:first + 3] ]
+    open_fds = len(os.listdir("/proc/self/fd"))
+
+    # each new query writes its diagram through a temporary file
+    for radius in [ 1, 2, 3 ]:
+        for seed in seeds:
+            response = client.get(f"/api/v1/query/{radius}/{seed}", headers={ "Accept": mimetype })
+            assert response.status_code == 200
+            response.get_data()
+
+    assert len(os.listdir("/proc/self/fd")) <= open_fds
+
+
+
+def legacy_json (hood, cache_token, elapsed):
+    """
+    the JSON which neighborhood queries returned before the compact
+    encodings
+    """
+    view = { kind: sorted(getattr(hood, kind), key=lambda x: x[1], reverse=True) for kind in RCNeighbors.KINDS }
+    view["toke"] = cache_token
+    view["time"] = "{:.2f}".format(elapsed)
+
+    return json.dumps(view, indent=4, sort_keys=True, ensure_ascii=False)
+
+
+def test_serialize_encodings (hood, monkeypatch):
+    monkeypatch.setattr("richcontext.server.server.time.time", lambda: 100.0)
+
+    assert hood.serialize(100.0, "token") == legacy_json(hood, "token", 0.0)
+
+    columnar = json.loads(hood.serialize(100.0, "token", encoding=RCNeighbors.MIME_COLUMNAR))
+    assert msgpack.unpackb(hood.serialize(100.0, "token", encoding=RCNeighbors.MIME_MSGPACK)) == columnar
+
+    # the same rows, in the same order, as parallel arrays
+    for kind in RCNeighbors.KINDS:
+        rows = hood.sorted_rows(kind)
+        assert columnar[kind]["id"] == [ r[0] for r in rows ]
+        assert columnar[kind]["impact"] == [ r[1][3] for r in rows ]
+        assert columnar[kind]["label"] == [ r[3] for r in rows ]
+
+    assert columnar["toke"] == "token"
+    assert columnar["time"] == 0.0
+
+
+@pytest.mark.parametrize("accept", [ None, "*/*", "text/html", "application/unknown" ])
+def test_query_default_json (client, network, accept):
+    title = network.labels[int(network.data.ids[0])]
+    headers = { "Accept": accept } if accept else {}
+    response = client.get(f"/api/v1/query/1/{title}", headers=headers)
+
+    # byte for byte the JSON as before, with the same content type
+    view = json.loads(response.data)
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "text/html; charset=utf-8"
+    assert response.data.decode("utf-8") == json.dumps(view, indent=4, sort_keys=True, ensure_ascii=False)
+    assert set(view) == set(RCNeighbors.KINDS + [ "toke", "time" ])
+
+
+@pytest.mark.parametrize("mimetype", [ RCNeighbors.MIME_COLUMNAR, RCNeighbors.MIME_MSGPACK ])
+def test_query_compact (client, network, mimetype):
+    title = network.labels[int(network.data.ids[0])]
+
+    rows = json.loads(client.get(f"/api/v1/query/1/{title}").data)
+    response = client.get(f"/api/v1/query/1/{title}", headers={ "Accept": mimetype })
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == mimetype
+
+    if mimetype == RCNeighbors.MIME_MSGPACK:
+        view = msgpack.unpackb(response.data)
+    else:
+        view = json.loads(response.data)
+
+    for kind in RCNeighbors.KINDS:
+        assert view[kind]["id"] == [ r[0] for r in rows[kind] ]
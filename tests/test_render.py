@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from bench_render import capture_renders, minify_rendered
+from jinja2 import Environment, FileSystemLoader, ModuleLoader
+import pytest
+
+
+@pytest.fixture(scope="module")
+def render_calls (builder):
+    return capture_renders(builder)
+
+
+def test_compiled_templates (network):
+    # the web app loads the templates compiled during pre-compute
+    assert isinstance(network.data_template.environment.loader, ModuleLoader)
+
+
+@pytest.mark.parametrize("name", [ "prov", "data", "publ", "jour", "auth", "topi" ])
+def test_render_matches_minify (network, render_calls, name):
+    template_path = f"links/{name}.html"
+    source = Environment(loader=FileSystemLoader(network.template_folder)).get_template(template_path)
+    template = getattr(network, f"{name}_template")
+    calls = [ kwargs for t, kwargs in render_calls if t == template_path ]
+
+    assert calls
+
+    for kwargs in calls:
+        assert network.render_template(template, **kwargs) == minify_rendered(source, kwargs)
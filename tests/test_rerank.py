@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import pytest
+
+
+def author_anchors (network, radius):
+    """
+    pairs of an author with the anchors of queries which reach it
+    within `radius`
+    """
+    pairs = []
+
+    for d_id in network.store.ids_of_kind("data").tolist():
+        for node_id in network.anchor_paths(str(d_id), radius):
+            if network.store.kind_of(node_id) == "auth":
+                pairs.append(( node_id, str(d_id) ))
+
+    assert pairs
+    return pairs
+
+
+def clear_caches (web_app):
+    web_app.rerank_cache.clear()
+    web_app.net.anchor_cache.clear()
+
+    for key in list(web_app.disk_cache.iterkeys()):
+        if key.startswith("rerank-"):
+            del web_app.disk_cache[key]
+
+
+def test_rerank_depends_on_key (web_app, network):
+    pairs = author_anchors(network, 2)
+    cold = {}
+
+    for node_id, anchor in pairs:
+        for radius in [ 1, 2 ]:
+            clear_caches(web_app)
+            cold[node_id, anchor, radius] = network.render_auth(network.store.get_entity(node_id), rerank=anchor, radius=radius)
+
+    # the same links, in any order, whatever else got reranked before
+    clear_caches(web_app)
+
+    for node_id, anchor in reversed(pairs):
+        for radius in [ 2, 1 ]:
+            assert web_app.get_reranked_links(node_id, anchor, radius) == cold[node_id, anchor, radius]
+
+    # and the anchor makes a difference for some of them
+    assert len(set(cold.values())) > len(set([ node_id for node_id, anchor in pairs ]))
+
+
+def test_rerank_disk_cache (web_app, network):
+    node_id, anchor = author_anchors(network, 2)[0]
+    clear_caches(web_app)
+
+    html = web_app.get_reranked_links(node_id, anchor, 2)
+    disk_key = "rerank-{}-{}-{}-{}".format(network.build_id, node_id, anchor, 2)
+    assert web_app.disk_cache.get(disk_key) == html
+
+    # a hit in the disk cache, as from another worker, gives the same
+    # links as a cold render
+    web_app.rerank_cache.clear()
+    network.anchor_cache.clear()
+    assert web_app.get_reranked_links(node_id, anchor, 2) == html
+    assert len(network.anchor_cache) == 0
+
+
+def test_rerank_build_id (web_app, network, monkeypatch):
+    node_id, anchor = author_anchors(network, 2)[0]
+    clear_caches(web_app)
+
+    html = web_app.get_reranked_links(node_id, anchor, 2)
+    stale = "rerank-{}-{}-{}-{}".format(network.build_id, node_id, anchor, 2)
+    web_app.disk_cache.set(stale, "stale")
+    web_app.rerank_cache.put(( network.build_id, node_id, anchor, 2 ), "stale")
+    assert web_app.get_reranked_links(node_id, anchor, 2) == "stale"
+
+    # a new build ignores whatever got cached for the old one
+    monkeypatch.setattr(network, "build_id", "new-build")
+    assert web_app.get_reranked_links(node_id, anchor, 2) == html
+    assert web_app.disk_cache.get(stale) == "stale"
+
+
+def test_rerank_last_query (client, web_app, network):
+    node_id, anchor = author_anchors(network, 2)[0]
+    title = network.labels[int(anchor)]
+
+    assert client.get(f"/api/v1/query/2/{title}").status_code == 200
+
+    # the links of an author follow the anchor and radius of the last
+    # query in the session
+    response = client.get(f"/api/v1/links/{node_id}")
+    assert response.status_code == 200
+    assert json.loads(response.data) == web_app.get_reranked_links(node_id, anchor, 2)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.sched import RCRateLimiter, RCScheduler, RCTokenBucket
+import diskcache as dc
+import pytest
+
+
+def test_token_bucket_burst ():
+    bucket = RCTokenBucket(rate=2.0, burst=3, stamp=100.0)
+
+    assert [ bucket.take(now=100.0) for _ in range(3) ] == [ 0.0, 0.0, 0.0 ]
+    assert bucket.take(now=100.0) == pytest.approx(0.5)
+
+
+def test_token_bucket_refill ():
+    bucket = RCTokenBucket(rate=2.0, burst=3, tokens=0.0, stamp=100.0)
+
+    assert bucket.take(now=100.25) == pytest.approx(0.25)
+    assert bucket.take(now=100.5) == 0.0
+    assert bucket.take(now=100.5) == pytest.approx(0.5)
+
+    # refills no further than the burst size
+    assert [ bucket.take(now=1000.0) for _ in range(4) ] == [ 0.0, 0.0, 0.0, pytest.approx(0.5) ]
+
+
+def test_token_bucket_clock_skew ():
+    bucket = RCTokenBucket(rate=1.0, burst=1, tokens=0.0, stamp=100.0)
+
+    # a clock which steps back doesn't take tokens away
+    assert bucket.take(now=99.0) == pytest.approx(1.0)
+    assert bucket.take(now=100.0) == 0.0
+
+
+def test_rate_limiter_shared (tmp_path):
+    # two limiters over the same cache directory, as in two workers
+    first = RCRateLimiter(dc.Cache(str(tmp_path)))
+    second = RCRateLimiter(dc.Cache(str(tmp_path)))
+
+    assert [ first.take("client", rate=0.01, burst=3) for _ in range(2) ] == [ 0.0, 0.0 ]
+    assert second.take("client", rate=0.01, burst=3) == 0.0
+    assert first.take("client", rate=0.01, burst=3) > 0.0
+    assert second.take("client", rate=0.01, burst=3) > 0.0
+
+    # other clients have their own buckets
+    assert second.take("other", rate=0.01, burst=3) == 0.0
+
+
+def test_scheduler_role_limit ():
+    policies = {
+        "ops": { "priority": 0, "limit": 1 },
+        "public": { "priority": 1, "limit": 2 }
+        }
+
+    sched = RCScheduler(policies, max_active=2, max_wait=0.01)
+
+    assert sched.acquire("ops")
+    assert not sched.acquire("ops")
+    assert sched.acquire("public")
+    assert not sched.acquire("public")
+
+    sched.release("ops")
+    assert sched.acquire("public")
+
+    view = sched.metrics()
+    assert view["active"] == 2
+    assert view["roles"]["ops"]["timed_out"] == 1
+    assert view["roles"]["public"]["granted"] == 2
+
+
+def shared_buckets (web_app, client):
+    addr = client.environ_base["REMOTE_ADDR"]
+    return [ k for k in web_app.disk_cache.iterkeys() if k.startswith("rate-") and k.endswith(addr) ]
+
+
+def test_payload_routes_unscheduled (client, web_app, network):
+    burst = web_app.ROLE_POLICIES[web_app.SCOPE_PUBLIC]["burst"]
+    uuid = network.id_list[network.data.ids[0]]
+
+    # well past the burst, without any rate limit
+    statuses = [ client.get(f"/api/v1/lookup/{uuid}").status_code for _ in range(burst + 10) ]
+    statuses += [ client.get("/api/v1/phrases").status_code for _ in range(burst + 10) ]
+
+    assert set(statuses) == { 200 }
+    assert shared_buckets(web_app, client) == []
+
+
+def test_shared_limit_routes (client, web_app, network):
+    uuid = network.id_list[network.data.ids[0]]
+
+    # other routes get rate limited within the worker
+    assert client.get(f"/api/v1/related/{uuid}").status_code == 200
+    assert shared_buckets(web_app, client) == []
+
+    # while queries share their buckets across the workers
+    assert client.get(f"/api/v1/query/1/{uuid}").status_code == 200
+    assert len(shared_buckets(web_app, client)) == 1
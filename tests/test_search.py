@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.blob import RCBlobReader, RCBlobWriter
+from richcontext.server.search import RCSearchIndex, decode_varints, encode_varints
+import numpy as np
+import pytest
+
+
+DOCS = [
+    ( 0, [ "Survey of Income and Program Participation", "Census Bureau" ] ),
+    ( 1, [ "Income dynamics of survey respondents" ] ),
+    ( 3, [ "Program evaluation", "Income survey" ] ),
+    ( 4, [ "Incomplete records", "" ] )
+    ]
+
+
+@pytest.fixture
+def index (tmp_path):
+    writer = RCBlobWriter()
+
+    for name, payloads in RCSearchIndex.build(DOCS, 5).items():
+        writer.add_section(name, payloads)
+
+    path = tmp_path / "search.blob"
+    writer.write(path)
+
+    return RCSearchIndex(RCBlobReader(path))
+
+
+def test_varint_round_trip ():
+    values = np.array([ 0, 1, 127, 128, 255, 300, 16383, 16384, 2**31 - 1, 2**35 + 7 ], dtype=np.int64)
+    data = encode_varints(values)
+
+    assert len(data) == 1 + 1 + 1 + 2 + 2 + 2 + 2 + 3 + 5 + 6
+    assert decode_varints(data).tolist() == values.tolist()
+
+
+def test_varint_single_bytes ():
+    assert encode_varints([ 0, 1, 127 ]) == bytes([ 0, 1, 127 ])
+    assert encode_varints([ 300 ]) == bytes([ 0xac, 0x02 ])
+
+
+def test_varint_empty ():
+    assert encode_varints([]) == b""
+    assert decode_varints(b"").tolist() == []
+
+
+def test_postings_round_trip (index):
+    t = index.find_term("income")
+    docs, tfs = index.postings(t)
+
+    assert docs.tolist() == [ 0, 1, 3 ]
+    assert tfs.tolist() == [ 1, 1, 1 ]
+
+    # positions count across fields, with a gap between them
+    keys = index.positions(t, docs, tfs)
+    assert (keys >> 32).tolist() == [ 0, 1, 3 ]
+    assert (keys & 0xffffffff).tolist() == [ 2, 0, 3 ]
+
+
+def test_terms_sorted (index):
+    terms = [ index.term_at(t) for t in range(index.num_terms) ]
+
+    assert terms == sorted(terms)
+    assert index.find_term("missing") is None
+    assert index.num_docs == 4
+
+
+def test_search_clauses (index):
+    # shorter documents rank higher for the same term frequencies
+    assert [ d for d, s in index.search("income survey") ] == [ 3, 1, 0 ]
+    assert [ d for d, s in index.search('"income survey"') ] == [ 3 ]
+    assert sorted([ d for d, s in index.search("inc*") ]) == [ 0, 1, 3, 4 ]
+    assert index.search("income missing") == []
+
+
+def test_phrase_not_across_fields (index):
+    # "participation" ends the first field of doc 0, "census" starts the next
+    assert index.search('"participation census"') == []
+
+
+def test_search_mask (index):
+    mask = np.array([ True, False, True, True, True ])
+
+    assert [ d for d, s in index.search("income", mask=mask) ] == [ 3, 0 ]
+    assert [ d for d, s in index.search("income", k=1) ] == [ 3 ]
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from pathlib import Path
+import json
+import os
+import subprocess
+import sys
+
+
+HEAVY_MODULES = [ "networkx", "pandas", "scipy", "pyvis", "IPython", "css_html_js_minify" ]
+
+PROBE = """
+import json, sys
+sys.argv = [ "app.py" ]
+import app
+print(json.dumps([ m for m in {} if m in sys.modules ]))
+"""
+
+
+def test_serve_imports (web_app):
+    # the web app imports none of the heavy pre-compute dependencies,
+    # in a fresh interpreter with the same config as the tests
+    root = Path(__file__).parents[1]
+    env = dict(os.environ, PYTHONPATH=str(root))
+
+    out = subprocess.run(
+        [ sys.executable, "-c", PROBE.format(json.dumps(HEAVY_MODULES)) ],
+        cwd=root, env=env, capture_output=True, text=True, check=True
+        )
+
+    assert json.loads(out.stdout.strip().split("\n")[-1]) == []
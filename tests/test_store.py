@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from richcontext.server.blob import RCBlobReader, RCBlobWriter
+from richcontext.server.store import RCBlockStringTable, RCEntityStore, RCStringTableBuilder
+import pytest
+
+
+ENTITIES = [
+    ("prov", {
+        "p0": { "id": "p0", "title": "Provider Ü", "ror": "https://ror.org/0", "used": True }
+        }),
+    ("data", {
+        "d0": { "id": "d0", "title": "Dataset 0", "provider": "p0", "url": "https://example.org/d0", "used": True },
+        "d1": { "id": "d1", "title": "Dataset 1", "provider": "p0", "url": None }
+        }),
+    ("publ", {
+        "x0": { "id": "x0", "title": "Paper 0", "doi": "10.1/0", "pdf": None, "journal": "j0", "abstract": "an abstract", "datasets": [ "d0" ], "authors": [ "a1", "a0" ], "topics": [] },
+        "x1": { "id": "x1", "title": "Paper 1", "doi": "", "pdf": "https://example.org/x1.pdf", "journal": None, "abstract": "", "datasets": [ "d0" ], "authors": [], "topics": [ "t0" ] }
+        }),
+    ("jour", {
+        "j0": { "id": "j0", "title": "Journal 0", "issn": "0000-0000", "url": None, "used": True }
+        }),
+    ("auth", {
+        "a0": { "id": "a0", "title": "Author 0", "orcid": "", "used": True },
+        "a1": { "id": "a1", "title": "Author 1", "orcid": "https://orcid.org/1", "used": True }
+        }),
+    ("topi", {
+        "t0": { "id": "t0", "title": "topic 0", "used": True }
+        })
+    ]
+
+
+@pytest.fixture
+def store ():
+    id_list = [ id for kind, views in ENTITIES for id in views ]
+    titles = [ view["title"] for kind, views in ENTITIES for view in views.values() ]
+
+    return RCEntityStore.build(id_list, titles, ENTITIES)
+
+
+def check_views (store):
+    for kind, views in ENTITIES:
+        for id, view in views.items():
+            i = store.get_id(id)
+
+            assert store.kind_of(i) == kind
+            assert store.id_list[i] == id
+            assert store.labels[i] == view["title"]
+            assert dict(store.get_entity(i).view) == view
+
+
+def test_string_table ():
+    builder = RCStringTableBuilder()
+    strings = [ "alpha", "beta", "", "β-carotene", "alpha" ]
+
+    assert [ builder.intern(s) for s in strings ] == [ 0, 1, 2, 3, 0 ]
+    assert builder.intern(None) == -1
+
+    table = builder.freeze()
+    assert [ table[i] for i in range(len(table)) ] == [ "alpha", "beta", "", "β-carotene" ]
+    assert table.find("β-carotene") == 3
+    assert table.find("alp") is None
+    assert table.find("missing") is None
+
+
+def test_entity_views (store):
+    check_views(store)
+
+    assert store.find_id("missing") is None
+    assert store.find_id(None) is None
+    assert store.linked_from("datasets", store.get_id("d0")).tolist() == sorted([ store.get_id("x0"), store.get_id("x1") ])
+
+    with pytest.raises(KeyError):
+        store.get_id("missing")
+
+
+@pytest.mark.parametrize("kind, id, key, value", [
+    ("data", "d1", "provider", "p9"),
+    ("publ", "x0", "datasets", [ "d0", "zz" ]),
+    ("publ", "x1", "journal", "a" )
+    ])
+def test_dangling_links (kind, id, key, value):
+    # links to UUIDs missing from the corpus, including ones which
+    # would sort past the last UUID, or next to another entity
+    entities = [ (k, { i: dict(v) for i, v in views.items() }) for k, views in ENTITIES ]
+    dict(entities)[kind][id][key] = value
+
+    id_list = [ id for kind, views in entities for id in views ]
+    titles = [ view["title"] for kind, views in entities for view in views.values() ]
+
+    with pytest.raises(KeyError, match=id):
+        RCEntityStore.build(id_list, titles, entities)
+
+
+def test_entity_store_round_trip (store):
+    loaded = RCEntityStore(store.serialize())
+    loaded.text = store.text
+
+    check_views(loaded)
+
+
+def test_block_string_table (store, tmp_path):
+    builder = RCStringTableBuilder()
+    texts = [ "x" * 40, "", "short", "ü" * 30, "y" * 7 ]
+
+    for text in texts:
+        builder.intern(text)
+
+    table = builder.freeze()
+
+    # blocks smaller than most of the strings, so that they span blocks
+    writer = RCBlobWriter()
+    writer.add_section("text", RCBlockStringTable.compress_blocks(table, block_size=16))
+    writer.write(tmp_path / "text.blob")
+
+    blocks = RCBlockStringTable(RCBlobReader(tmp_path / "text.blob"), "text", table.offsets, block_size=16)
+
+    assert len(blocks) == len(texts)
+    assert [ blocks[i] for i in range(len(texts)) ] == texts
+    assert [ blocks[i] for i in reversed(range(len(texts))) ] == list(reversed(texts))
+
+
+def test_store_text_off_heap (store, tmp_path):
+    writer = RCBlobWriter()
+
+    for name, blocks in store.text_sections().items():
+        writer.add_section(name, blocks)
+
+    writer.write(tmp_path / "store.blob")
+
+    loaded = RCEntityStore(store.serialize())
+    loaded.attach_text(RCBlobReader(tmp_path / "store.blob"))
+
+    check_views(loaded)
+
+
+def test_block_string_table_lazy (tmp_path):
+    builder = RCStringTableBuilder()
+    texts = [ "a" * 20, "", "b" * 20, "c" * 20 ]
+
+    for text in texts:
+        builder.intern(text)
+
+    table = builder.freeze()
+
+    writer = RCBlobWriter()
+    writer.add_section("text", RCBlockStringTable.compress_blocks(table, block_size=16))
+    writer.write(tmp_path / "text.blob")
+
+    reader = RCBlobReader(tmp_path / "text.blob")
+    blocks = RCBlockStringTable(reader, "text", table.offsets, block_size=16)
+    reads = []
+    get = reader.get
+    reader.get = lambda section, b: reads.append(b) or get(section, b)
+
+    # nothing gets decompressed until a string gets read, and empty
+    # strings don't need any block
+    assert reads == []
+    assert blocks[1] == ""
+    assert reads == []
+
+    # then each block only once, while it stays in the LRU
+    assert blocks[0] == texts[0]
+    assert blocks[0] == texts[0]
+    assert reads == [ 0, 1 ]
+
+    assert blocks[2] == texts[2]
+    assert reads == [ 0, 1, 2 ]
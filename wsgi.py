@@ -1,5 +1,7 @@
 from app import APP
 
+APP.setup_serve()
+
 if __name__ == "__main__":
     APP.run()
     